@@ -5,6 +5,7 @@ This package contains:
 - report_utils: Case ID to title enrichment utilities
 - docx_generator: Academic document generation
 - email_utils: Email notification services
+- llm_simulator: Offline Ollama / network LLM simulator for load tests
 - network_file_saver: Network file operations
 - pdf_generator: PDF document generation
 - prompt_logger: LLM prompt logging
@@ -16,6 +17,7 @@ __all__ = [
     'report_utils',
     'docx_generator',
     'email_utils',
+    'llm_simulator',
     'network_file_saver',
     'pdf_generator',
     'prompt_logger',
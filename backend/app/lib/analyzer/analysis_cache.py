@@ -0,0 +1,271 @@
+"""
+Cache of analysis artifacts for repeated research questions.
+
+Stores, per research question:
+- decomposition: the task breakdown (independent of the data)
+- plan: the create_plan response (strategy, discovery, plan_id)
+- final_report: the report_id of a completed full analysis
+
+Lookup is by normalized query first (case, diacritics, punctuation and
+whitespace insensitive), then by cosine similarity of the query embedding, so a
+trivially reworded question also hits. Data-dependent entries record the
+`blocuri` watermark (max id) and stop matching once more than
+`max_new_cases` cases were added since.
+
+Storage: analyzer_plans/analysis_cache.db (SQLite, WAL mode)
+"""
+import hashlib
+import json
+import logging
+import math
+import operator
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIMILARITY = 0.97
+DEFAULT_MAX_NEW_CASES = 500
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+
+# Most recent entries per kind compared by embedding
+MAX_SIMILARITY_CANDIDATES = 500
+
+# Kinds whose validity depends on the contents of blocuri
+DATA_DEPENDENT_KINDS = {"plan", "final_report"}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases, strips diacritics and punctuation, and collapses whitespace."""
+    decomposed = unicodedata.normalize('NFKD', query.lower())
+    without_marks = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', without_marks)).strip()
+
+
+def _pack_vector(embedding: Sequence[float]) -> Optional[bytes]:
+    """Unit-normalized float32 vector, so similarity is a plain dot product."""
+    norm = math.sqrt(sum(x * x for x in embedding))
+    if not norm:
+        return None
+    return array('f', (x / norm for x in embedding)).tobytes()
+
+
+class AnalysisCache:
+    """Persistent query -> artifact cache with exact and semantic lookup."""
+
+    def __init__(
+        self,
+        storage_dir: str = "analyzer_plans",
+        similarity_threshold: float = DEFAULT_SIMILARITY,
+        max_new_cases: int = DEFAULT_MAX_NEW_CASES,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS
+    ):
+        self.db_file = os.path.join(storage_dir, "analysis_cache.db")
+        self.similarity_threshold = similarity_threshold
+        self.max_new_cases = max_new_cases
+        self.ttl_seconds = ttl_seconds
+        self.stats = {'exact_hits': 0, 'similar_hits': 0, 'misses': 0, 'stale': 0, 'stores': 0}
+        os.makedirs(storage_dir, exist_ok=True)
+        self._init_db()
+
+    def get(
+        self,
+        kind: str,
+        query: str,
+        embedding: Optional[Sequence[float]] = None,
+        watermark: Optional[int] = None,
+        record_miss: bool = True
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Looks up an artifact for `query`.
+
+        Args:
+            embedding: Query embedding for the similarity fallback (exact match only if None)
+            watermark: Current max(blocuri.id), for data-dependent kinds
+            record_miss: False for an exact-only probe that is followed by a similarity lookup
+
+        Returns:
+            {'value', 'match' ('exact'/'similar'), 'similarity', 'cached_query', 'created_at'} or None
+        """
+        normalized = normalize_query(query)
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT * FROM entries WHERE kind = ? AND query_key = ?",
+                    (kind, self._key(normalized))
+                ).fetchone()
+                match, similarity = 'exact', 1.0
+
+                if (row is None or not self._is_valid(row, kind, now, watermark)) and embedding is not None:
+                    row, similarity = self._most_similar(conn, kind, embedding, now, watermark)
+                    match = 'similar'
+
+                if row is None or not self._is_valid(row, kind, now, watermark):
+                    if record_miss:
+                        self.stats['misses'] += 1
+                    return None
+
+                conn.execute("UPDATE entries SET hits = hits + 1, last_hit = ? WHERE id = ?", (now, row['id']))
+        except sqlite3.Error as e:
+            logger.error(f"Analysis cache read failed: {e}")
+            self.stats['misses'] += 1
+            return None
+
+        self.stats['exact_hits' if match == 'exact' else 'similar_hits'] += 1
+        logger.info(f"[ANALYSIS-CACHE] {kind} {match} hit ({similarity:.3f}) for: {query[:60]}")
+        return {
+            'value': json.loads(row['value']),
+            'match': match,
+            'similarity': round(similarity, 4),
+            'cached_query': row['query'],
+            'created_at': row['created_at']
+        }
+
+    def put(
+        self,
+        kind: str,
+        query: str,
+        value: Dict[str, Any],
+        embedding: Optional[Sequence[float]] = None,
+        watermark: Optional[int] = None
+    ):
+        """Stores (or replaces) the artifact of a query."""
+        normalized = normalize_query(query)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    """INSERT OR REPLACE INTO entries
+                       (kind, query_key, query, normalized, value, embedding, watermark, created_at, hits, last_hit)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, NULL)""",
+                    (
+                        kind, self._key(normalized), query, normalized,
+                        json.dumps(value, ensure_ascii=False, default=str),
+                        _pack_vector(embedding) if embedding else None,
+                        watermark, time.time()
+                    )
+                )
+            self.stats['stores'] += 1
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.error(f"Analysis cache write failed: {e}")
+
+    def invalidate(self, kind: str, query: str):
+        """Drops the entry of a query (e.g. its plan or report no longer exists)."""
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "DELETE FROM entries WHERE kind = ? AND query_key = ?",
+                    (kind, self._key(normalize_query(query)))
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Analysis cache invalidation failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self.stats)
+        try:
+            with self._connect() as conn:
+                stats['entries'] = {
+                    row['kind']: row['n'] for row in conn.execute("SELECT kind, COUNT(*) AS n FROM entries GROUP BY kind")
+                }
+        except sqlite3.Error:
+            pass
+        return stats
+
+    # --- Helpers ---
+
+    @staticmethod
+    def _key(normalized: str) -> str:
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def _is_valid(self, row: sqlite3.Row, kind: str, now: float, watermark: Optional[int]) -> bool:
+        if now - row['created_at'] > self.ttl_seconds:
+            self.stats['stale'] += 1
+            return False
+        if kind in DATA_DEPENDENT_KINDS and watermark is not None and row['watermark'] is not None:
+            if watermark - row['watermark'] > self.max_new_cases:
+                self.stats['stale'] += 1
+                return False
+        return True
+
+    def _most_similar(
+        self,
+        conn: sqlite3.Connection,
+        kind: str,
+        embedding: Sequence[float],
+        now: float,
+        watermark: Optional[int]
+    ) -> tuple:
+        packed = _pack_vector(embedding)
+        if packed is None:
+            return None, 0.0
+        target = array('f')
+        target.frombytes(packed)
+
+        best, best_score = None, 0.0
+        rows = conn.execute(
+            """SELECT * FROM entries WHERE kind = ? AND embedding IS NOT NULL AND created_at > ?
+               ORDER BY created_at DESC LIMIT ?""",
+            (kind, now - self.ttl_seconds, MAX_SIMILARITY_CANDIDATES)
+        )
+        for row in rows:
+            vector = array('f')
+            vector.frombytes(row['embedding'])
+            if len(vector) != len(target):
+                continue
+            score = sum(map(operator.mul, vector, target))
+            if score > best_score and score >= self.similarity_threshold and self._is_valid(row, kind, now, watermark):
+                best, best_score = row, score
+        return best, best_score
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    query_key TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    normalized TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    embedding BLOB,
+                    watermark INTEGER,
+                    created_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    last_hit REAL,
+                    UNIQUE (kind, query_key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_kind_created ON entries (kind, created_at)")
+
+
+_analysis_cache: Optional[AnalysisCache] = None
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """Returns the process-wide cache, created on first use with the configured thresholds."""
+    global _analysis_cache
+    if _analysis_cache is None:
+        from ...settings_manager import settings_manager
+        _analysis_cache = AnalysisCache(
+            similarity_threshold=float(settings_manager.get_value('setari_llm', 'analysis_cache_similarity', DEFAULT_SIMILARITY)),
+            max_new_cases=int(settings_manager.get_value('setari_llm', 'analysis_cache_max_new_cases', DEFAULT_MAX_NEW_CASES))
+        )
+    return _analysis_cache
@@ -0,0 +1,106 @@
+"""
+Prompt-budget packing of cases into analyzer chunks.
+
+Instead of fixed 50-case chunks (where cases past the prompt budget were silently
+dropped), each case is sized from its projected columns and cases are bin-packed
+(first-fit decreasing) into the fewest chunks that fit the prompt budget.
+"""
+import logging
+from typing import List, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Approximate characters per token for Romanian legal text on the Qwen-family
+# tokenizer used by the local models (diacritics and long words split often).
+CHARS_PER_TOKEN = 3.2
+
+# Local model context (see LLMClient.call_llm_local) and the share kept for the answer
+LOCAL_NUM_CTX = 8192
+LOCAL_OUTPUT_RESERVE_TOKENS = 2048
+
+# Historical prompt limit for the network (file-sharing) LLM
+NETWORK_PROMPT_MAX_CHARS = 30000
+
+# Space reserved for the prompt template around the case data
+TEMPLATE_RESERVE_CHARS = 2000
+
+# Upper bound on cases per chunk so the per-case answer list stays within the output budget
+MAX_CASES_PER_CHUNK = 50
+
+# JSON escaping (quotes, newlines) on top of the raw field lengths
+ESCAPE_OVERHEAD_RATIO = 1.05
+
+
+def estimate_tokens(chars: int) -> int:
+    """Estimates token count from a character count."""
+    return int(chars / CHARS_PER_TOKEN) + 1
+
+
+def prompt_max_chars(llm_mode: str) -> int:
+    """Maximum total prompt size in characters for the given LLM mode."""
+    if llm_mode == 'local':
+        return int((LOCAL_NUM_CTX - LOCAL_OUTPUT_RESERVE_TOKENS) * CHARS_PER_TOKEN)
+    return NETWORK_PROMPT_MAX_CHARS
+
+
+def case_budget_chars(max_chars: int, user_query: str) -> int:
+    """Characters available for case data once the task and template are accounted for."""
+    available = max_chars - len(f"TASK: {user_query}") - TEMPLATE_RESERVE_CHARS
+    return available if available > 0 else 5000
+
+
+def projected_case_chars(field_chars: int, columns: Sequence[str]) -> int:
+    """
+    Projected size of one case as formatted in the chunk prompt (indent=2 JSON).
+
+    Args:
+        field_chars: Sum of the lengths of the selected column values
+        columns: Selected column names (their keys are repeated for every case)
+    """
+    # '    "key": "",\n' per field, plus the id field and the object braces
+    key_overhead = sum(len(c) + 10 for c in columns)
+    return int(field_chars * ESCAPE_OVERHEAD_RATIO) + key_overhead + 30
+
+
+def pack_cases(
+    case_ids: Sequence[int],
+    case_sizes: Sequence[int],
+    budget_chars: int,
+    max_cases_per_chunk: int = MAX_CASES_PER_CHUNK
+) -> List[List[int]]:
+    """
+    Packs cases into the fewest chunks whose total size fits the budget.
+
+    First-fit decreasing: largest cases are placed first, each into the first chunk
+    with room. A case larger than the whole budget gets a chunk of its own; its text
+    fields are shortened to the budget when the chunk prompt is built.
+
+    Returns:
+        List of chunks (lists of case IDs); within a chunk IDs keep their original order
+    """
+    order = sorted(range(len(case_ids)), key=lambda i: case_sizes[i], reverse=True)
+
+    bins: List[List[int]] = []
+    remaining: List[int] = []
+
+    for i in order:
+        size = case_sizes[i]
+        for b, free in enumerate(remaining):
+            if size <= free and len(bins[b]) < max_cases_per_chunk:
+                bins[b].append(i)
+                remaining[b] -= size
+                break
+        else:
+            bins.append([i])
+            remaining.append(budget_chars - size)
+
+    # Keep the ranking order inside chunks and order chunks by their best-ranked case
+    for b in bins:
+        b.sort()
+    bins.sort(key=lambda b: b[0])
+
+    oversized = sum(1 for i in order if case_sizes[i] > budget_chars)
+    if oversized:
+        logger.warning(f"[PACKER] {oversized} cases exceed the prompt budget on their own ({budget_chars} chars)")
+
+    return [[case_ids[i] for i in b] for b in bins]
@@ -1,19 +1,68 @@
 import json
 import re
 import logging
-from typing import List, Dict, Tuple, Any
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Dict, Tuple, Any, Optional
 from sqlmodel import Session, text
+from .chunk_packer import case_budget_chars, projected_case_chars
+from .prompt_compactor import (
+    SOURCE_TEXT_CHARS, TEXT_COLUMNS, compact_case, compact_case_cache, field_legend, query_keywords
+)
+from .sql_guard import SqlGuard, get_sql_guard
 
 logger = logging.getLogger(__name__)
 
+# Discovery results per normalized SQL, shared by all fetchers in the process
+DISCOVERY_CACHE_TTL_SECONDS = 600
+DISCOVERY_CACHE_MAX_ENTRIES = 256
+
+_discovery_cache: "OrderedDict[Tuple[str, bool], Tuple[float, int, List[int]]]" = OrderedDict()
+_discovery_cache_lock = threading.Lock()
+
+_TRAILING_LIMIT_RE = re.compile(r"\s+LIMIT\s+(\d+)(?:\s+OFFSET\s+(\d+))?\s*;?\s*$", re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapses whitespace and drops a trailing semicolon (cache key for generated SQL)."""
+    return re.sub(r"\s+", " ", sql).strip().rstrip(";").strip()
+
+
 class DataFetcher:
     """Handles SQL execution and data retrieval."""
 
-    def __init__(self, session: Session):
+    def __init__(
+        self,
+        session: Session,
+        guard: Optional[SqlGuard] = None,
+        query_timeout: Optional[float] = None,
+        on_query_connection: Optional[Callable[[Any], None]] = None
+    ):
+        """
+        Args:
+            session: Session used for the app's own queries (chunk data, sizes)
+            guard: Guard for generated SQL (process-wide one by default)
+            query_timeout: Per-statement timeout for generated SQL, below the guard's own
+            on_query_connection: Receives the DBAPI connection of each generated query (for cancellation)
+        """
         self.session = session
+        self.guard = guard or get_sql_guard()
+        self.query_timeout = query_timeout
+        self.on_query_connection = on_query_connection
+
+    def execute_discovery_queries(self, strategy: Dict[str, Any], exact_count: bool = True) -> Tuple[int, List[int]]:
+        """
+        Executes generated queries to get count and ID list.
+
+        The ID query and the total are fetched in one statement (count(*) OVER ())
+        whenever the ID query can be wrapped; results are cached per normalized SQL.
 
-    def execute_discovery_queries(self, strategy: Dict[str, Any]) -> Tuple[int, List[int]]:
-        """Executes generated queries to get count and ID list."""
+        Args:
+            strategy: Strategy with count_query / id_list_query
+            exact_count: If False, a full ID page is counted from the EXPLAIN row
+                estimate instead of scanning every match
+        """
 
         if "precomputed_count" in strategy and "precomputed_ids" in strategy:
             logger.info(f"[DATA] Using precomputed results for {strategy.get('strategy_type')}")
@@ -23,26 +72,147 @@ class DataFetcher:
             raise ValueError("Strategia nu conține query-urile necesare.")
 
         count_sql = self._sanitize_sql_query(strategy['count_query'])
-        ids_sql = self._sanitize_sql_query(strategy['id_list_query'])
+        # Capped up front so the LIMIT seen by the estimate path is the one executed
+        ids_sql = self.guard.cap_rows(self._sanitize_sql_query(strategy['id_list_query']))
 
-        # Execute Count
+        cache_key = (normalize_sql(ids_sql) + " || " + normalize_sql(count_sql), exact_count)
+        cached = self._get_cached_discovery(cache_key)
+        if cached is not None:
+            logger.info(f"[DATA] Discovery cache hit: {cached[0]} total, {len(cached[1])} IDs")
+            return cached
+
+        start_time = time.monotonic()
+        result = None
+
+        if self._is_constant_query(count_sql):
+            # Count is a constant proxy (e.g. vector KNN): no need to scan for it
+            ids_list = self._fetch_ids(ids_sql)
+            result = (self._run_count(count_sql), ids_list)
+        elif exact_count:
+            result = self._fetch_ids_with_total(ids_sql)
+        else:
+            result = self._fetch_ids_with_estimate(ids_sql)
+
+        if result is None:
+            # Generated SQL could not be fused: run the two queries separately
+            result = (self._run_count(count_sql), self._fetch_ids(ids_sql))
+
+        logger.info(f"[DATA] Discovery: {result[0]} total, {len(result[1])} IDs in {time.monotonic() - start_time:.2f}s")
+        self._put_cached_discovery(cache_key, result)
+        return result
+
+    def blocuri_watermark(self) -> Optional[int]:
+        """Highest case id, used to detect that blocuri grew since something was cached."""
         try:
-            count_res = self.session.execute(text(count_sql)).scalar()
-            logger.info(f"[DATA] Count result: {count_res}")
+            return self.session.execute(text("SELECT max(id) FROM blocuri")).scalar()
         except Exception as e:
-            logger.error(f"Error executing COUNT query: {e}")
-            raise ValueError(f"Query COUNT invalid: {e}")
+            logger.warning(f"[DATA] Could not read blocuri watermark: {e}")
+            self.session.rollback()
+            return None
+
+    def estimate_row_count(self, sql: str) -> Optional[int]:
+        """Planner row estimate for a query (PostgreSQL EXPLAIN), or None if unavailable."""
+        return self.guard.estimate_rows(self.session, sql)
+
+    # --- Discovery helpers ---
+
+    def _fetch_ids_with_total(self, ids_sql: str) -> Optional[Tuple[int, List[int]]]:
+        """One statement for IDs and the total number of matches, or None if not fusable."""
+        base_sql, limit, offset = self._split_limit(ids_sql)
+
+        # A wrapped ORDER BY would have to sort every match instead of a top-N (or use a KNN index)
+        if re.search(r"\bORDER\s+BY\b", base_sql, re.IGNORECASE):
+            return None
+
+        fused_sql = f"SELECT q.*, count(*) OVER () AS discovery_total FROM ({base_sql}) AS q"
+        if limit is not None:
+            fused_sql += f" LIMIT {limit} OFFSET {offset}"
 
-        # Execute IDs
         try:
-            ids_res = self.session.execute(text(ids_sql)).scalars().all()
-            ids_list = list(ids_res)
+            rows = self.guard.fetch_rows(self.session, fused_sql, **self._guard_options())
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.warning(f"[DATA] Fused discovery query failed, using separate queries: {e}")
+            return None
+        if rows is None:
+            # Counting every match is over the cost budget: capped IDs + estimate instead
+            return self._fetch_ids_with_estimate(ids_sql)
+
+        ids_list = [row[0] for row in rows]
+        total = rows[0][-1] if rows else 0
+        return total, ids_list
+
+    def _fetch_ids_with_estimate(self, ids_sql: str) -> Optional[Tuple[int, List[int]]]:
+        """IDs plus an exact count for partial pages, or the planner estimate for full ones."""
+        base_sql, limit, offset = self._split_limit(ids_sql)
+        ids_list = self._fetch_ids(ids_sql)
+
+        if limit is None or len(ids_list) < limit:
+            return offset + len(ids_list), ids_list
+
+        estimate = self.estimate_row_count(base_sql)
+        if estimate is None:
+            return None
+        return max(estimate, len(ids_list)), ids_list
+
+    def _fetch_ids(self, ids_sql: str) -> List[int]:
+        try:
+            ids_list = self.guard.fetch_ids(self.session, ids_sql, **self._guard_options())
             logger.info(f"[DATA] Found {len(ids_list)} IDs")
+            return ids_list
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Error executing ID_LIST query: {e}")
             raise ValueError(f"Query ID_LIST invalid: {e}")
 
-        return count_res, ids_list
+    def _run_count(self, count_sql: str) -> int:
+        try:
+            count_res = self.guard.fetch_count(self.session, count_sql, **self._guard_options())
+            logger.info(f"[DATA] Count result: {count_res}")
+            return count_res
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Error executing COUNT query: {e}")
+            raise ValueError(f"Query COUNT invalid: {e}")
+
+    @staticmethod
+    def _split_limit(sql: str) -> Tuple[str, Optional[int], int]:
+        """Separates a trailing LIMIT n [OFFSET m] from a query."""
+        match = _TRAILING_LIMIT_RE.search(sql)
+        if not match:
+            return sql.rstrip().rstrip(";"), None, 0
+        return sql[:match.start()], int(match.group(1)), int(match.group(2) or 0)
+
+    @staticmethod
+    def _is_constant_query(sql: str) -> bool:
+        return not re.search(r"\bFROM\b", sql, re.IGNORECASE)
+
+    def _guard_options(self) -> Dict[str, Any]:
+        return {'timeout': self.query_timeout, 'on_connection': self.on_query_connection}
+
+    @staticmethod
+    def _get_cached_discovery(key: Tuple[str, bool]) -> Optional[Tuple[int, List[int]]]:
+        with _discovery_cache_lock:
+            entry = _discovery_cache.get(key)
+            if entry is None:
+                return None
+            stored_at, total, ids_list = entry
+            if time.monotonic() - stored_at > DISCOVERY_CACHE_TTL_SECONDS:
+                del _discovery_cache[key]
+                return None
+            _discovery_cache.move_to_end(key)
+            return total, list(ids_list)
+
+    @staticmethod
+    def _put_cached_discovery(key: Tuple[str, bool], result: Tuple[int, List[int]]):
+        with _discovery_cache_lock:
+            _discovery_cache[key] = (time.monotonic(), result[0], list(result[1]))
+            _discovery_cache.move_to_end(key)
+            while len(_discovery_cache) > DISCOVERY_CACHE_MAX_ENTRIES:
+                _discovery_cache.popitem(last=False)
 
     def _sanitize_sql_query(self, sql: str) -> str:
         """Sanitizes SQL query to fix common LLM generation errors."""
@@ -90,7 +260,7 @@ class DataFetcher:
 
         return sanitized
 
-    def fetch_chunk_data(self, ids: List[int], columns: List[str]) -> List[Dict]:
+    def fetch_chunk_data(self, ids: List[int], columns: List[str], max_text_chars: int = 4000) -> List[Dict]:
         """Smart Fetch: Extracts only specified columns for a list of IDs."""
         if not ids:
             return []
@@ -98,35 +268,7 @@ class DataFetcher:
         select_parts = ["id"]
         for col in columns:
             clean_col = col.replace("'", "")
-
-            # Determine the SQL expression for the column
-            if clean_col == 'denumire':
-                # Logic mirrored from frontend ResultItem.tsx: titlu || text_denumire_articol || denumire || Caz #ID
-                # Also include 'obiect' as a fallback if everything else is missing, as it often contains the case name type
-                expression = """
-                    COALESCE(
-                        NULLIF(obj->>'titlu', ''),
-                        NULLIF(obj->>'text_denumire_articol', ''),
-                        NULLIF(obj->>'denumire', ''),
-                        'Caz #' || id::text
-                    )
-                """
-            elif clean_col == 'solutia':
-                # Deprecated: User request to stop using this field as it is empty.
-                # Returning empty string to be safe.
-                expression = "''"
-            elif clean_col == 'text_situatia_de_fapt':
-                # Fallback chain for situation text
-                expression = "COALESCE(obj->>'text_situatia_de_fapt', obj->>'situatia_de_fapt', obj->>'situatie', '')"
-            else:
-                expression = f"obj->>'{clean_col}'"
-
-            # Apply truncation for long text fields to avoid LLM context overflow
-            # Added 'tip_solutie' as it contains the actual solution text now
-            if clean_col in ['considerente_speta', 'text_situatia_de_fapt', 'tip_solutie', 'text_individualizare', 'argumente_instanta', 'text_doctrina', 'text_ce_invatam']:
-                select_parts.append(f"substring({expression} from 1 for 4000) as \"{clean_col}\"")
-            else:
-                select_parts.append(f"{expression} as \"{clean_col}\"")
+            select_parts.append(f"{self._column_expression(clean_col, max_text_chars)} as \"{clean_col}\"")
 
         select_clause = ", ".join(select_parts)
         ids_str = ",".join(map(str, ids))
@@ -136,31 +278,154 @@ class DataFetcher:
         results = self.session.execute(text(sql)).mappings().all()
         return [dict(r) for r in results]
 
+    def fetch_compact_chunk_data(self, ids: List[int], columns: List[str], user_query: str, field_chars: int) -> List[Dict]:
+        """
+        Compacted cases (aliased fields, keyword-focused texts; see prompt_compactor), in `ids` order.
+
+        Cases compacted before for the same columns and query keywords come from the
+        cache; only the others are fetched.
+        """
+        clean_cols = [col.replace("'", "") for col in columns]
+        legend = field_legend(clean_cols)
+        keywords = query_keywords(user_query)
+
+        compacted: Dict[int, Dict] = {}
+        missing = []
+        for cid in ids:
+            cached = compact_case_cache.get(compact_case_cache.make_key(cid, clean_cols, keywords, field_chars))
+            if cached is None:
+                missing.append(cid)
+            else:
+                compacted[cid] = cached
+
+        for row in self.fetch_chunk_data(missing, clean_cols, max_text_chars=SOURCE_TEXT_CHARS):
+            case = compact_case(row, legend, keywords, field_chars)
+            compact_case_cache.put(compact_case_cache.make_key(row['id'], clean_cols, keywords, field_chars), case)
+            compacted[row['id']] = case
+
+        if missing:
+            logger.info(f"[DATA] Compacted {len(missing)} cases ({len(ids) - len(missing)} from cache)")
+        return [compacted[cid] for cid in ids if cid in compacted]
+
+    def fetch_case_sizes(self, ids: List[int], columns: List[str], field_chars: Optional[int] = None) -> Dict[int, int]:
+        """
+        Returns the projected prompt size (chars) of each case without fetching the texts.
+
+        Uses the same column expressions (and truncation) as fetch_chunk_data, but only
+        transfers lengths, so it is cheap enough to run over every planned case. With
+        `field_chars`, sizes are those of the compacted form (texts capped at that
+        budget, aliased keys).
+        """
+        if not ids:
+            return {}
+
+        clean_cols = [col.replace("'", "") for col in columns]
+        if field_chars:
+            length_parts = [
+                f"LEAST(COALESCE(length({self._column_expression(c, SOURCE_TEXT_CHARS)}), 0), {int(field_chars)})"
+                if c in TEXT_COLUMNS else f"COALESCE(length({self._column_expression(c)}), 0)"
+                for c in clean_cols
+            ]
+            keys = list(field_legend(clean_cols))
+        else:
+            length_parts = [f"COALESCE(length({self._column_expression(c)}), 0)" for c in clean_cols]
+            keys = clean_cols
+        length_sum = " + ".join(length_parts) if length_parts else "0"
+        ids_str = ",".join(map(str, ids))
+
+        sql = f"SELECT id, ({length_sum}) AS chars FROM blocuri WHERE id IN ({ids_str})"
+        rows = self.session.execute(text(sql)).all()
+
+        return {row[0]: projected_case_chars(row[1] or 0, keys) for row in rows}
+
+    def _column_expression(self, clean_col: str, max_text_chars: int = 4000) -> str:
+        """SQL expression used to project a column from blocuri.obj, with truncation for long texts."""
+        # Determine the SQL expression for the column
+        if clean_col == 'denumire':
+            # Logic mirrored from frontend ResultItem.tsx: titlu || text_denumire_articol || denumire || Caz #ID
+            # Also include 'obiect' as a fallback if everything else is missing, as it often contains the case name type
+            expression = """
+                COALESCE(
+                    NULLIF(obj->>'titlu', ''),
+                    NULLIF(obj->>'text_denumire_articol', ''),
+                    NULLIF(obj->>'denumire', ''),
+                    'Caz #' || id::text
+                )
+            """
+        elif clean_col == 'solutia':
+            # Deprecated: User request to stop using this field as it is empty.
+            # Returning empty string to be safe.
+            expression = "''"
+        elif clean_col == 'text_situatia_de_fapt':
+            # Fallback chain for situation text
+            expression = "COALESCE(obj->>'text_situatia_de_fapt', obj->>'situatia_de_fapt', obj->>'situatie', '')"
+        else:
+            expression = f"obj->>'{clean_col}'"
+
+        # Apply truncation for long text fields to avoid LLM context overflow
+        # Added 'tip_solutie' as it contains the actual solution text now
+        if clean_col in TEXT_COLUMNS:
+            return f"substring({expression} from 1 for {int(max_text_chars)})"
+        return expression
+
     def validate_and_truncate_data(self, filtered_data: List[Dict], user_query: str, max_chars: int = 30000) -> Tuple[List[Dict], Dict[str, Any]]:
-        """Validates and truncates data to fit within max_chars."""
-        base_prompt = f"TASK: {user_query}"
-        base_size = len(base_prompt)
-        available_space = max_chars - base_size - 2000
-        if available_space <= 0: available_space = 5000
+        """
+        Validates and truncates data to fit within max_chars.
+
+        The first case is always kept: if it alone exceeds the budget, its longest
+        text fields are shortened to fit, so a packed chunk never reaches the LLM empty.
+        Cases that do not fit are listed in the metadata as uncovered.
+        """
+        available_space = case_budget_chars(max_chars, user_query)
 
         truncated_data = []
         current_size = 0
         cases_included = 0
+        shrunk_case_ids = []
 
         for case in filtered_data:
             case_json = json.dumps(case, ensure_ascii=False, separators=(',', ':'))
             case_size = len(case_json)
 
-            if current_size + case_size + 10 <= available_space:
+            if not truncated_data and case_size + 10 > available_space:
+                case = self._shrink_case(case, available_space - 10)
+                case_size = len(json.dumps(case, ensure_ascii=False, separators=(',', ':')))
+                shrunk_case_ids.append(case.get('id'))
+
+            if current_size + case_size + 10 <= available_space or not truncated_data:
                 truncated_data.append(case)
                 current_size += case_size + 10
                 cases_included += 1
             else:
                 break
 
+        uncovered_case_ids = [case.get('id') for case in filtered_data[cases_included:]]
+        if uncovered_case_ids:
+            logger.warning(f"[DATA] Prompt budget reached: {len(uncovered_case_ids)} of {len(filtered_data)} cases dropped from chunk")
+        if shrunk_case_ids:
+            logger.warning(f"[DATA] Case {shrunk_case_ids[0]} exceeds the prompt budget alone; its texts were shortened")
+
         metadata = {
             'total_cases_filtered': len(filtered_data),
             'cases_included_in_prompt': cases_included,
-            'truncated': cases_included < len(filtered_data)
+            'truncated': cases_included < len(filtered_data),
+            'uncovered_case_ids': uncovered_case_ids,
+            'shortened_case_ids': shrunk_case_ids
         }
         return truncated_data, metadata
+
+    @staticmethod
+    def _shrink_case(case: Dict[str, Any], max_size: int) -> Dict[str, Any]:
+        """Shortens the longest text fields of a case until its JSON fits max_size."""
+        shrunk = dict(case)
+        while True:
+            excess = len(json.dumps(shrunk, ensure_ascii=False, separators=(',', ':'))) - max_size
+            if excess <= 0:
+                return shrunk
+            texts = [k for k, v in shrunk.items() if k != 'id' and isinstance(v, str) and v]
+            if not texts:
+                return shrunk
+            key = max(texts, key=lambda k: len(shrunk[k]))
+            value = shrunk[key]
+            keep = len(value) - excess - 3
+            shrunk[key] = value[:keep] + "..." if keep > 0 else ""
@@ -0,0 +1,319 @@
+"""
+Incremental JSON helpers for streamed LLM output.
+
+`TolerantJsonParser` builds the response object while tokens arrive, in a
+single linear pass, and repairs the defects LLMs commonly produce:
+- preamble/fences/separator lines around the object, [cite_start]/[cite_end] markers
+- trailing or missing commas, missing colons, unquoted keys, Python literals
+- raw newlines inside strings, // and /* */ comments
+- truncated output: unclosed strings, arrays and objects are closed by finish()
+
+Schema checks run as each container closes (see `validators`), so no second
+walk over the parsed object is needed.
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+_WHITESPACE = ' \t\r\n'
+_STRING_STOP = re.compile(r'["\\]')
+_NUMBER = re.compile(r'[-+0-9.eE]+')
+_BARE_WORD = re.compile(r'[A-Za-z_][A-Za-z0-9_\-]*')
+_LITERALS = {'true': True, 'false': False, 'null': None, 'True': True, 'False': False, 'None': None}
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '/': '/', '\\': '\\', '"': '"'}
+_IGNORED_MARKERS = ('[cite_start]', '[cite_end]')
+_MARKER_MAX_LEN = max(len(m) for m in _IGNORED_MARKERS)
+
+Validator = Callable[[Any], Any]
+
+
+class _Frame:
+    """An open object or array."""
+
+    __slots__ = ('is_object', 'value', 'key', 'state', 'path')
+
+    def __init__(self, is_object: bool, path: str):
+        self.is_object = is_object
+        self.value: Any = {} if is_object else []
+        self.key: Optional[str] = None
+        # object: key -> colon -> value -> comma; array: value -> comma
+        self.state = 'key' if is_object else 'value'
+        self.path = path
+
+
+class TolerantJsonParser:
+    """
+    Streaming, error-tolerant parser for the first top-level JSON object in a text.
+
+    Args:
+        validators: Maps an array element path to a function that checks/normalizes
+            each element as it completes and returns None to drop it. Paths are
+            keys joined by '.', with '[]' for array elements, e.g. 'charts[]' for
+            the items of the top-level "charts" array.
+
+    Usage:
+        parser = TolerantJsonParser()
+        for piece in stream:
+            if parser.feed(piece):
+                break            # top-level object closed
+        data = parser.finish()   # also recovers truncated output
+
+    Attributes:
+        start / end: Offsets of the object in the fed text (end is None until it closes)
+        repairs: Defects fixed so far, for logging
+    """
+
+    def __init__(self, validators: Optional[Dict[str, Validator]] = None):
+        self.validators = validators or {}
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self.repairs: List[str] = []
+        self._buf = ''
+        self._offset = 0
+        self._stack: List[_Frame] = []
+        self._root: Optional[Dict[str, Any]] = None
+        self._string: Optional[List[str]] = None
+        self._string_is_key = False
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    def feed(self, text: str) -> bool:
+        """Consumes the next piece of output. Returns True once the object is complete."""
+        if self.end is not None:
+            return True
+        self._buf += text
+        self._consume(final=False)
+        return self.end is not None
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """Ends the input: closes anything left open. Returns the object, or None if none started."""
+        if self.end is None:
+            self._consume(final=True)
+        if self.end is None and self._stack:
+            if self._string is not None:
+                self.repairs.append('unclosed string')
+                self._end_string()
+            self.repairs.append('truncated output')
+            while self._stack:
+                self._close()
+        return self._root
+
+    @classmethod
+    def parse(cls, text: str, validators: Optional[Dict[str, Validator]] = None) -> Optional[Dict[str, Any]]:
+        parser = cls(validators)
+        parser.feed(text)
+        return parser.finish()
+
+    # --- Helpers ---
+
+    def _consume(self, final: bool):
+        buf = self._buf
+        n = len(buf)
+        i = 0
+
+        while i < n and self.end is None:
+            if self._string is not None:
+                match = _STRING_STOP.search(buf, i)
+                if match is None:
+                    self._string.append(buf[i:])
+                    i = n
+                    break
+                j = match.start()
+                self._string.append(buf[i:j])
+                if buf[j] == '"':
+                    i = j + 1
+                    self._end_string()
+                    continue
+                # Backslash escape: may need more input to complete
+                if j + 1 >= n:
+                    i = j
+                    break
+                esc = buf[j + 1]
+                if esc == 'u':
+                    if j + 6 > n:
+                        if final:
+                            i = n
+                        else:
+                            i = j
+                        break
+                    try:
+                        self._string.append(chr(int(buf[j + 2:j + 6], 16)))
+                    except ValueError:
+                        self._string.append(buf[j + 2:j + 6])
+                    i = j + 6
+                else:
+                    self._string.append(_ESCAPES.get(esc, esc))
+                    i = j + 2
+                continue
+
+            if not self._stack:
+                # Preamble (prose, fences, separators) before the object
+                j = buf.find('{', i)
+                if j == -1:
+                    i = n
+                    break
+                self.start = self._offset + j
+                self._stack.append(_Frame(True, ''))
+                i = j + 1
+                continue
+
+            c = buf[i]
+            frame = self._stack[-1]
+
+            if c in _WHITESPACE:
+                i += 1
+            elif c == '"':
+                self._begin_string(frame)
+                i += 1
+            elif c == '[' and buf.startswith('[cite', i):
+                # Citation markers some models interleave with the JSON
+                if n - i < _MARKER_MAX_LEN and not final:
+                    break
+                marker = next((m for m in _IGNORED_MARKERS if buf.startswith(m, i)), None)
+                if marker:
+                    i += len(marker)
+                else:
+                    self._open(frame, False)
+                    i += 1
+            elif c in '{[':
+                if frame.is_object and frame.state in ('key', 'comma'):
+                    # A container where a key belongs is noise
+                    self.repairs.append('stray bracket')
+                else:
+                    self._open(frame, c == '{')
+                i += 1
+            elif c in '}]':
+                i += 1
+                self._close()
+                if not self._stack:
+                    self.end = self._offset + i
+            elif c == ':':
+                if frame.is_object and frame.state == 'colon':
+                    frame.state = 'value'
+                i += 1
+            elif c == ',':
+                if frame.state == 'comma':
+                    frame.state = 'key' if frame.is_object else 'value'
+                i += 1
+            elif c == '/' and i + 1 == n and not final:
+                # Possibly the first half of a comment opener
+                break
+            elif c == '/' and i + 1 < n and buf[i + 1] in '/*':
+                closing = '\n' if buf[i + 1] == '/' else '*/'
+                j = buf.find(closing, i + 2)
+                if j == -1:
+                    if not final:
+                        break
+                    i = n
+                else:
+                    i = j + len(closing)
+            elif c == '-' or c.isdigit():
+                match = _NUMBER.match(buf, i)
+                if match.end() == n and not final:
+                    break
+                self._scalar(frame, self._to_number(match.group()), match.group())
+                i = match.end()
+            elif c.isalpha() or c == '_':
+                match = _BARE_WORD.match(buf, i)
+                if match.end() == n and not final:
+                    break
+                word = match.group()
+                if word in _LITERALS and not (frame.is_object and frame.state in ('key', 'comma')):
+                    self._scalar(frame, _LITERALS[word], word)
+                else:
+                    self.repairs.append('unquoted token')
+                    self._scalar(frame, word, word)
+                i = match.end()
+            else:
+                # Backticks, stray punctuation: not part of any JSON value
+                i += 1
+
+        self._buf = buf[i:]
+        self._offset += i
+
+    def _begin_string(self, frame: _Frame):
+        if frame.is_object and frame.state == 'comma':
+            self.repairs.append('missing comma')
+            frame.state = 'key'
+        elif not frame.is_object and frame.state == 'comma':
+            self.repairs.append('missing comma')
+            frame.state = 'value'
+        self._string = []
+        self._string_is_key = frame.is_object and frame.state == 'key'
+
+    def _end_string(self):
+        text = ''.join(self._string)
+        self._string = None
+        if any('\ud800' <= ch <= '\udfff' for ch in text):
+            # \\u escapes of a surrogate pair
+            text = text.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
+        frame = self._stack[-1]
+        if self._string_is_key:
+            frame.key = text
+            frame.state = 'colon'
+        else:
+            self._add_value(frame, text)
+
+    def _scalar(self, frame: _Frame, value: Any, raw: str):
+        if frame.is_object and frame.state in ('key', 'comma'):
+            if frame.state == 'comma':
+                self.repairs.append('missing comma')
+            frame.key = raw
+            frame.state = 'colon'
+        else:
+            self._add_value(frame, value)
+
+    def _open(self, frame: _Frame, is_object: bool):
+        if frame.is_object:
+            if frame.state == 'colon':
+                self.repairs.append('missing colon')
+            path = f"{frame.path}.{frame.key}" if frame.path else str(frame.key)
+        else:
+            if frame.state == 'comma':
+                self.repairs.append('missing comma')
+            path = f"{frame.path}[]"
+        frame.state = 'value'
+        self._stack.append(_Frame(is_object, path))
+
+    def _close(self):
+        frame = self._stack.pop()
+        if frame.is_object and frame.key is not None and frame.state in ('colon', 'value'):
+            self.repairs.append('dangling key')
+        if not self._stack:
+            self._root = frame.value
+            return
+        self._add_value(self._stack[-1], frame.value)
+
+    def _add_value(self, frame: _Frame, value: Any):
+        if frame.is_object:
+            if frame.key is None:
+                # Value without a key (e.g. after a dropped stray token)
+                self.repairs.append('value without key')
+            else:
+                if frame.state == 'colon':
+                    self.repairs.append('missing colon')
+                frame.value[frame.key] = value
+            frame.key = None
+        else:
+            if frame.state == 'comma':
+                self.repairs.append('missing comma')
+            validator = self.validators.get(f"{frame.path}[]")
+            if validator is None:
+                frame.value.append(value)
+            else:
+                value = validator(value)
+                if value is not None:
+                    frame.value.append(value)
+        frame.state = 'comma'
+
+    @staticmethod
+    def _to_number(token: str) -> Any:
+        try:
+            return int(token)
+        except ValueError:
+            pass
+        try:
+            return float(token)
+        except ValueError:
+            return token
@@ -0,0 +1,191 @@
+"""
+Persistent cache for LLM responses.
+
+Entries are keyed by a hash of the normalized prompt, the model name and the
+generation options, so re-running the same plan or decomposition returns the
+stored answer instead of calling the LLM again.
+
+Storage: analyzer_plans/llm_cache.db (SQLite, WAL mode, zlib-compressed values)
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# After exceeding the size cap, evict down to this share of it
+EVICT_TARGET_RATIO = 0.9
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Trims and collapses whitespace runs so formatting-only differences share a key."""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+class LLMResponseCache:
+    """
+    Content-addressed, size-bounded LLM response cache.
+
+    Expired entries are ignored on read and purged during eviction; when the
+    total stored size exceeds `max_bytes`, least recently used entries go first.
+    Hit/miss counters are per process.
+    """
+
+    def __init__(
+        self,
+        storage_dir: str = "analyzer_plans",
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.db_file = os.path.join(storage_dir, "llm_cache.db")
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'bypassed': 0}
+        os.makedirs(storage_dir, exist_ok=True)
+        self._init_db()
+
+    @staticmethod
+    def make_key(prompt: str, model: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """Hash of normalized prompt + model + generation options."""
+        material = json.dumps(
+            [normalize_prompt(prompt), model, options or {}],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response, or None on a miss or expired entry."""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or row[1] <= now:
+                    self.stats['misses'] += 1
+                    return None
+                conn.execute("UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self.stats['hits'] += 1
+            return zlib.decompress(row[0]).decode('utf-8')
+        except (sqlite3.Error, zlib.error) as e:
+            logger.error(f"LLM cache read failed: {e}")
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key: str, model: str, response: str, ttl_seconds: Optional[int] = None):
+        """Stores a response and evicts old entries if the cache is over its size cap."""
+        now = time.time()
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        value = zlib.compress(response.encode('utf-8'))
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    """INSERT OR REPLACE INTO responses
+                       (key, model, value, size, created_at, last_access, expires_at, hits)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, 0)""",
+                    (key, model, value, len(value), now, now, now + ttl)
+                )
+                self.stats['stores'] += 1
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.error(f"LLM cache write failed: {e}")
+
+    def delete(self, key: str) -> bool:
+        """Removes an entry (e.g. a response the caller rejected); True if one was stored."""
+        try:
+            with self._connect() as conn:
+                return conn.execute("DELETE FROM responses WHERE key = ?", (key,)).rowcount > 0
+        except sqlite3.Error as e:
+            logger.error(f"LLM cache delete failed: {e}")
+            return False
+
+    def record_bypass(self):
+        """Counts a call that skipped the cache (per-call opt-out or cache disabled)."""
+        self.stats['bypassed'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses']
+        stats: Dict[str, Any] = dict(self.stats)
+        stats['hit_rate'] = round(self.stats['hits'] / lookups, 3) if lookups else 0.0
+        try:
+            with self._connect() as conn:
+                entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            stats['entries'] = entries
+            stats['bytes'] = total
+        except sqlite3.Error:
+            pass
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+    # --- Helpers ---
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_expires ON responses (expires_at)")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drops expired entries, then least recently used ones until under the cap."""
+        removed = conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,)).rowcount
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            target = int(self.max_bytes * EVICT_TARGET_RATIO)
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                if total <= target:
+                    break
+                victims.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            removed += len(victims)
+
+        if removed:
+            self.stats['evictions'] += removed
+            logger.info(f"LLM cache evicted {removed} entries")
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Returns the process-wide cache, created on first use with the configured size cap."""
+    global _llm_cache
+    if _llm_cache is None:
+        from ...settings_manager import settings_manager
+        max_mb = settings_manager.get_value('setari_llm', 'llm_cache_max_mb', DEFAULT_MAX_BYTES // (1024 * 1024))
+        _llm_cache = LLMResponseCache(max_bytes=int(max_mb) * 1024 * 1024)
+    return _llm_cache
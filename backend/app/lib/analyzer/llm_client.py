@@ -1,26 +1,176 @@
+import asyncio
 import json
 import logging
-import re
 import os
-from typing import Dict, Any, Optional, Tuple
+import time
+import weakref
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Any, Optional, Tuple
 
 # Correct imports assuming this file is backend/app/lib/analyzer/llm_client.py
 # NetworkFileSaver is in backend/app/lib/network_file_saver.py
 # settings_manager is in backend/app/settings_manager.py
 from ...settings_manager import settings_manager
 from ..network_file_saver import NetworkFileSaver
+from .llm_cache import get_llm_cache
+from ...logic.single_flight import llm_flight
+from .json_stream import TolerantJsonParser
 
 logger = logging.getLogger(__name__)
 
+# Cache identity of the network (file-sharing) LLM; it does not expose a model name
+NETWORK_MODEL_NAME = "network"
+LOCAL_MODEL_NAME = "verdict-line"
+
+# Minimum seconds between streaming progress reports
+PROGRESS_INTERVAL = 1.0
+
+# Objects parsed while streaming, handed to parse_json_response for the same content
+_PARSED_STREAMS_MAX = 32
+_parsed_streams: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+# Cache keys of recently served responses, so a caller rejecting a response can drop its entry
+_SERVED_KEYS_MAX = 256
+_served_keys: "OrderedDict[str, str]" = OrderedDict()
+
+# One pooled keep-alive client per event loop (httpx clients are bound to their loop)
+_http_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _get_http_client():
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=8, keepalive_expiry=120)
+        )
+        _http_clients[loop] = client
+    return client
+
+def _validate_chart(chart: Any) -> Optional[Dict[str, Any]]:
+    """Keeps charts with type/title and equal-length labels/values; values coerced to numbers."""
+    if not isinstance(chart, dict):
+        return None
+
+    if not all(k in chart for k in ["type", "title", "data"]):
+        logger.warning(f"Skipping chart missing required fields: {chart.get('title', 'Unknown')}")
+        return None
+
+    chart_data = chart["data"]
+    if not isinstance(chart_data, dict):
+        logger.warning(f"Skipping chart with invalid data object: {chart.get('title')}")
+        return None
+
+    if "labels" not in chart_data or "values" not in chart_data:
+        logger.warning(f"Skipping chart missing labels/values: {chart.get('title')}")
+        return None
+
+    labels = chart_data["labels"]
+    values = chart_data["values"]
+
+    if not isinstance(labels, list) or not isinstance(values, list):
+        logger.warning(f"Skipping chart with non-list labels/values: {chart.get('title')}")
+        return None
+
+    if len(labels) != len(values):
+        logger.warning(f"Skipping chart with mismatched labels/values length: {chart.get('title')}")
+        return None
+
+    # Ensure values are numeric
+    numeric_values = []
+    for v in values:
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            numeric_values.append(v)
+        elif isinstance(v, str) and v.replace('.', '', 1).isdigit():
+            numeric_values.append(float(v))
+        else:
+            numeric_values.append(0)  # Fallback
+
+    chart_data["values"] = numeric_values
+    return chart
+
+
+def _validate_table(table: Any) -> Optional[Dict[str, Any]]:
+    """Keeps tables with title/columns/rows, dropping rows whose width does not match the columns."""
+    if not isinstance(table, dict):
+        return None
+
+    if not all(k in table for k in ["title", "columns", "rows"]):
+        logger.warning(f"Skipping table missing required fields: {table.get('title', 'Unknown')}")
+        return None
+
+    columns = table["columns"]
+    rows = table["rows"]
+
+    if not isinstance(columns, list) or not isinstance(rows, list):
+        return None
+
+    col_count = len(columns)
+    valid_rows = []
+    for row in rows:
+        if isinstance(row, list) and len(row) == col_count:
+            valid_rows.append(row)
+        else:
+            logger.warning(f"Skipping malformed row in table: {table.get('title')}")
+
+    table["rows"] = valid_rows
+    return table
+
+
+# Applied to each element of the top-level "charts" / "tables" arrays as it is parsed
+RESPONSE_VALIDATORS = {
+    "charts[]": _validate_chart,
+    "tables[]": _validate_table
+}
+
+
 class LLMClient:
     """Handles interaction with the LLM via NetworkFileSaver."""
 
     @staticmethod
-    async def call_llm(prompt: str, timeout: int = 600, label: str = "LLM Call", filename_suffix: str = "") -> Tuple[bool, str, str]:
+    async def call_llm(
+        prompt: str,
+        timeout: int = 600,
+        label: str = "LLM Call",
+        filename_suffix: str = "",
+        use_cache: bool = True
+    ) -> Tuple[bool, str, str]:
         """
         Sends prompt to LLM and waits for response.
-        Returns: (success, content, response_path)
+
+        Args:
+            use_cache: False for calls that must reach the LLM (e.g. retries of a bad answer)
+
+        Returns: (success, content, response_path); response_path is "" for cache hits
         """
+        request_key, cache_key = LLMClient._request_keys(prompt, NETWORK_MODEL_NAME, {}, use_cache)
+        if cache_key:
+            cached = get_llm_cache().get(cache_key)
+            if cached is not None:
+                logger.info(f"[{label}] ✓ LLM cache hit ({len(cached)} chars)")
+                LLMClient._remember_served(cached, cache_key)
+                return True, cached, ""
+
+        if request_key:
+            # Identical prompts sent concurrently share one round trip
+            return await llm_flight.do(
+                (NETWORK_MODEL_NAME, request_key),
+                lambda: LLMClient._call_network(prompt, timeout, label, filename_suffix, cache_key)
+            )
+
+        return await LLMClient._call_network(prompt, timeout, label, filename_suffix, None)
+
+    @staticmethod
+    async def _call_network(
+        prompt: str,
+        timeout: int,
+        label: str,
+        filename_suffix: str,
+        cache_key: Optional[str]
+    ) -> Tuple[bool, str, str]:
+        """Saves the prompt on the share and waits for the answer file."""
         retea_host = settings_manager.get_value('setari_retea', 'retea_host', '')
         retea_folder = settings_manager.get_value('setari_retea', 'retea_folder_partajat', '')
 
@@ -41,8 +191,7 @@ class LLMClient:
 
         poll_success, poll_content, response_path = await NetworkFileSaver.poll_for_response(
             saved_path=saved_path,
-            timeout_seconds=timeout,
-            poll_interval=5
+            timeout_seconds=timeout
         )
 
         if not poll_success:
@@ -55,56 +204,159 @@ class LLMClient:
              NetworkFileSaver.delete_response_file(response_path)
              return False, "ECHO DETECTED", response_path
 
+        if cache_key:
+            LLMClient._cache_store(cache_key, NETWORK_MODEL_NAME, poll_content)
         return True, poll_content, response_path
 
     @staticmethod
-    async def call_llm_local(prompt: str, timeout: int = 180, label: str = "LLM Call") -> Tuple[bool, str, str]:
+    async def call_llm_local(
+        prompt: str,
+        timeout: int = 180,
+        label: str = "LLM Call",
+        use_cache: bool = True,
+        progress_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Tuple[bool, str, str]:
         """
         Sends prompt to local GPU-accelerated LLM (verdict-ro:latest).
         Alternative to network file sharing for faster responses.
 
+        The generation is streamed over a shared keep-alive connection and cut off
+        as soon as a complete JSON object has been received.
+
+        Args:
+            use_cache: False for calls that must reach the LLM (e.g. retries of a bad answer)
+            progress_callback: Awaited about once a second with token count and tokens/sec
+
         Returns: (success, content, empty_path)
         """
-        import httpx
-
         logger.info(f"[{label}] Using LOCAL GPU LLM (verdict-ro:latest)")
 
+        # Prepare payload with optimized GPU parameters
+        payload = {
+            "model": LOCAL_MODEL_NAME,
+            "prompt": prompt,
+            "format": "json",
+            "stream": True,
+            "keep_alive": "5m",       # Unload model after 5 minutes
+            "options": {
+                "num_ctx": 8192,         # STRICT LIMIT 8k for VRAM Stability
+                "temperature": 0.1,      # Low temperature for precision
+                "top_p": 0.9,           # Nucleus sampling
+                "top_k": 40,            # Top-k sampling
+                "repeat_penalty": 1.1   # Avoid repetition
+            }
+        }
+
+        # Everything except the prompt that changes the generated text is part of the key
+        cache_options = {"format": payload["format"], **payload["options"]}
+        request_key, cache_key = LLMClient._request_keys(prompt, LOCAL_MODEL_NAME, cache_options, use_cache)
+        if cache_key:
+            cached = get_llm_cache().get(cache_key)
+            if cached is not None:
+                logger.info(f"[{label}] ✓ LLM cache hit ({len(cached)} chars)")
+                LLMClient._remember_served(cached, cache_key)
+                return True, cached, ""
+
+        if request_key:
+            # Identical prompts sent concurrently share one GPU generation
+            return await llm_flight.do(
+                (LOCAL_MODEL_NAME, request_key),
+                lambda: LLMClient._call_local(payload, timeout, label, cache_key, progress_callback)
+            )
+
+        return await LLMClient._call_local(payload, timeout, label, None, progress_callback)
+
+    @staticmethod
+    async def _call_local(
+        payload: Dict[str, Any],
+        timeout: int,
+        label: str,
+        cache_key: Optional[str],
+        progress_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Tuple[bool, str, str]:
+        """Streams a generation from the local Ollama server."""
+        import httpx
+
         try:
             # Get LLM URL from config
             llm_url = settings_manager.get_value('setari_llm', 'llm_url', 'http://192.168.1.30:11434/api/generate')
 
-            # Prepare payload with optimized GPU parameters
-            payload = {
-                "model": "verdict-line",
-                "prompt": prompt,
-                "format": "json",
-                "stream": False,
-                "keep_alive": "5m",       # Unload model after 5 minutes
-                "options": {
-                    "num_ctx": 8192,         # STRICT LIMIT 8k for VRAM Stability
-                    "temperature": 0.1,      # Low temperature for precision
-                    "top_p": 0.9,           # Nucleus sampling
-                    "top_k": 40,            # Top-k sampling
-                    "repeat_penalty": 1.1   # Avoid repetition
-                }
-            }
-
             logger.info(f"[{label}] Sending request to {llm_url}...")
 
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.post(llm_url, json=payload)
-                response.raise_for_status()
-                result = response.json()
-
-                content = result.get("response", "")
-
-                if not content:
-                    logger.error(f"[{label}] Empty response from local LLM")
-                    return False, "Empty response from local LLM", ""
-
-                logger.info(f"[{label}] ✓ Local LLM response received ({len(content)} chars)")
-                return True, content, ""  # No file path for local LLM
-
+            start_time = time.monotonic()
+            first_token_at = None
+            last_report = start_time
+            tokens = 0
+            parts = []
+            parser = TolerantJsonParser(validators=RESPONSE_VALIDATORS)
+            final_stats: Dict[str, Any] = {}
+
+            # timeout bounds the whole generation, not just each read
+            async with asyncio.timeout(timeout):
+                client = _get_http_client()
+                async with client.stream("POST", llm_url, json=payload, timeout=httpx.Timeout(timeout, connect=10)) as response:
+                    response.raise_for_status()
+
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise RuntimeError(chunk["error"])
+
+                        piece = chunk.get("response", "")
+                        if piece:
+                            tokens += 1
+                            if first_token_at is None:
+                                first_token_at = time.monotonic()
+                            parts.append(piece)
+
+                        if chunk.get("done"):
+                            final_stats = chunk
+                            break
+
+                        if piece and parser.feed(piece):
+                            # Complete JSON object: closing the stream stops the generation
+                            logger.info(f"[{label}] JSON object complete after {tokens} tokens, stopping stream")
+                            break
+
+                        now = time.monotonic()
+                        if progress_callback and now - last_report >= PROGRESS_INTERVAL:
+                            last_report = now
+                            elapsed = now - (first_token_at or start_time)
+                            await progress_callback({
+                                "llm_label": label,
+                                "llm_tokens": tokens,
+                                "llm_tokens_per_second": round(tokens / elapsed, 1) if elapsed > 0 else 0.0
+                            })
+
+            content = "".join(parts)
+            if parser.complete:
+                content = content[:parser.end]
+                LLMClient._remember_parsed(content, parser.finish())
+
+            if not content:
+                logger.error(f"[{label}] Empty response from local LLM")
+                return False, "Empty response from local LLM", ""
+
+            total = time.monotonic() - start_time
+            if final_stats.get("eval_count") and final_stats.get("eval_duration"):
+                rate = final_stats["eval_count"] / (final_stats["eval_duration"] / 1e9)
+            else:
+                gen_time = time.monotonic() - (first_token_at or start_time)
+                rate = tokens / gen_time if gen_time > 0 else 0.0
+            ttft = (first_token_at - start_time) if first_token_at else total
+            logger.info(
+                f"[{label}] ✓ Local LLM response received ({len(content)} chars, {tokens} tokens, "
+                f"first token {ttft:.2f}s, {rate:.1f} tok/s, total {total:.1f}s)"
+            )
+            if cache_key:
+                LLMClient._cache_store(cache_key, LOCAL_MODEL_NAME, content)
+            return True, content, ""  # No file path for local LLM
+
+        except TimeoutError:
+            logger.error(f"[{label}] Local LLM did not finish within {timeout}s")
+            return False, f"Timeout: local LLM did not finish within {timeout}s", ""
         except httpx.HTTPError as e:
             logger.error(f"[{label}] HTTP error calling local LLM: {e}")
             return False, f"HTTP error: {str(e)}", ""
@@ -112,45 +364,26 @@ class LLMClient:
             logger.error(f"[{label}] Error calling local LLM: {e}", exc_info=True)
             return False, f"Error: {str(e)}", ""
 
-
     @staticmethod
     def parse_json_response(content: str) -> Dict[str, Any]:
-        """Parses JSON response from LLM, cleaning markdown fences and headers."""
-        cleaned = content.strip()
-
-        # Remove markdown code fences - more robust patterns
-        # Handle cases like: ```json\n{...}\n``` or ```\n{...}\n```
-        cleaned = re.sub(r'^```(?:json)?\s*\n?', '', cleaned, flags=re.MULTILINE)
-        cleaned = re.sub(r'\n?```\s*$', '', cleaned, flags=re.MULTILINE)
-
-        # Remove any remaining backticks at start/end
-        cleaned = cleaned.strip('`').strip()
-
-        # Remove separator lines
-        cleaned = re.sub(r'^={10,}.*$', '', cleaned, flags=re.MULTILINE)
-        cleaned = re.sub(r'^-{10,}.*$', '', cleaned, flags=re.MULTILINE)
-        cleaned = re.sub(r'^🔬 PHASE \d+:.*$', '', cleaned, flags=re.MULTILINE)
+        """
+        Parses the JSON object in an LLM response in one tolerant pass.
 
-        # Remove citation marking tags that invalidate JSON structure
-        # These are sometimes output by the LLM (e.g., [cite_start]"key": ...)
-        cleaned = cleaned.replace("[cite_start]", "").replace("[cite_end]", "")
+        Fences, preamble, trailing commas, unclosed strings/brackets (truncated
+        generations) are repaired while parsing; charts and tables are validated
+        as they are parsed.
+        """
+        data = _parsed_streams.pop(content, None)
+        if data is not None:
+            return data
 
-        cleaned = cleaned.strip()
+        parser = TolerantJsonParser(validators=RESPONSE_VALIDATORS)
+        parser.feed(content)
+        data = parser.finish()
 
-        data = None
-        try:
-            data = json.loads(cleaned)
-        except json.JSONDecodeError:
-            start = cleaned.find("{")
-            end = cleaned.rfind("}")
-            if start != -1 and end != -1:
-                try:
-                    data = json.loads(cleaned[start:end+1])
-                except json.JSONDecodeError:
-                    pass
-
-        if data is None:
+        if not isinstance(data, dict):
             logger.warning(f"Failed to parse JSON response: {content[:100]}...")
+            LLMClient.discard_cached(content)
             # Return a structure that indicates failure but preserves content
             return {
                 "results": {"status": "parsed_as_text", "note": "LLM response was not strict JSON"},
@@ -159,91 +392,65 @@ class LLMClient:
                 "parsing_error": True
             }
 
-        # --- Validation Logic for Charts & Tables ---
-
-        # Validate Charts
-        if "charts" in data and isinstance(data["charts"], list):
-            valid_charts = []
-            for chart in data["charts"]:
-                if not isinstance(chart, dict):
-                    continue
-
-                # Check required fields
-                if not all(k in chart for k in ["type", "title", "data"]):
-                    logger.warning(f"Skipping chart missing required fields: {chart.get('title', 'Unknown')}")
-                    continue
-
-                chart_data = chart["data"]
-                if not isinstance(chart_data, dict):
-                    logger.warning(f"Skipping chart with invalid data object: {chart.get('title')}")
-                    continue
-
-                if "labels" not in chart_data or "values" not in chart_data:
-                    logger.warning(f"Skipping chart missing labels/values: {chart.get('title')}")
-                    continue
-
-                labels = chart_data["labels"]
-                values = chart_data["values"]
-
-                if not isinstance(labels, list) or not isinstance(values, list):
-                     logger.warning(f"Skipping chart with non-list labels/values: {chart.get('title')}")
-                     continue
-
-                if len(labels) != len(values):
-                    logger.warning(f"Skipping chart with mismatched labels/values length: {chart.get('title')}")
-                    continue
-
-                # Ensure values are numeric
-                try:
-                    numeric_values = []
-                    for v in values:
-                        if isinstance(v, (int, float)):
-                            numeric_values.append(v)
-                        elif isinstance(v, str) and v.replace('.','',1).isdigit():
-                             numeric_values.append(float(v))
-                        else:
-                             numeric_values.append(0) # Fallback
-
-                    chart["data"]["values"] = numeric_values
-                    valid_charts.append(chart)
-
-                except Exception as e:
-                    logger.warning(f"Error processing chart values: {e}")
-
-            data["charts"] = valid_charts
-
-        # Validate Tables
-        if "tables" in data and isinstance(data["tables"], list):
-            valid_tables = []
-            for table in data["tables"]:
-                if not isinstance(table, dict):
-                    continue
-
-                if not all(k in table for k in ["title", "columns", "rows"]):
-                    logger.warning(f"Skipping table missing required fields: {table.get('title', 'Unknown')}")
-                    continue
-
-                columns = table["columns"]
-                rows = table["rows"]
-
-                if not isinstance(columns, list) or not isinstance(rows, list):
-                    continue
-
-                col_count = len(columns)
-                valid_rows = []
-                for row in rows:
-                    if isinstance(row, list) and len(row) == col_count:
-                        valid_rows.append(row)
-                    else:
-                         logger.warning(f"Skipping malformed row in table: {table.get('title')}")
-
-                table["rows"] = valid_rows
-                valid_tables.append(table)
-
-            data["tables"] = valid_tables
-
+        if parser.repairs:
+            logger.info(f"Repaired LLM JSON response: {', '.join(sorted(set(parser.repairs)))}")
         return data
 
+    @staticmethod
+    def _remember_parsed(content: str, data: Optional[Dict[str, Any]]):
+        if not isinstance(data, dict):
+            return
+        _parsed_streams[content] = data
+        while len(_parsed_streams) > _PARSED_STREAMS_MAX:
+            _parsed_streams.popitem(last=False)
+
+    @staticmethod
+    def _request_keys(
+        prompt: str,
+        model: str,
+        options: Dict[str, Any],
+        use_cache: bool
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Keys for a call: (request_key, cache_key).
+
+        request_key coalesces identical concurrent calls and is None for opted-out
+        calls; cache_key is additionally None when the cache is disabled.
+        """
+        if not use_cache:
+            get_llm_cache().record_bypass()
+            return None, None
+        request_key = get_llm_cache().make_key(prompt, model, options)
+        if not settings_manager.get_value('setari_llm', 'llm_cache_enabled', True):
+            get_llm_cache().record_bypass()
+            return request_key, None
+        return request_key, request_key
+
+    @staticmethod
+    def _cache_store(cache_key: str, model: str, content: str):
+        ttl_hours = settings_manager.get_value('setari_llm', 'llm_cache_ttl_hours', 168)
+        get_llm_cache().put(cache_key, model, content, ttl_seconds=int(float(ttl_hours) * 3600))
+        LLMClient._remember_served(content, cache_key)
+
+    @staticmethod
+    def _remember_served(content: str, cache_key: str):
+        _served_keys[content] = cache_key
+        _served_keys.move_to_end(content)
+        while len(_served_keys) > _SERVED_KEYS_MAX:
+            _served_keys.popitem(last=False)
+
+    @staticmethod
+    def discard_cached(content: str):
+        """
+        Drops the cache entry a response was served from or stored under.
+
+        Callers use it when a response fails parsing or validation, so the next call
+        (or re-run) reaches the LLM instead of getting the same answer back.
+        """
+        cache_key = _served_keys.pop(content, None)
+        if cache_key and get_llm_cache().delete(cache_key):
+            logger.info("Dropped rejected LLM response from cache")
+
     @staticmethod
     def delete_response(path: str):
         if path:
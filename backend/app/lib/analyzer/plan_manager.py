@@ -1,21 +1,63 @@
+import glob
 import json
 import os
 import logging
+import sqlite3
+import time
 import uuid
-from typing import Dict, Any, List
+import zlib
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Set
+
+from .chunk_packer import pack_cases
 
 logger = logging.getLogger(__name__)
 
+# Plan keys holding per-case/per-chunk ID lists; stored as a compressed binary payload
+PAYLOAD_KEYS = ("chunks", "case_ids", "case_sizes")
+
 class PlanManager:
-    """Manages reading/writing analysis plans to disk."""
+    """
+    Manages reading/writing analysis plans to disk.
+
+    Storage: analyzer_plans/plans.db (SQLite, WAL mode)
+    - plans: small metadata row per plan plus a chunk completion bitmap, so
+      progress, resume and listing never read the ID lists or chunk outputs
+    - plan_payloads: chunk/case ID lists as zlib-compressed int64 arrays
+    - chunk_results: zlib-compressed JSON per chunk, written in the same
+      transaction that sets the chunk's completion bit
+
+    Plans and chunk results written by older versions ({plan_id}.json,
+    {plan_id}_chunk_{i}.json) are still read. Final reports stay JSON files.
+    """
 
     def __init__(self, plans_dir: str = "analyzer_plans"):
         self.plans_dir = plans_dir
+        self.db_file = os.path.join(plans_dir, "plans.db")
         os.makedirs(self.plans_dir, exist_ok=True)
+        self._init_db()
 
-    def create_plan_object(self, user_query: str, strategy: Dict[str, Any], total_cases: int, all_ids: List[int], chunk_size: int = 50) -> Dict[str, Any]:
-        """Creates the plan dictionary structure."""
-        chunks = [all_ids[i:i + chunk_size] for i in range(0, len(all_ids), chunk_size)]
+    def create_plan_object(
+        self,
+        user_query: str,
+        strategy: Dict[str, Any],
+        total_cases: int,
+        all_ids: List[int],
+        chunk_size: int = 50,
+        case_sizes: Optional[List[int]] = None,
+        case_budget_chars: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Creates the plan dictionary structure.
+
+        If case_sizes (aligned with all_ids) and case_budget_chars are given, cases are
+        bin-packed into prompt-sized chunks; otherwise fixed chunk_size slices are used.
+        """
+        if case_sizes is not None and case_budget_chars:
+            chunks = pack_cases(all_ids, case_sizes, case_budget_chars, max_cases_per_chunk=chunk_size)
+        else:
+            chunks = [all_ids[i:i + chunk_size] for i in range(0, len(all_ids), chunk_size)]
         plan_id = str(uuid.uuid4())
 
         plan = {
@@ -31,33 +73,204 @@ class PlanManager:
             "strategies_used": strategy.get("strategies_used", [strategy.get("strategy_type")]),
             "strategy_breakdown": strategy.get("strategy_breakdown", {})
         }
+
+        if case_sizes is not None and case_budget_chars:
+            # Kept so the plan can be re-packed (e.g. when the case limit changes)
+            plan["case_ids"] = list(all_ids)
+            plan["case_sizes"] = list(case_sizes)
+            plan["case_budget_chars"] = case_budget_chars
         return plan
 
     def save_plan(self, plan: Dict[str, Any]):
-        """Saves the plan to disk."""
-        import time
+        """
+        Saves the plan. The ID payload is only rewritten when it changed, so
+        metadata updates (e.g. notification_email) stay a single small row write.
+        """
         if plan.get("created_at") == 0:
             plan["created_at"] = time.time()
 
-        file_path = os.path.join(self.plans_dir, f"{plan['plan_id']}.json")
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(plan, f, indent=2, ensure_ascii=False)
+        plan_id = plan["plan_id"]
+        meta = {k: v for k, v in plan.items() if k not in PAYLOAD_KEYS}
+        payload = self._encode_payload(plan)
+        payload_crc = zlib.crc32(payload)
+        total_chunks = plan.get("total_chunks", 0)
+
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT payload_crc, total_chunks, done_bitmap FROM plans WHERE plan_id = ?", (plan_id,)
+            ).fetchone()
+
+            if row and row["total_chunks"] == total_chunks:
+                done_bitmap = row["done_bitmap"]
+            else:
+                bitmap = bytearray((total_chunks + 7) // 8)
+                if row is None:
+                    # Plan moving over from a legacy JSON file keeps its finished chunks
+                    for i in range(total_chunks):
+                        if os.path.exists(self._legacy_chunk_path(plan_id, i)):
+                            bitmap[i >> 3] |= 1 << (i & 7)
+                done_bitmap = bytes(bitmap)
+
+            conn.execute(
+                """INSERT OR REPLACE INTO plans
+                   (plan_id, status, user_query, total_cases, total_chunks, created_at, updated_at,
+                    meta, payload_crc, done_bitmap, done_count)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    plan_id, plan.get("status"), plan.get("user_query"), plan.get("total_cases", 0),
+                    total_chunks, plan["created_at"], time.time(),
+                    json.dumps(meta, ensure_ascii=False), payload_crc,
+                    done_bitmap, _count_bits(done_bitmap)
+                )
+            )
+            if not row or row["payload_crc"] != payload_crc:
+                conn.execute(
+                    "INSERT OR REPLACE INTO plan_payloads (plan_id, data) VALUES (?, ?)", (plan_id, payload)
+                )
 
     def load_plan(self, plan_id: str) -> Dict[str, Any]:
-        plan_path = os.path.join(self.plans_dir, f"{plan_id}.json")
-        if not os.path.exists(plan_path):
-            raise FileNotFoundError(f"Planul {plan_id} nu există.")
+        """Loads the full plan, including chunk ID lists."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT meta FROM plans WHERE plan_id = ?", (plan_id,)).fetchone()
+            payload = conn.execute(
+                "SELECT data FROM plan_payloads WHERE plan_id = ?", (plan_id,)
+            ).fetchone() if row else None
 
-        with open(plan_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        if row is None:
+            return self._load_legacy_plan(plan_id)
+
+        plan = json.loads(row["meta"])
+        if payload is not None:
+            plan.update(self._decode_payload(payload["data"]))
+        return plan
+
+    def load_plan_meta(self, plan_id: str) -> Dict[str, Any]:
+        """Loads plan metadata without the chunk/case ID lists."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT meta FROM plans WHERE plan_id = ?", (plan_id,)).fetchone()
+        if row is None:
+            plan = self._load_legacy_plan(plan_id)
+            return {k: v for k, v in plan.items() if k not in PAYLOAD_KEYS}
+        return json.loads(row["meta"])
+
+    def clone_plan(self, plan_id: str) -> Dict[str, Any]:
+        """
+        Copies a plan and its finished chunk results under a new plan_id.
+
+        Used for analysis-cache hits: each requester executes, re-limits and gets
+        notified about their own copy instead of sharing the cached plan.
+        """
+        plan = self.load_plan(plan_id)
+        results = {i: self.load_chunk_result(plan_id, i) for i in self.get_completed_chunks(plan_id)}
+
+        clone = {k: v for k, v in plan.items() if k != "notification_email"}
+        clone.update(plan_id=str(uuid.uuid4()), status="created", created_at=0, cloned_from=plan_id)
+        self.save_plan(clone)
+        for chunk_index, result in results.items():
+            if result is not None:
+                self.save_chunk_result(clone["plan_id"], chunk_index, result)
+        return clone
+
+    def set_plan_status(self, plan_id: str, status: str):
+        """Updates the plan status in place (index column and metadata)."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT meta FROM plans WHERE plan_id = ?", (plan_id,)).fetchone()
+            if row is None:
+                return
+            meta = json.loads(row["meta"])
+            meta["status"] = status
+            conn.execute(
+                "UPDATE plans SET status = ?, meta = ?, updated_at = ? WHERE plan_id = ?",
+                (status, json.dumps(meta, ensure_ascii=False), time.time(), plan_id)
+            )
+
+    def list_plans(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Lists plans (newest first) from the index only."""
+        query = ("SELECT plan_id, status, user_query, total_cases, total_chunks, created_at, "
+                 "updated_at, done_count AS completed_chunks FROM plans")
+        params: List[Any] = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_plan_progress(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        """Returns chunk progress for a plan from its completion bitmap."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT status, total_chunks, done_count FROM plans WHERE plan_id = ?", (plan_id,)
+            ).fetchone()
+        if row is not None:
+            status, total, done = row["status"], row["total_chunks"], row["done_count"]
+        else:
+            # Legacy plan not moved to the store yet
+            try:
+                plan = self._load_legacy_plan(plan_id)
+            except FileNotFoundError:
+                return None
+            status, total = plan.get("status"), plan.get("total_chunks", 0)
+            done = len(self.get_completed_chunks(plan_id))
+        return {
+            'plan_id': plan_id,
+            'status': status,
+            'total_chunks': total,
+            'completed_chunks': done,
+            'percent': round(100 * done / total, 1) if total else 0.0
+        }
+
+    def get_completed_chunks(self, plan_id: str) -> Set[int]:
+        """Indices of chunks that already have a saved result."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT total_chunks, done_bitmap FROM plans WHERE plan_id = ?", (plan_id,)
+            ).fetchone()
+        if row is None:
+            # Legacy plan: fall back to the per-chunk files
+            plan = self._load_legacy_plan(plan_id)
+            return {
+                i for i in range(plan.get("total_chunks", 0))
+                if os.path.exists(self._legacy_chunk_path(plan_id, i))
+            }
+
+        bitmap = row["done_bitmap"]
+        return {i for i in range(row["total_chunks"]) if bitmap[i >> 3] & (1 << (i & 7))}
 
     def save_chunk_result(self, plan_id: str, chunk_index: int, result: Dict[str, Any]):
-        result_file = os.path.join(self.plans_dir, f"{plan_id}_chunk_{chunk_index}.json")
-        with open(result_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+        """Stores a chunk result and marks the chunk done in one transaction."""
+        data = zlib.compress(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO chunk_results (plan_id, chunk_index, data) VALUES (?, ?, ?)",
+                (plan_id, chunk_index, data)
+            )
+            row = conn.execute(
+                "SELECT total_chunks, done_bitmap FROM plans WHERE plan_id = ?", (plan_id,)
+            ).fetchone()
+            if row is None or chunk_index >= row["total_chunks"]:
+                return
+
+            bitmap = bytearray(row["done_bitmap"])
+            bitmap[chunk_index >> 3] |= 1 << (chunk_index & 7)
+            conn.execute(
+                "UPDATE plans SET done_bitmap = ?, done_count = ?, updated_at = ? WHERE plan_id = ?",
+                (bytes(bitmap), _count_bits(bitmap), time.time(), plan_id)
+            )
 
     def load_chunk_result(self, plan_id: str, chunk_index: int) -> Dict[str, Any]:
-        chunk_file = os.path.join(self.plans_dir, f"{plan_id}_chunk_{chunk_index}.json")
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM chunk_results WHERE plan_id = ? AND chunk_index = ?", (plan_id, chunk_index)
+            ).fetchone()
+        if row is not None:
+            return json.loads(zlib.decompress(row["data"]).decode('utf-8'))
+
+        chunk_file = self._legacy_chunk_path(plan_id, chunk_index)
         if os.path.exists(chunk_file):
             with open(chunk_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
@@ -72,19 +285,30 @@ class PlanManager:
             if max_cases < 1: max_cases = 1
             if max_cases > original_total: max_cases = original_total
 
-            all_ids = []
-            for chunk in plan.get('chunks', []):
-                all_ids.extend(chunk)
-
-            limited_ids = all_ids[:max_cases]
             chunk_size = plan.get('chunk_size', 50)
-            new_chunks = [limited_ids[i:i + chunk_size] for i in range(0, len(limited_ids), chunk_size)]
+
+            if plan.get('case_ids') and plan.get('case_sizes'):
+                # Packed plan: keep the best-ranked cases and re-pack them
+                limited_ids = plan['case_ids'][:max_cases]
+                limited_sizes = plan['case_sizes'][:max_cases]
+                new_chunks = pack_cases(limited_ids, limited_sizes, plan['case_budget_chars'], max_cases_per_chunk=chunk_size)
+                plan['case_ids'] = limited_ids
+                plan['case_sizes'] = limited_sizes
+            else:
+                all_ids = []
+                for chunk in plan.get('chunks', []):
+                    all_ids.extend(chunk)
+
+                limited_ids = all_ids[:max_cases]
+                new_chunks = [limited_ids[i:i + chunk_size] for i in range(0, len(limited_ids), chunk_size)]
 
             plan['total_cases'] = len(limited_ids)
             plan['total_chunks'] = len(new_chunks)
             plan['chunks'] = new_chunks
             plan['original_total_cases'] = original_total
 
+            # Chunk boundaries changed, so earlier chunk results no longer apply
+            self._clear_chunk_results(plan_id)
             self.save_plan(plan)
 
             estimated_seconds = (len(new_chunks) + 1) * 60
@@ -112,8 +336,6 @@ class PlanManager:
             report_id: Unique identifier for the report
             report: Complete report dictionary from synthesize_final_report()
         """
-        import time
-
         report_with_meta = {
             **report,
             'report_id': report_id,
@@ -154,3 +376,128 @@ class PlanManager:
 
         with open(report_path, 'r', encoding='utf-8') as f:
             return json.load(f)
+
+    # --- Storage helpers ---
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS plans (
+                    plan_id TEXT PRIMARY KEY,
+                    status TEXT,
+                    user_query TEXT,
+                    total_cases INTEGER NOT NULL DEFAULT 0,
+                    total_chunks INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL,
+                    updated_at REAL,
+                    meta TEXT NOT NULL,
+                    payload_crc INTEGER,
+                    done_bitmap BLOB NOT NULL,
+                    done_count INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_plans_status_created ON plans (status, created_at);
+                CREATE INDEX IF NOT EXISTS idx_plans_created ON plans (created_at);
+                CREATE TABLE IF NOT EXISTS plan_payloads (
+                    plan_id TEXT PRIMARY KEY,
+                    data BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chunk_results (
+                    plan_id TEXT NOT NULL,
+                    chunk_index INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (plan_id, chunk_index)
+                );
+            """)
+
+    def _clear_chunk_results(self, plan_id: str):
+        # Legacy chunk files would otherwise refill the bitmap (save_plan) and load_chunk_result
+        for chunk_file in glob.glob(os.path.join(glob.escape(self.plans_dir), f"{glob.escape(plan_id)}_chunk_*.json")):
+            try:
+                os.remove(chunk_file)
+            except OSError as e:
+                logger.warning(f"Could not remove legacy chunk result {chunk_file}: {e}")
+
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM chunk_results WHERE plan_id = ?", (plan_id,))
+            conn.execute(
+                "UPDATE plans SET done_bitmap = zeroblob(length(done_bitmap)), done_count = 0 WHERE plan_id = ?",
+                (plan_id,)
+            )
+
+    @staticmethod
+    def _encode_payload(plan: Dict[str, Any]) -> bytes:
+        """
+        Packs the ID lists as int64 arrays: a header of the three lengths, the chunk
+        lengths, the flattened chunk IDs, then case_ids and case_sizes (may be empty).
+        """
+        chunks = plan.get("chunks") or []
+        case_ids = plan.get("case_ids") or []
+        case_sizes = plan.get("case_sizes") or []
+
+        values = array('q', [len(chunks), len(case_ids), len(case_sizes)])
+        values.extend(len(c) for c in chunks)
+        for chunk in chunks:
+            values.extend(chunk)
+        values.extend(case_ids)
+        values.extend(case_sizes)
+        return zlib.compress(values.tobytes())
+
+    @staticmethod
+    def _decode_payload(data: bytes) -> Dict[str, Any]:
+        values = array('q')
+        values.frombytes(zlib.decompress(data))
+
+        n_chunks, n_ids, n_sizes = values[0], values[1], values[2]
+        pos = 3
+        lengths = values[pos:pos + n_chunks]
+        pos += n_chunks
+
+        chunks = []
+        for length in lengths:
+            chunks.append(values[pos:pos + length].tolist())
+            pos += length
+
+        payload: Dict[str, Any] = {"chunks": chunks}
+        if n_ids:
+            payload["case_ids"] = values[pos:pos + n_ids].tolist()
+        pos += n_ids
+        if n_sizes:
+            payload["case_sizes"] = values[pos:pos + n_sizes].tolist()
+        return payload
+
+    def _load_legacy_plan(self, plan_id: str) -> Dict[str, Any]:
+        plan_path = os.path.join(self.plans_dir, f"{plan_id}.json")
+        if not os.path.exists(plan_path):
+            raise FileNotFoundError(f"Planul {plan_id} nu există.")
+
+        with open(plan_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _legacy_chunk_path(self, plan_id: str, chunk_index: int) -> str:
+        return os.path.join(self.plans_dir, f"{plan_id}_chunk_{chunk_index}.json")
+
+
+def _count_bits(bitmap: bytes) -> int:
+    return sum(bin(b).count("1") for b in bitmap)
@@ -0,0 +1,295 @@
+"""
+Compaction of case payloads for chunk analysis prompts.
+
+Case texts used to be sent whole (cut at 4000 chars), under long field names
+repeated for every case, with the procedural boilerplate every decision carries.
+Compaction instead:
+- renames fields to short aliases, explained once in a legend
+- keeps the sentences around the query's keywords (with their neighbours for
+  context) instead of the head of each text, up to a per-field budget
+- drops formulaic sentences (dispositive formulas, signatures, appeal notices)
+  unless they mention the keywords
+- replaces sentences repeated across cases of a chunk with [§n] references to
+  a single copy
+
+Compacted cases are cached per (case, columns, query keywords), so retries and
+repeated questions skip both the fetch and the compaction.
+"""
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from .analysis_cache import normalize_query
+
+# Per-field budget once compacted, and how much of each text is fetched to choose from
+DEFAULT_FIELD_CHARS = 1500
+SOURCE_TEXT_CHARS = 20000
+
+# Columns whose texts are compacted (the others are short metadata)
+TEXT_COLUMNS = (
+    'considerente_speta', 'text_situatia_de_fapt', 'tip_solutie', 'text_individualizare',
+    'argumente_instanta', 'text_doctrina', 'text_ce_invatam'
+)
+
+FIELD_ALIASES = {
+    'denumire': 'den',
+    'obiect': 'ob',
+    'materie': 'mat',
+    'instanta': 'inst',
+    'parte': 'parte',
+    'data': 'data',
+    'considerente_speta': 'cons',
+    'text_situatia_de_fapt': 'fapt',
+    'tip_solutie': 'sol',
+    'text_individualizare': 'indiv',
+    'argumente_instanta': 'arg',
+    'text_doctrina': 'doct',
+    'text_ce_invatam': 'inv',
+}
+
+# Repeated sentences shorter than this stay inline (a reference would not save much)
+MIN_SHARED_SENTENCE_CHARS = 80
+
+GAP_MARKER = "[…]"
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?;])\s+(?=[A-ZĂÂÎȘŞȚŢ„"(\[])|(?<=\[…\])\s+|\n+')
+_WORD = re.compile(r'\w+')
+_STEM_CHARS = 6
+
+_STOPWORDS = frozenset(
+    "care este sunt pentru privind despre dintre asupra cand unde cum cate cati ce cel cea cei cele "
+    "din prin sau iar dar doar mai foarte toate toti fost fiind avand acest aceasta aceste acestor "
+    "unui unei unor sale lor sau cazuri cazurile cazul dosare dosarele speta spete spetele analiza "
+    "analizeaza identifica care".split()
+)
+
+# Formulaic sentences of Romanian court decisions (matched on normalized text)
+_BOILERPLATE = re.compile(
+    r"^(pentru aceste motive|in numele legii|hotaraste|dispune|decide)\b"
+    r"|cu drept de (apel|recurs|contestatie)"
+    r"|pronuntata in sedinta publica"
+    r"|pronuntarea (se va face|a fost amanata)"
+    r"|prin punerea solutiei la dispozitia partilor"
+    r"|^(presedinte|grefier|judecator|asistent judiciar)\b"
+)
+
+
+def query_keywords(user_query: str) -> FrozenSet[str]:
+    """Stems of the meaningful words of the query (diacritics-insensitive)."""
+    return frozenset(
+        word[:_STEM_CHARS] for word in normalize_query(user_query).split()
+        if len(word) >= 4 and word not in _STOPWORDS and not word.isdigit()
+    )
+
+
+def field_alias(column: str) -> str:
+    """Short key of a column in compacted cases."""
+    if column in FIELD_ALIASES:
+        return FIELD_ALIASES[column]
+    parts = [p for p in column.split('_') if p]
+    if len(column) <= 6 or len(parts) < 2:
+        return column
+    return ''.join(p[0] for p in parts)
+
+
+def field_legend(columns: Sequence[str]) -> Dict[str, str]:
+    """alias -> column for the selected columns (aliases made unique)."""
+    legend: Dict[str, str] = {}
+    for column in columns:
+        alias = field_alias(column)
+        candidate, n = alias, 2
+        while candidate in legend or candidate == 'id':
+            candidate, n = f"{alias}{n}", n + 1
+        legend[candidate] = column
+    return legend
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT.split(text) if s and s.strip()]
+
+
+def _sentence_stems(sentence: str) -> set:
+    return {word[:_STEM_CHARS] for word in _WORD.findall(normalize_query(sentence))}
+
+
+def _shorten(sentence: str, max_chars: int) -> str:
+    if len(sentence) <= max_chars:
+        return sentence
+    cut = sentence[:max_chars].rsplit(' ', 1)[0]
+    return (cut or sentence[:max_chars]) + "…"
+
+
+def salient_text(text: str, keywords: FrozenSet[str], max_chars: int) -> str:
+    """
+    The sentences of `text` that best match the keywords, with their neighbours,
+    in their original order and within max_chars. Falls back to the leading
+    sentences when nothing matches.
+    """
+    if not text:
+        return text
+    sentences = split_sentences(text)
+    scores = [len(_sentence_stems(s) & keywords) if keywords else 0 for s in sentences]
+    seen: set = set()
+    kept = []
+    for i, sentence in enumerate(sentences):
+        if sentence in seen or (scores[i] == 0 and _BOILERPLATE.search(normalize_query(sentence))):
+            continue
+        seen.add(sentence)
+        kept.append(i)
+
+    if sum(len(sentences[i]) + 1 for i in kept) <= max_chars:
+        return " ".join(sentences[i] for i in kept)
+
+    kept_set = set(kept)
+    ranked = sorted((i for i in kept if scores[i] > 0), key=lambda i: (-scores[i], i))
+    chosen: set = set()
+    used = 0
+
+    def take(i: int) -> bool:
+        nonlocal used
+        if i in chosen or i not in kept_set:
+            return True
+        size = len(sentences[i]) + len(GAP_MARKER) + 2
+        if used + size > max_chars:
+            return False
+        chosen.add(i)
+        used += size
+        return True
+
+    for i in ranked:
+        if not take(i):
+            continue
+        # Neighbours carry the context (who, what happened) of a matching sentence
+        take(i - 1)
+        take(i + 1)
+
+    if not chosen:
+        for i in kept:
+            if not take(i):
+                break
+        if not chosen:
+            return _shorten(sentences[kept[0]] if kept else sentences[0], max_chars)
+
+    parts = []
+    previous = None
+    for i in sorted(chosen):
+        if previous is not None and i != previous + 1:
+            parts.append(GAP_MARKER)
+        parts.append(sentences[i])
+        previous = i
+    if min(chosen) > 0:
+        parts.insert(0, GAP_MARKER)
+    return " ".join(parts)
+
+
+def compact_case(
+    case: Dict[str, Any],
+    legend: Dict[str, str],
+    keywords: FrozenSet[str],
+    field_chars: int = DEFAULT_FIELD_CHARS
+) -> Dict[str, Any]:
+    """Aliased, keyword-focused copy of a fetched case (empty fields omitted)."""
+    compacted: Dict[str, Any] = {'id': case.get('id')}
+    for alias, column in legend.items():
+        value = case.get(column)
+        if value is None or value == '':
+            continue
+        if column in TEXT_COLUMNS and isinstance(value, str):
+            value = salient_text(value, keywords, field_chars)
+        compacted[alias] = value
+    return compacted
+
+
+def dedupe_shared_sentences(cases: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Replaces sentences that occur in several cases with [§n] references.
+
+    Returns:
+        (cases with references, shared sentences where index n-1 is §n)
+    """
+    occurrences: Dict[str, set] = {}
+    for index, case in enumerate(cases):
+        for key, value in case.items():
+            if key == 'id' or not isinstance(value, str) or len(value) < MIN_SHARED_SENTENCE_CHARS:
+                continue
+            for sentence in split_sentences(value):
+                if len(sentence) >= MIN_SHARED_SENTENCE_CHARS:
+                    occurrences.setdefault(sentence, set()).add(index)
+
+    shared = [s for s, where in occurrences.items() if len(where) > 1]
+    if not shared:
+        return cases, []
+    references = {s: f"[§{n}]" for n, s in enumerate(shared, 1)}
+
+    result = []
+    for case in cases:
+        rewritten = dict(case)
+        for key, value in case.items():
+            if key == 'id' or not isinstance(value, str) or len(value) < MIN_SHARED_SENTENCE_CHARS:
+                continue
+            sentences = split_sentences(value)
+            if any(s in references for s in sentences):
+                rewritten[key] = " ".join(references.get(s, s) for s in sentences)
+        result.append(rewritten)
+    return result, shared
+
+
+def format_compact_chunk(cases: List[Dict[str, Any]], shared: List[str], legend: Dict[str, str]) -> str:
+    """Legend, shared sentences still referenced, then one compact JSON line per case."""
+    lines = ["LEGENDĂ CÂMPURI: id = ID caz; " + "; ".join(f"{alias} = {column}" for alias, column in legend.items())]
+
+    body = [json.dumps(case, ensure_ascii=False, separators=(',', ':')) for case in cases]
+    joined = "\n".join(body)
+    used = [(n, s) for n, s in enumerate(shared, 1) if f"[§{n}]" in joined]
+    if used:
+        lines.append("FRAZE COMUNE (apar în mai multe cazuri, referite ca [§n]):")
+        lines.extend(f"§{n}: {s}" for n, s in used)
+    if any(GAP_MARKER in line for line in body):
+        lines.append("Textele conțin doar pasajele relevante; […] marchează fragmentele omise.")
+
+    lines.append("CAZURI:")
+    if body:
+        lines.append(joined)
+    return "\n".join(lines)
+
+
+class CompactCaseCache:
+    """In-process LRU of compacted cases, keyed by case, columns, query keywords and budget."""
+
+    def __init__(self, max_entries: int = 5000, ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry[0] > self.ttl_seconds:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[1]
+
+    def put(self, key: tuple, case: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.time(), case)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, 'entries': len(self._entries)}
+
+    @staticmethod
+    def make_key(case_id: int, columns: Sequence[str], keywords: FrozenSet[str], field_chars: int) -> tuple:
+        return case_id, tuple(columns), keywords, field_chars
+
+
+compact_case_cache = CompactCaseCache()
@@ -1,7 +1,7 @@
 import json
 import os
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -66,8 +66,16 @@ Te rog să iei în considerare serios utilizarea strategiei VECTOR SEARCH (Varia
             feedback_section=feedback_section + force_suggestion
         )
 
-    def build_chunk_analysis_prompt(self, user_query: str, chunk_data: List[Dict], chunk_index: int, total_chunks: int) -> str:
-        data_json = json.dumps(chunk_data, indent=2, ensure_ascii=False)
+    def build_chunk_analysis_prompt(
+        self,
+        user_query: str,
+        chunk_data: List[Dict],
+        chunk_index: int,
+        total_chunks: int,
+        data_text: Optional[str] = None
+    ) -> str:
+        """data_text: preformatted (compacted) case data to use instead of the JSON dump of chunk_data."""
+        data_json = data_text if data_text is not None else json.dumps(chunk_data, indent=2, ensure_ascii=False)
         template = self.prompts.get("chunk_analysis_prompt", "")
         if not template:
              return "EROARE: Prompt chunk_analysis_prompt lipsă."
@@ -80,16 +88,38 @@ Te rog să iei în considerare serios utilizarea strategiei VECTOR SEARCH (Varia
             analyzed_count=len(chunk_data)
         )
 
-    def build_synthesis_prompt(self, user_query: str, aggregated_data: List[Dict], missing_chunks: List[int]) -> str:
+    def build_synthesis_prompt(
+        self,
+        user_query: str,
+        aggregated_data: List[Dict],
+        missing_chunks: List[int],
+        merged_stats: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Args:
+            aggregated_data: Chunk results, or the summaries left by hierarchical reduction
+            merged_stats: Statistics already merged in Python; replaces the per-chunk partial_stats
+        """
         clean_aggregation = []
         for chunk in aggregated_data:
-            clean_aggregation.append({
+            entry = {
                 "chunk_index": chunk.get("chunk_index"),
-                "extracted_data": chunk.get("extracted_data"),
-                "partial_stats": chunk.get("partial_stats")
-            })
+                "extracted_data": chunk.get("extracted_data")
+            }
+            if merged_stats is None:
+                entry["partial_stats"] = chunk.get("partial_stats")
+            elif chunk.get("summary"):
+                entry["summary"] = chunk.get("summary")
+            clean_aggregation.append(entry)
+
+        if merged_stats is None:
+            data_json = json.dumps(clean_aggregation, indent=2, ensure_ascii=False)
+        else:
+            data_json = json.dumps({
+                "statistici_agregate": merged_stats,
+                "rezultate_partiale": clean_aggregation
+            }, indent=2, ensure_ascii=False)
 
-        data_json = json.dumps(clean_aggregation, indent=2, ensure_ascii=False)
         template = self.prompts.get("synthesis_prompt", "")
         if not template:
              return "EROARE: Prompt synthesis_prompt lipsă."
@@ -99,6 +129,24 @@ Te rog să iei în considerare serios utilizarea strategiei VECTOR SEARCH (Varia
             data_json=data_json
         )
 
+    def build_intermediate_synthesis_prompt(self, user_query: str, partial_results: List[Dict], level: int) -> str:
+        """Prompt merging one group of partial results during hierarchical synthesis."""
+        data_json = json.dumps(partial_results, indent=2, ensure_ascii=False)
+        template = self.prompts.get("intermediate_synthesis_prompt", "")
+        if not template:
+             return "EROARE: Prompt intermediate_synthesis_prompt lipsă."
+
+        return template.format(
+            user_query=user_query,
+            data_json=data_json,
+            level=level,
+            group_size=len(partial_results)
+        )
+
+    def template_chars(self, name: str) -> int:
+        """Length of a prompt template (without the data), for prompt budgeting."""
+        return len(self.prompts.get(name, ""))
+
     def build_task_breakdown_prompt(self, user_query: str) -> str:
         """
         Builds the prompt for automatic task decomposition.
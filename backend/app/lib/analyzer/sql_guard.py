@@ -0,0 +1,292 @@
+"""
+Guard layer for LLM-generated SQL.
+
+Every generated discovery query runs through here instead of straight on the
+request session:
+- Only single read-only SELECT/WITH statements are accepted
+- Row-returning queries get a LIMIT (or have theirs clamped)
+- PostgreSQL: EXPLAIN cost check before execution, then execution on its own
+  pooled connection in a READ ONLY transaction with a statement_timeout
+- Slow or timed-out query shapes (literals stripped) are logged to
+  analyzer_plans/slow_queries.jsonl for prompt tuning
+
+Storage: analyzer_plans/slow_queries.jsonl (append-only, one JSON per line)
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import Session, text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_COST = 5_000_000
+DEFAULT_TIMEOUT_SECONDS = 60
+DEFAULT_MAX_ROWS = 10000
+DEFAULT_SLOW_SECONDS = 2.0
+
+# Distinct slow shapes kept in memory for the stats endpoint
+MAX_TRACKED_SHAPES = 200
+
+_FORBIDDEN_KEYWORDS = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|DROP|ALTER|CREATE|TRUNCATE|GRANT|REVOKE|COPY|VACUUM|"
+    r"ANALYZE|CLUSTER|REINDEX|CALL|DO|LOCK|SET|RESET|LISTEN|NOTIFY|PREPARE|EXECUTE|"
+    r"pg_sleep\w*|pg_terminate_backend|pg_cancel_backend|lo_import|lo_export|dblink\w*)\b",
+    re.IGNORECASE
+)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_TRAILING_LIMIT = re.compile(r"\s+LIMIT\s+(\d+)(\s+OFFSET\s+\d+)?\s*;?\s*$", re.IGNORECASE)
+
+
+def query_shape(sql: str) -> str:
+    """Replaces literals with '?' and collapses whitespace, so similar queries group together."""
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("(?)", shape)
+    return re.sub(r"\s+", " ", shape).strip().rstrip(";")
+
+
+class SqlGuard:
+    """
+    Validates and executes generated SQL with cost, time and row limits.
+
+    Thread-safe: strategy workers share the process-wide instance.
+    """
+
+    def __init__(
+        self,
+        max_cost: float = DEFAULT_MAX_COST,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        max_rows: int = DEFAULT_MAX_ROWS,
+        slow_seconds: float = DEFAULT_SLOW_SECONDS,
+        storage_dir: str = "analyzer_plans"
+    ):
+        self.max_cost = max_cost
+        self.timeout_seconds = timeout_seconds
+        self.max_rows = max_rows
+        self.slow_seconds = slow_seconds
+        self.slow_log_file = os.path.join(storage_dir, "slow_queries.jsonl")
+        os.makedirs(storage_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._slow_shapes: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'executed': 0, 'rejected': 0, 'over_cost': 0, 'timed_out': 0, 'limits_injected': 0}
+
+    def check_read_only(self, sql: str):
+        """Raises ValueError unless `sql` is one SELECT/WITH statement without write keywords."""
+        body = _STRING_LITERAL.sub("''", sql).strip().rstrip(";").strip()
+        if not re.match(r"^\(?\s*(SELECT|WITH)\b", body, re.IGNORECASE):
+            self._count('rejected')
+            raise ValueError("Sunt permise doar interogări SELECT.")
+        if ";" in body:
+            self._count('rejected')
+            raise ValueError("Este permisă o singură instrucțiune SQL.")
+        forbidden = _FORBIDDEN_KEYWORDS.search(body)
+        if forbidden:
+            self._count('rejected')
+            raise ValueError(f"Interogarea conține o operație nepermisă: {forbidden.group(1).upper()}")
+
+    def cap_rows(self, sql: str, max_rows: Optional[int] = None) -> str:
+        """Appends LIMIT max_rows, or lowers an existing trailing LIMIT above it."""
+        cap = max_rows or self.max_rows
+        stripped = sql.strip().rstrip(";").rstrip()
+        match = _TRAILING_LIMIT.search(stripped)
+        if match:
+            if int(match.group(1)) <= cap:
+                return stripped
+            return f"{stripped[:match.start()]} LIMIT {cap}{match.group(2) or ''}"
+        self._count('limits_injected')
+        return f"{stripped} LIMIT {cap}"
+
+    def fetch_ids(self, session: Session, sql: str, **kwargs) -> List[Any]:
+        """Runs an ID query (first column of every row). Rejects plans over the cost budget."""
+        self.check_read_only(sql)
+        sql = self.cap_rows(sql)
+        rows = self._run(session, sql, "ids", over_cost="reject", **kwargs)
+        return [row[0] for row in rows]
+
+    def fetch_rows(self, session: Session, sql: str, **kwargs) -> Optional[List[Any]]:
+        """Runs a row query. Returns None instead of executing when the plan is over budget."""
+        self.check_read_only(sql)
+        sql = self.cap_rows(sql)
+        return self._run(session, sql, "rows", over_cost="skip", **kwargs)
+
+    def fetch_count(self, session: Session, sql: str, **kwargs) -> int:
+        """
+        Runs a COUNT query. Over budget, the planner estimate of the counted rows is
+        returned instead of scanning them.
+        """
+        self.check_read_only(sql)
+        rows = self._run(session, sql, "count", over_cost="estimate", **kwargs)
+        return rows[0][0] if rows else 0
+
+    def estimate_rows(self, session: Session, sql: str) -> Optional[int]:
+        """Planner row estimate for a query (PostgreSQL only), or None if unavailable."""
+        self.check_read_only(sql)
+        if not self._is_postgres(session):
+            return None
+        try:
+            with session.get_bind().connect() as conn:
+                plan = self._explain(conn, sql)
+            return int(plan["Plan Rows"]) if plan else None
+        except DBAPIError as e:
+            logger.warning(f"[SQL-GUARD] EXPLAIN estimate failed: {e}")
+            return None
+
+    def get_slow_queries(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Slowest query shapes seen by this process, worst first."""
+        with self._lock:
+            shapes = sorted(self._slow_shapes.values(), key=lambda s: s['max_seconds'], reverse=True)
+            return [dict(s) for s in shapes[:limit]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'slow_shapes': len(self._slow_shapes)}
+
+    # --- Helpers ---
+
+    def _run(
+        self,
+        session: Session,
+        sql: str,
+        kind: str,
+        over_cost: str,
+        timeout: Optional[float] = None,
+        on_connection: Optional[Callable[[Any], None]] = None
+    ) -> Optional[List[Any]]:
+        """
+        Executes on a dedicated connection so the READ ONLY / statement_timeout
+        settings apply to this statement alone, not to the caller's transaction.
+        """
+        timeout = min(timeout, self.timeout_seconds) if timeout else self.timeout_seconds
+        is_postgres = self._is_postgres(session)
+        start_time = time.monotonic()
+
+        with session.get_bind().connect() as conn:
+            if on_connection is not None:
+                # Raw DBAPI connection, so the caller can cancel the statement
+                on_connection(conn.connection.dbapi_connection)
+
+            if is_postgres:
+                conn.execute(text("SET TRANSACTION READ ONLY"))
+                conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout * 1000)}"))
+
+                plan = self._explain(conn, sql)
+                cost = plan.get("Total Cost", 0) if plan else 0
+                if cost > self.max_cost:
+                    self._count('over_cost')
+                    self._record_slow(sql, kind, 0.0, cost=cost, outcome=f"over_cost_{over_cost}")
+                    logger.warning(f"[SQL-GUARD] {kind} query cost {cost:.0f} > {self.max_cost:.0f} ({over_cost})")
+                    if over_cost == "skip":
+                        return None
+                    if over_cost == "estimate":
+                        return [(self._counted_rows_estimate(plan),)]
+                    self._count('rejected')
+                    raise ValueError(
+                        "Interogarea generată este prea costisitoare pentru baza de date. "
+                        "Reformulați căutarea mai specific."
+                    )
+
+            try:
+                rows = conn.execute(text(sql)).all()
+            except DBAPIError as e:
+                elapsed = time.monotonic() - start_time
+                if "statement timeout" in str(e).lower() or "canceling statement" in str(e).lower():
+                    self._count('timed_out')
+                    self._record_slow(sql, kind, elapsed, outcome="timeout")
+                    raise ValueError(f"Interogarea a depășit limita de timp ({timeout:.0f}s).") from e
+                raise
+
+        elapsed = time.monotonic() - start_time
+        self._count('executed')
+        if elapsed >= self.slow_seconds:
+            self._record_slow(sql, kind, elapsed, outcome="slow")
+        return rows
+
+    @staticmethod
+    def _explain(conn, sql: str) -> Optional[Dict[str, Any]]:
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"] if plan else None
+
+    @staticmethod
+    def _counted_rows_estimate(plan: Dict[str, Any]) -> int:
+        """Rows feeding the top-level aggregate of a COUNT plan (the estimated count)."""
+        node = plan
+        while node.get("Node Type") == "Aggregate" and node.get("Plans"):
+            node = node["Plans"][0]
+        return int(node.get("Plan Rows", 0))
+
+    @staticmethod
+    def _is_postgres(session: Session) -> bool:
+        try:
+            return session.get_bind().dialect.name == "postgresql"
+        except Exception:
+            return False
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _record_slow(self, sql: str, kind: str, seconds: float, outcome: str, cost: Optional[float] = None):
+        shape = query_shape(sql)
+        shape_id = hashlib.sha1(shape.encode('utf-8')).hexdigest()[:12]
+        entry = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'shape_id': shape_id,
+            'kind': kind,
+            'outcome': outcome,
+            'seconds': round(seconds, 3),
+            'cost': cost,
+            'shape': shape
+        }
+
+        with self._lock:
+            tracked = self._slow_shapes.get(shape_id)
+            if tracked is None:
+                if len(self._slow_shapes) >= MAX_TRACKED_SHAPES:
+                    # Forget the fastest shape to make room
+                    fastest = min(self._slow_shapes, key=lambda k: self._slow_shapes[k]['max_seconds'])
+                    del self._slow_shapes[fastest]
+                tracked = {'shape_id': shape_id, 'shape': shape, 'kind': kind, 'occurrences': 0,
+                           'max_seconds': 0.0, 'total_seconds': 0.0, 'outcomes': {}}
+                self._slow_shapes[shape_id] = tracked
+            tracked['occurrences'] += 1
+            tracked['max_seconds'] = max(tracked['max_seconds'], round(seconds, 3))
+            tracked['total_seconds'] = round(tracked['total_seconds'] + seconds, 3)
+            tracked['outcomes'][outcome] = tracked['outcomes'].get(outcome, 0) + 1
+
+            try:
+                with open(self.slow_log_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.error(f"Could not write slow query log: {e}")
+
+        logger.info(f"[SQL-GUARD] {outcome} {kind} query ({seconds:.2f}s) shape={shape_id}")
+
+
+_sql_guard: Optional[SqlGuard] = None
+_sql_guard_lock = threading.Lock()
+
+
+def get_sql_guard() -> SqlGuard:
+    """Returns the process-wide guard, created on first use with the configured limits."""
+    global _sql_guard
+    with _sql_guard_lock:
+        if _sql_guard is None:
+            from ...settings_manager import settings_manager
+            _sql_guard = SqlGuard(
+                max_cost=float(settings_manager.get_value('setari_llm', 'sql_guard_max_cost', DEFAULT_MAX_COST)),
+                timeout_seconds=float(settings_manager.get_value('setari_llm', 'sql_guard_timeout_seconds', DEFAULT_TIMEOUT_SECONDS)),
+                max_rows=int(settings_manager.get_value('setari_llm', 'sql_guard_max_rows', DEFAULT_MAX_ROWS))
+            )
+        return _sql_guard
@@ -1,12 +1,22 @@
 import logging
 import asyncio
-from typing import Dict, Any, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from sqlmodel import Session
+from ...db import engine
 from ...multi_strategy_config import MultiStrategyConfig
 from ...logic.search_logic import build_pro_search_query_sql, build_vector_search_query_sql
 from .data_fetcher import DataFetcher
 
 logger = logging.getLogger(__name__)
 
+# Blocking strategy queries run here, each on its own pooled connection
+_strategy_executor = ThreadPoolExecutor(
+    max_workers=MultiStrategyConfig.MAX_PARALLEL_STRATEGIES,
+    thread_name_prefix="strategy"
+)
+
 class StrategyEngine:
     """Handles multi-strategy logic (auto-expansion, exhaustive search)."""
 
@@ -27,15 +37,7 @@ class StrategyEngine:
              # Should include at least one expansion if called
              pass
 
-        tasks = [self._execute_single_strategy_by_name(user_query, s) for s in strategies_to_run]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        valid_results = []
-        for res in results:
-            if not isinstance(res, Exception):
-                valid_results.append(res)
-            else:
-                logger.error(f"Strategy failed: {res}")
+        valid_results, timed_out = await self._run_strategies_parallel(user_query, strategies_to_run)
 
         # For auto_expand, inject primary result if available (it should be passed or reconstructed)
         if mode == "auto_expand":
@@ -56,11 +58,87 @@ class StrategyEngine:
             "strategies_used": strategies_used,
             "breakdown": {s["strategy_type"]: s["count"] for s in valid_results},
             "merged_ids": ranked["unique_ids"],
+            "strategies_timed_out": timed_out,
             "rationale": self._build_rationale(valid_results, mode)
         }
 
-    async def _execute_single_strategy_by_name(self, user_query: str, strategy_name: str) -> Dict[str, Any]:
-        """Executes a single named strategy."""
+    async def _run_strategies_parallel(self, user_query: str, strategy_names: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Runs strategies concurrently, each in a worker thread with its own session.
+
+        Strategies still running after STRATEGY_TIMEOUT have their query cancelled;
+        results of the ones that finished are returned either way.
+
+        Returns:
+            (successful results, names of strategies that timed out)
+        """
+        if not strategy_names:
+            return [], []
+
+        loop = asyncio.get_running_loop()
+        timeout = MultiStrategyConfig.STRATEGY_TIMEOUT
+        connections: Dict[str, Any] = {}
+        start_time = time.monotonic()
+
+        futures = {
+            loop.run_in_executor(
+                _strategy_executor, self._run_strategy_in_own_session, user_query, name, connections
+            ): name
+            for name in strategy_names
+        }
+        done, pending = await asyncio.wait(futures, timeout=timeout)
+
+        valid_results = []
+        for future in done:
+            name = futures[future]
+            try:
+                valid_results.append(future.result())
+            except Exception as e:
+                logger.error(f"Strategy {name} failed: {e}")
+
+        timed_out = []
+        for future in pending:
+            name = futures[future]
+            timed_out.append(name)
+            logger.warning(f"[MULTI-STRATEGY] {name} exceeded {timeout}s, cancelling its query")
+            self._cancel_query(connections.get(name))
+            future.cancel()
+
+        # Keep strategy order stable for ranking/rationale regardless of completion order
+        valid_results.sort(key=lambda r: strategy_names.index(r["strategy_type"]))
+        logger.info(
+            f"[MULTI-STRATEGY] {len(valid_results)}/{len(strategy_names)} strategies finished "
+            f"in {time.monotonic() - start_time:.1f}s"
+        )
+        return valid_results, timed_out
+
+    def _run_strategy_in_own_session(self, user_query: str, strategy_name: str, connections: Dict[str, Any]) -> Dict[str, Any]:
+        """Worker-thread body: one session (pooled connection) per strategy."""
+        with Session(engine) as session:
+            data_fetcher = DataFetcher(
+                session,
+                # Server-side cap, so a runaway query is stopped even if cancel() is missed
+                query_timeout=MultiStrategyConfig.STRATEGY_TIMEOUT,
+                # Raw DBAPI connection, kept so the event loop can cancel the running statement
+                on_query_connection=lambda conn: connections.__setitem__(strategy_name, conn)
+            )
+            return self._execute_single_strategy(user_query, strategy_name, data_fetcher)
+
+    @staticmethod
+    def _cancel_query(dbapi_connection: Optional[Any]):
+        """Cancels the statement running on a connection (psycopg cancel / sqlite interrupt)."""
+        if dbapi_connection is None:
+            return
+        try:
+            if hasattr(dbapi_connection, "cancel"):
+                dbapi_connection.cancel()
+            elif hasattr(dbapi_connection, "interrupt"):
+                dbapi_connection.interrupt()
+        except Exception as e:
+            logger.warning(f"Could not cancel strategy query: {e}")
+
+    def _execute_single_strategy(self, user_query: str, strategy_name: str, data_fetcher: DataFetcher) -> Dict[str, Any]:
+        """Executes a single named strategy (blocking)."""
         try:
             strategy_def = {}
             if strategy_name == "sql_standard":
@@ -83,7 +161,8 @@ class StrategyEngine:
                     "selected_columns": ["text_situatia_de_fapt", "solutia"]
                 }
 
-            count, ids = self.data_fetcher.execute_discovery_queries(strategy_def)
+            # Per-strategy counts only feed the breakdown, so planner estimates are enough
+            count, ids = data_fetcher.execute_discovery_queries(strategy_def, exact_count=False)
             return {
                 "strategy_type": strategy_name,
                 "ids": ids,
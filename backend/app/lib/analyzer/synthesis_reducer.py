@@ -0,0 +1,287 @@
+"""
+Hierarchical (tree) reduction of partial results for synthesis.
+
+Instead of concatenating every chunk result into one synthesis prompt (which
+overflows the context on large plans), partial results are merged in groups of
+at most SYNTHESIS_FAN_IN, all groups of a level in parallel, until the
+remaining summaries fit one prompt. Depth grows with log(fan-in) of the
+chunk count, and no group prompt exceeds the budget, so nothing is truncated.
+
+Structured statistics (counts, percentages, averages) are never merged by the
+LLM: `merge_partial_stats` combines them deterministically in Python.
+"""
+import asyncio
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Partial results merged per LLM call
+SYNTHESIS_FAN_IN = 6
+
+# Safety bound on tree depth (6^8 chunks is far beyond any plan)
+MAX_REDUCTION_LEVELS = 8
+
+# Keys whose numeric values are rates/averages (weighted mean) rather than counts (sum)
+_RATIO_KEY = re.compile(r"(procent|percent|pct|%|rata|rate|ratio|medi|average|avg|mean)", re.IGNORECASE)
+_NUMERIC_STRING = re.compile(r"^\s*(-?\d+(?:[.,]\d+)?)\s*(%?)\s*$")
+
+
+def item_chars(item: Any) -> int:
+    """Size of an item as it appears in a prompt (indent=2 JSON)."""
+    return len(json.dumps(item, indent=2, ensure_ascii=False))
+
+
+def union_case_ids(items: Sequence[Dict[str, Any]], key: str = 'referenced_case_ids') -> List[int]:
+    """Sorted union of the case IDs referenced by all items (invalid IDs skipped)."""
+    ids = set()
+    for item in items:
+        values = item.get(key)
+        if not isinstance(values, list):
+            continue
+        for cid in values:
+            try:
+                ids.add(int(cid))
+            except (ValueError, TypeError):
+                continue
+    return sorted(ids)
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        match = _NUMERIC_STRING.match(value)
+        if match:
+            number = float(match.group(1).replace(',', '.'))
+            return int(number) if number.is_integer() and not match.group(2) else number
+    return None
+
+
+def _is_ratio(key: str, values: Sequence[Any]) -> bool:
+    return bool(_RATIO_KEY.search(key)) or any(isinstance(v, str) and v.strip().endswith('%') for v in values)
+
+
+def _merge_values(key: str, values: List[Any], weights: List[float]) -> Any:
+    numbers = [_as_number(v) for v in values]
+    if all(n is not None for n in numbers):
+        if _is_ratio(key, values):
+            total_weight = sum(weights) or len(numbers)
+            return round(sum(n * w for n, w in zip(numbers, weights)) / total_weight, 2)
+        total = sum(numbers)
+        return int(total) if float(total).is_integer() else round(total, 2)
+
+    if all(isinstance(v, dict) for v in values):
+        return _merge_dicts(values, weights)
+
+    if all(isinstance(v, list) for v in values):
+        merged, seen = [], set()
+        for value in values:
+            for element in value:
+                marker = json.dumps(element, sort_keys=True, ensure_ascii=False)
+                if marker not in seen:
+                    seen.add(marker)
+                    merged.append(element)
+        return merged
+
+    # Free text or mixed types: keep each distinct value once
+    distinct = []
+    for value in values:
+        if value not in distinct:
+            distinct.append(value)
+    return distinct[0] if len(distinct) == 1 else distinct
+
+
+def _merge_dicts(dicts: List[Dict[str, Any]], weights: List[float]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {}
+    keys: List[str] = []
+    for d in dicts:
+        for key in d:
+            if key not in keys:
+                keys.append(key)
+
+    for key in keys:
+        present = [(d[key], w) for d, w in zip(dicts, weights) if key in d and d[key] is not None]
+        if present:
+            merged[key] = _merge_values(key, [v for v, _ in present], [w for _, w in present])
+    return merged
+
+
+def _add_percentages(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds '<key>_procente' next to every category -> count distribution."""
+    result = dict(stats)
+    for key, value in stats.items():
+        if not isinstance(value, dict) or len(value) < 2 or _RATIO_KEY.search(key):
+            continue
+        if not all(isinstance(v, int) and not isinstance(v, bool) for v in value.values()):
+            continue
+        total = sum(value.values())
+        if total > 0:
+            result[f"{key}_procente"] = {k: round(100 * v / total, 1) for k, v in value.items()}
+    return result
+
+
+def merge_partial_stats(stats_list: Sequence[Any], weights: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+    """
+    Deterministically merges per-chunk `partial_stats`.
+
+    Counts are summed, rate/average keys are averaged weighted by `weights`
+    (e.g. analyzed_count per chunk), nested objects are merged recursively and
+    lists are concatenated without duplicates. Count distributions also get
+    their percentages recomputed from the merged totals.
+    """
+    pairs = [
+        (s, float(weights[i]) if weights and weights[i] else 1.0)
+        for i, s in enumerate(stats_list) if isinstance(s, dict) and s
+    ]
+    if not pairs:
+        return {}
+    merged = _merge_dicts([s for s, _ in pairs], [w for _, w in pairs])
+    return _add_percentages(merged)
+
+
+class HierarchicalReducer:
+    """
+    Reduces a list of partial results level by level with a fixed fan-in.
+
+    Args:
+        merge_group: Coroutine merging one group into one item (the LLM step);
+            called as merge_group(group, level, group_index)
+        budget_chars: Maximum serialized size of one group (and of the final level)
+        fan_in: Maximum items per group
+        concurrency: Groups merged in parallel
+        split_item: Optional function splitting an item that alone exceeds the
+            budget into smaller ones (returns [item] if it cannot)
+        max_final_items: Most items the final prompt may get even if they fit the
+            budget (None: reduce only when over budget)
+        progress_callback: Optional async callback receiving level progress
+    """
+
+    def __init__(
+        self,
+        merge_group: Callable[[List[Dict[str, Any]], int, int], Awaitable[Dict[str, Any]]],
+        budget_chars: int,
+        fan_in: int = SYNTHESIS_FAN_IN,
+        concurrency: int = 2,
+        split_item: Optional[Callable[[Dict[str, Any]], List[Dict[str, Any]]]] = None,
+        max_final_items: Optional[int] = None,
+        progress_callback: Optional[Callable] = None
+    ):
+        self.merge_group = merge_group
+        self.budget_chars = budget_chars
+        self.fan_in = max(2, fan_in)
+        self.concurrency = max(1, concurrency)
+        self.split_item = split_item
+        self.max_final_items = max_final_items
+        self.progress_callback = progress_callback
+
+    def fits(self, items: Sequence[Dict[str, Any]]) -> bool:
+        """True if the items can go to the final prompt as they are."""
+        if self.max_final_items is not None and len(items) > self.max_final_items:
+            return False
+        return item_chars(list(items)) <= self.budget_chars
+
+    async def reduce(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merges items until they fit a single prompt. Returns the final level."""
+        level = 0
+        while not self.fits(items) and level < MAX_REDUCTION_LEVELS:
+            level += 1
+            groups = self._group(self._split_oversized(items))
+            logger.info(f"[SYNTHESIS] Level {level}: {len(items)} items -> {len(groups)} groups (fan-in {self.fan_in})")
+
+            if self.progress_callback:
+                await self.progress_callback({"stage": "synthesis", "level": level, "groups": len(groups)})
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def merge(index: int, group: List[Dict[str, Any]]) -> Dict[str, Any]:
+                async with semaphore:
+                    return await self.merge_group(group, level, index)
+
+            merged = await asyncio.gather(*(merge(i, g) for i, g in enumerate(groups)))
+
+            if len(merged) >= len(items) and item_chars(merged) >= item_chars(items):
+                logger.warning(f"[SYNTHESIS] Level {level} did not shrink the results, stopping reduction")
+                items = list(merged)
+                break
+            items = list(merged)
+
+        if not self.fits(items):
+            items = self._trim(items)
+        return items
+
+    # --- Helpers ---
+
+    def _split_oversized(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.split_item is None:
+            return items
+        result = []
+        for item in items:
+            pending = [item]
+            while pending:
+                current = pending.pop(0)
+                if item_chars(current) <= self.budget_chars:
+                    result.append(current)
+                    continue
+                parts = self.split_item(current)
+                if len(parts) <= 1:
+                    result.append(current)
+                else:
+                    pending = parts + pending
+        return result
+
+    def _trim(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Last resort when merging could not shrink the results (e.g. failed merges were
+        concatenated): keeps the first half of the largest splittable item, otherwise
+        drops the last (lowest-ranked) item, until the final prompt fits the budget.
+        """
+        items = list(items)
+        halved = dropped = 0
+        while len(items) > 1 or (items and self.split_item is not None):
+            if self.fits(items):
+                break
+            largest = max(range(len(items)), key=lambda i: item_chars(items[i]))
+            parts = self.split_item(items[largest]) if self.split_item is not None else [items[largest]]
+            if len(parts) > 1:
+                items[largest] = parts[0]
+                halved += 1
+            elif len(items) > 1:
+                items.pop()
+                dropped += 1
+            else:
+                break
+        logger.warning(
+            f"[SYNTHESIS] Results still over budget after reduction: halved {halved} items, "
+            f"dropped {dropped} to fit {self.budget_chars} chars"
+        )
+        return items
+
+    def _group(self, items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Consecutive groups of at most fan_in items and budget_chars characters."""
+        groups: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        current_chars = 2
+        for item in items:
+            size = item_chars(item) + 2
+            if current and (len(current) >= self.fan_in or current_chars + size > self.budget_chars):
+                groups.append(current)
+                current, current_chars = [], 2
+            current.append(item)
+            current_chars += size
+        if current:
+            groups.append(current)
+        return groups
+
+
+def split_extracted_data(item: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Splits a partial result in two halves of its extracted_data list."""
+    data = item.get('extracted_data')
+    if not isinstance(data, list) or len(data) < 2:
+        return [item]
+    middle = len(data) // 2
+    return [{**item, 'extracted_data': data[:middle]}, {**item, 'extracted_data': data[middle:]}]
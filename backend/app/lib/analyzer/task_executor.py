@@ -26,11 +26,7 @@ class TaskExecutor:
         from ..email_utils import send_batch_completion_email
 
         start_time = time.time()
-        queue_data = self.task_queue_manager.get_queue()
-        approved_tasks = [
-            t for t in queue_data["tasks"]
-            if t["state"] == "approved" or t["state"] == "failed"
-        ]
+        approved_tasks = self.task_queue_manager.get_tasks(["approved", "failed"])
 
         # Sort by creation time to ensure FIFO, though list order should generally be preserved
         approved_tasks.sort(key=lambda x: x["created_at"])
@@ -1,19 +1,29 @@
 import json
 import os
-import shutil
+import sqlite3
 import time
 import uuid
 import logging
-from typing import List, Dict, Optional, Any
+from contextlib import contextmanager
+from typing import Iterable, List, Dict, Optional, Any
 
 logger = logging.getLogger(__name__)
 
+SCHEMA_VERSION = "2.0"
+
+# Columns kept outside the JSON payload (indexed or used for ordering)
+_COLUMN_FIELDS = ("id", "state", "created_at", "updated_at")
+
 class TaskQueueManager:
     """
     Manages a persistent queue of analysis tasks.
 
-    Storage: analyzer_plans/task_queue.json
-    Schema Version: 1.0
+    Storage: analyzer_plans/task_queue.db (SQLite, WAL mode)
+    Schema Version: 2.0
+
+    Every change is a single transaction touching only the affected rows, so the
+    gunicorn workers sharing the directory never overwrite each other's updates.
+    The legacy task_queue.json is imported once on first use.
 
     Task States:
     - pending: Added to queue, not yet planned
@@ -27,20 +37,12 @@ class TaskQueueManager:
 
     def __init__(self, storage_dir: str = "analyzer_plans"):
         self.storage_dir = storage_dir
-        self.queue_file = os.path.join(storage_dir, "task_queue.json")
+        self.db_file = os.path.join(storage_dir, "task_queue.db")
+        self.legacy_queue_file = os.path.join(storage_dir, "task_queue.json")
         os.makedirs(storage_dir, exist_ok=True)
 
-        # Ensure queue file exists with metadata structure
-        if not os.path.exists(self.queue_file):
-            self._save_queue_data({
-                "version": "1.0",
-                "queue_metadata": {
-                    "original_query": None,
-                    "decomposition_timestamp": None,
-                    "decomposition_rationale": None
-                },
-                "tasks": []
-            })
+        self._init_db()
+        self._migrate_from_json()
 
     def add_task(self, query: str, user_metadata: Dict[str, Any] = None) -> str:
         """Adds a new task to the queue and returns its ID."""
@@ -57,9 +59,8 @@ class TaskQueueManager:
             "error": None
         }
 
-        queue_data = self.load_queue()
-        queue_data["tasks"].append(task)
-        self._save_queue_data(queue_data)
+        with self._transaction() as conn:
+            self._insert_task(conn, task)
         logger.info(f"Task {task_id} added to queue.")
         return task_id
 
@@ -67,48 +68,70 @@ class TaskQueueManager:
         """Returns the current queue data including metadata."""
         return self.load_queue()
 
+    def get_tasks(self, states: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Returns tasks in queue order, optionally only those in the given states.
+
+        Uses the state index, so callers looking for e.g. approved tasks do not
+        load the plans and results of every other task.
+        """
+        with self._connect() as conn:
+            if states is None:
+                rows = conn.execute("SELECT * FROM tasks ORDER BY seq").fetchall()
+            else:
+                states = list(states)
+                placeholders = ",".join("?" for _ in states)
+                rows = conn.execute(
+                    f"SELECT * FROM tasks WHERE state IN ({placeholders}) ORDER BY seq", states
+                ).fetchall()
+        return [self._row_to_task(row) for row in rows]
+
+    def count_tasks(self) -> int:
+        """Returns the number of tasks in the queue."""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Returns a specific task by ID."""
-        queue_data = self.load_queue()
-        for task in queue_data["tasks"]:
-            if task["id"] == task_id:
-                return task
-        return None
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return self._row_to_task(row) if row else None
 
     def remove_task(self, task_id: str) -> bool:
         """Removes a task from the queue."""
-        queue_data = self.load_queue()
-        original_count = len(queue_data["tasks"])
-        queue_data["tasks"] = [t for t in queue_data["tasks"] if t["id"] != task_id]
+        with self._transaction() as conn:
+            removed = conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,)).rowcount
 
-        if len(queue_data["tasks"]) < original_count:
-            self._save_queue_data(queue_data)
+        if removed:
             logger.info(f"Task {task_id} removed from queue.")
             return True
         return False
 
     def update_task_state(self, task_id: str, new_state: str, data: Dict[str, Any] = None):
         """Updates a task's state and merges additional data."""
-        queue_data = self.load_queue()
-        updated = False
-
-        for task in queue_data["tasks"]:
-            if task["id"] == task_id:
-                task["state"] = new_state
-                task["updated_at"] = time.time()
-                if data:
+        now = time.time()
+
+        with self._transaction() as conn:
+            if not data:
+                # Plain state change: no need to touch the JSON payload
+                updated = conn.execute(
+                    "UPDATE tasks SET state = ?, updated_at = ? WHERE id = ?",
+                    (new_state, now, task_id)
+                ).rowcount
+            else:
+                row = conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+                updated = 0
+                if row:
+                    task = self._row_to_task(row)
                     # Merge data keys into task
                     for key, value in data.items():
                         task[key] = value
-                updated = True
-                break
-
-        if updated:
-            self._save_queue_data(queue_data)
-            # Create a backup on significant state changes
-            if new_state in ["planned", "completed", "failed"]:
-                self._create_backup()
-        else:
+                    task["state"] = new_state
+                    task["updated_at"] = now
+                    self._write_task(conn, task)
+                    updated = 1
+
+        if not updated:
             logger.warning(f"Attempted to update non-existent task {task_id}")
 
     def save_task_result(self, task_id: str, result: Dict[str, Any]):
@@ -120,22 +143,20 @@ class TaskQueueManager:
 
     def clear_all_tasks(self):
         """Removes ALL tasks from the queue (reset)."""
-        self._save_queue_data({
-            "version": "1.0",
-            "queue_metadata": {},
-            "tasks": []
-        })
-        logger.info("Queue completely cleared (reset).")
         self._create_backup()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.execute("DELETE FROM queue_metadata")
+        logger.info("Queue completely cleared (reset).")
 
     def clear_completed_tasks(self):
         """Removes all completed or failed tasks from the queue."""
-        queue_data = self.load_queue()
-        original_count = len(queue_data["tasks"])
-        queue_data["tasks"] = [t for t in queue_data["tasks"] if t["state"] not in ["completed", "failed"]]
+        with self._transaction() as conn:
+            removed = conn.execute(
+                "DELETE FROM tasks WHERE state IN ('completed', 'failed')"
+            ).rowcount
 
-        if len(queue_data["tasks"]) < original_count:
-            self._save_queue_data(queue_data)
+        if removed:
             logger.info("Cleared completed/failed tasks from queue.")
             return True
         return False
@@ -151,18 +172,19 @@ class TaskQueueManager:
             original_query: The original user request that initiated task decomposition
             metadata: Additional metadata (decomposition_rationale, etc.)
         """
-        queue_data = self.load_queue()
-        if "queue_metadata" not in queue_data:
-            queue_data["queue_metadata"] = {}
-
-        queue_data["queue_metadata"]["original_query"] = original_query
-        queue_data["queue_metadata"]["decomposition_timestamp"] = time.time()
-
+        values = {
+            "original_query": original_query,
+            "decomposition_timestamp": time.time()
+        }
         if metadata:
-            queue_data["queue_metadata"].update(metadata)
+            values.update(metadata)
 
-        # Atomic write - ensures data survives crashes
-        self._save_queue_data(queue_data)
+        # Single transaction - ensures data survives crashes
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO queue_metadata (key, value) VALUES (?, ?)",
+                [(k, json.dumps(v, ensure_ascii=False)) for k, v in values.items()]
+            )
 
         # Create backup immediately (this is critical metadata)
         self._create_backup()
@@ -176,8 +198,8 @@ class TaskQueueManager:
 
         Returns empty dict if no metadata found (for backward compatibility).
         """
-        queue_data = self.load_queue()
-        return queue_data.get("queue_metadata", {})
+        with self._connect() as conn:
+            return self._read_metadata(conn)
 
     def validate_queue_for_report_generation(self) -> Dict[str, Any]:
         """
@@ -192,9 +214,9 @@ class TaskQueueManager:
                 'pending_tasks': int
             }
         """
-        queue_data = self.load_queue()
-        metadata = queue_data.get("queue_metadata", {})
-        tasks = queue_data.get("tasks", [])
+        metadata = self.get_queue_metadata()
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
 
         errors = []
 
@@ -203,13 +225,13 @@ class TaskQueueManager:
             errors.append("No original query found in queue metadata")
 
         # Check 2: Tasks exist
-        if not tasks:
+        if not counts:
             errors.append("Queue is empty - no tasks to synthesize")
 
         # Check 3: Count task states
-        completed = len([t for t in tasks if t['state'] == 'completed'])
-        failed = len([t for t in tasks if t['state'] == 'failed'])
-        pending = len([t for t in tasks if t['state'] not in ['completed', 'failed']])
+        completed = counts.get('completed', 0)
+        failed = counts.get('failed', 0)
+        pending = sum(counts.values()) - completed - failed
 
         # Check 4: At least some completed tasks
         if completed == 0:
@@ -228,41 +250,178 @@ class TaskQueueManager:
         }
 
     def load_queue(self) -> Dict[str, Any]:
-        """Loads the queue from disk with error handling."""
+        """Loads the full queue (metadata and all tasks) in the legacy JSON shape."""
         try:
-            with open(self.queue_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError) as e:
+            with self._connect() as conn:
+                metadata = self._read_metadata(conn)
+                rows = conn.execute("SELECT * FROM tasks ORDER BY seq").fetchall()
+            return {
+                "version": SCHEMA_VERSION,
+                "queue_metadata": metadata,
+                "tasks": [self._row_to_task(row) for row in rows]
+            }
+        except sqlite3.Error as e:
             logger.error(f"Error loading queue: {e}. Returning empty queue.")
             return {
-                "version": "1.0",
+                "version": SCHEMA_VERSION,
                 "queue_metadata": {},
                 "tasks": []
             }
 
-    def _save_queue_data(self, data: Dict[str, Any]):
-        """Atomic write to disk."""
-        tmp_file = self.queue_file + ".tmp"
+    # --- Storage helpers ---
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection; cheap for SQLite and safe across worker processes."""
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
         try:
-            with open(tmp_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            os.replace(tmp_file, self.queue_file)
-        except Exception as e:
-            logger.error(f"Error saving queue: {e}")
-            if os.path.exists(tmp_file):
-                os.remove(tmp_file)
-            raise
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Write transaction. BEGIN IMMEDIATE takes the write lock up front, so a
+        read-modify-write in one worker cannot interleave with another's.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL UNIQUE,
+                    state TEXT NOT NULL,
+                    user_id TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks (state);
+                CREATE INDEX IF NOT EXISTS idx_tasks_user_state ON tasks (user_id, state);
+                CREATE TABLE IF NOT EXISTS queue_metadata (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE IF NOT EXISTS store_info (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+
+    def _migrate_from_json(self):
+        """One-time import of the legacy task_queue.json (version 1.0)."""
+        if not os.path.exists(self.legacy_queue_file):
+            return
+
+        with self._connect() as conn:
+            done = conn.execute("SELECT 1 FROM store_info WHERE key = 'json_migrated'").fetchone()
+        if done:
+            return
+
+        try:
+            with open(self.legacy_queue_file, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Error reading legacy queue file for migration: {e}")
+            legacy = {}
+
+        with self._transaction() as conn:
+            # Re-check under the write lock: another worker may have migrated meanwhile
+            if conn.execute("SELECT 1 FROM store_info WHERE key = 'json_migrated'").fetchone():
+                return
+
+            tasks = legacy.get("tasks", [])
+            for task in tasks:
+                if task.get("id") and not conn.execute(
+                    "SELECT 1 FROM tasks WHERE id = ?", (task["id"],)
+                ).fetchone():
+                    self._insert_task(conn, task)
+
+            metadata = legacy.get("queue_metadata") or {}
+            conn.executemany(
+                "INSERT OR IGNORE INTO queue_metadata (key, value) VALUES (?, ?)",
+                [(k, json.dumps(v, ensure_ascii=False)) for k, v in metadata.items() if v is not None]
+            )
+            conn.execute(
+                "INSERT INTO store_info (key, value) VALUES ('json_migrated', ?)", (str(time.time()),)
+            )
+
+        logger.info(f"Migrated {len(tasks)} tasks from {self.legacy_queue_file} to {self.db_file}")
+
+    def _insert_task(self, conn: sqlite3.Connection, task: Dict[str, Any]):
+        conn.execute(
+            "INSERT INTO tasks (id, state, user_id, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+            self._task_params(task)
+        )
+
+    def _write_task(self, conn: sqlite3.Connection, task: Dict[str, Any]):
+        task_id, state, user_id, created_at, updated_at, data = self._task_params(task)
+        conn.execute(
+            "UPDATE tasks SET state = ?, user_id = ?, created_at = ?, updated_at = ?, data = ? WHERE id = ?",
+            (state, user_id, created_at, updated_at, data, task_id)
+        )
+
+    @staticmethod
+    def _task_params(task: Dict[str, Any]) -> tuple:
+        user_metadata = task.get("user_metadata") or {}
+        user_id = user_metadata.get("user_id") or user_metadata.get("email")
+        payload = {k: v for k, v in task.items() if k not in _COLUMN_FIELDS}
+        now = time.time()
+        return (
+            task["id"],
+            task.get("state", "pending"),
+            str(user_id) if user_id is not None else None,
+            task.get("created_at") or now,
+            task.get("updated_at") or now,
+            json.dumps(payload, ensure_ascii=False)
+        )
+
+    @staticmethod
+    def _row_to_task(row: sqlite3.Row) -> Dict[str, Any]:
+        task = {
+            "id": row["id"],
+            "state": row["state"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+        task.update(json.loads(row["data"]))
+        return task
+
+    @staticmethod
+    def _read_metadata(conn: sqlite3.Connection) -> Dict[str, Any]:
+        return {
+            row["key"]: json.loads(row["value"])
+            for row in conn.execute("SELECT key, value FROM queue_metadata")
+        }
 
     def _create_backup(self):
-        """Creates a timestamped backup of the queue file."""
+        """Creates a timestamped snapshot of the queue database."""
         try:
             timestamp = int(time.time())
-            backup_file = os.path.join(self.storage_dir, f"task_queue.backup.{timestamp}.json")
-            shutil.copy2(self.queue_file, backup_file)
+            backup_file = os.path.join(self.storage_dir, f"task_queue.backup.{timestamp}.db")
+            with self._connect() as conn:
+                target = sqlite3.connect(backup_file)
+                try:
+                    conn.backup(target)
+                finally:
+                    target.close()
 
             # Keep only last 10 backups
             backups = sorted(
-                [f for f in os.listdir(self.storage_dir) if f.startswith("task_queue.backup.") and f.endswith(".json")]
+                [f for f in os.listdir(self.storage_dir) if f.startswith("task_queue.backup.") and f.endswith(".db")]
             )
             while len(backups) > 10:
                 os.remove(os.path.join(self.storage_dir, backups.pop(0)))
@@ -0,0 +1,616 @@
+"""
+Offline, deterministic stand-in for the Ollama server and the network LLM file bridge.
+
+Lets the queue, analyzer and precalculation paths run (and be benchmarked)
+without the GPU machine or the network share:
+- POST /api/embed     {"model", "input": str | [str]} -> {"embeddings": [[...], ...]}
+- POST /api/generate  {"model", "prompt", "stream"} -> NDJSON chunks, or one JSON object
+- GET  /api/tags, /api/version (health checks)
+- File drop: every prompt_*.txt written to `drop_dir` gets a raspuns_+_prompt_*.txt
+  next to it, as the external process behind NetworkFileSaver does
+
+Outputs are deterministic. Embeddings are hashed bag-of-words vectors (reworded
+texts stay close, so similarity caches behave realistically). Generations come
+from canned responses matched by substring/regex, or from a JSON object derived
+from the prompt hash. Latencies and injected failures are drawn from an RNG
+seeded with (seed, request, occurrence of that request), so a run replays the
+same way regardless of thread scheduling.
+
+Usage:
+    python -m app.lib.llm_simulator --port 11435 --drop-dir /tmp/llm_drop --config sim.json
+
+    then set OLLAMA_URL=http://127.0.0.1:11435, setari_llm.llm_url to
+    http://127.0.0.1:11435/api/generate and the network folder to the drop dir.
+
+In pytest, `pytest_plugins = ["app.lib.llm_simulator"]` provides the
+`llm_simulator` fixture (a running simulator on a free port, without latency).
+"""
+import argparse
+import hashlib
+import json
+import logging
+import operator
+import os
+import random
+import re
+import struct
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Distribution = Callable[[random.Random], float]
+
+_TOKEN = re.compile(r'\w+')
+_CASE_ID = re.compile(r'"id"\s*:\s*(\d+)')
+_STREAM_PIECE = re.compile(r'.{1,4}', re.DOTALL)
+
+# Words for generated interpretations (deterministic filler)
+_VOCABULARY = (
+    "instanța", "dosarul", "speța", "soluția", "admis", "respins", "apel", "recurs", "contestație",
+    "pedeapsa", "amenda", "probatoriu", "motivarea", "practica", "judiciară", "majoritatea", "cazurilor",
+    "analizate", "indică", "tendință", "constantă", "față", "de", "perioada", "anterioară", "iar", "în"
+)
+
+
+@dataclass
+class SimulatorConfig:
+    """
+    Behaviour of the simulator. Latencies are distributions in seconds:
+    "0.5", "fixed:0.5", "uniform:a,b", "normal:mu,sigma", "lognormal:mu,sigma", "exponential:mean".
+    """
+    seed: int = 0
+    vector_dim: int = 1536
+
+    # /api/embed
+    embed_latency: str = "fixed:0.01"
+    embed_latency_per_input: str = "fixed:0.002"
+    embed_error_rate: float = 0.0
+
+    # /api/generate
+    first_token_latency: str = "uniform:0.2,0.6"
+    tokens_per_second: float = 40.0          # 0: no throughput limit
+    generate_chars: int = 1200               # size of hashed (non-canned) outputs
+    error_rate: float = 0.0                  # HTTP 500 before any output
+    stream_error_rate: float = 0.0           # {"error"} line in the middle of the stream
+    truncate_rate: float = 0.0               # output cut short (done_reason "length")
+
+    # Server capacity (like OLLAMA_NUM_PARALLEL / OLLAMA_MAX_QUEUE)
+    max_concurrency: int = 1
+    max_queue: int = 512
+
+    # File drop protocol
+    file_latency: str = "uniform:1,3"
+    file_drop_rate: float = 0.0              # prompt never answered (caller times out)
+    file_workers: int = 1
+    file_poll_interval: float = 0.2
+
+    # [{"contains": "...", "regex": "...", "endpoint": "generate"|"file", "response": str | object}]
+    canned: List[Dict[str, Any]] = field(default_factory=list)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'SimulatorConfig':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown simulator settings: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+
+def parse_distribution(spec: Any) -> Distribution:
+    """Turns a latency spec into a sampler (never negative)."""
+    if isinstance(spec, (int, float)):
+        value = max(0.0, float(spec))
+        return lambda rng: value
+
+    name, _, args = str(spec).partition(':')
+    try:
+        if not args:
+            value = max(0.0, float(name))
+            return lambda rng: value
+        params = [float(p) for p in args.split(',')]
+    except ValueError:
+        raise ValueError(f"Invalid latency distribution: {spec!r}")
+
+    samplers = {
+        'fixed': (1, lambda rng, p: p[0]),
+        'uniform': (2, lambda rng, p: rng.uniform(p[0], p[1])),
+        'normal': (2, lambda rng, p: rng.gauss(p[0], p[1])),
+        'lognormal': (2, lambda rng, p: rng.lognormvariate(p[0], p[1])),
+        'exponential': (1, lambda rng, p: rng.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0),
+    }
+    if name not in samplers or len(params) != samplers[name][0]:
+        raise ValueError(f"Invalid latency distribution: {spec!r}")
+    sample = samplers[name][1]
+    return lambda rng: max(0.0, sample(rng, params))
+
+
+class LLMSimulator:
+    """
+    HTTP server (Ollama API subset) plus file-drop responder.
+
+    Use as a context manager, or call start()/stop():
+        with LLMSimulator(SimulatorConfig(seed=1), drop_dir="/tmp/drop") as sim:
+            ... sim.base_url ...
+    """
+
+    def __init__(
+        self,
+        config: Optional[SimulatorConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        drop_dir: Optional[str] = None
+    ):
+        self.config = config or SimulatorConfig()
+        self.host = host
+        self.port = port
+        self.drop_dir = drop_dir
+
+        self._embed_latency = parse_distribution(self.config.embed_latency)
+        self._embed_latency_per_input = parse_distribution(self.config.embed_latency_per_input)
+        self._first_token_latency = parse_distribution(self.config.first_token_latency)
+        self._file_latency = parse_distribution(self.config.file_latency)
+        self._canned = [self._compile_canned(entry) for entry in self.config.canned]
+
+        self._lock = threading.Lock()
+        self._occurrences: Counter = Counter()
+        self._slots = threading.Semaphore(max(1, self.config.max_concurrency))
+        self._pending = 0
+        self._stats = Counter()
+        self._peak_active = 0
+        self._active = 0
+
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._server_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._drop_thread: Optional[threading.Thread] = None
+        self._drop_pool: Optional[ThreadPoolExecutor] = None
+        self._seen_prompts: set = set()
+
+    # --- Lifecycle ---
+
+    def start(self) -> 'LLMSimulator':
+        simulator = self
+
+        class Handler(_OllamaHandler):
+            pass
+        Handler.simulator = simulator
+
+        self._stop.clear()
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name="llm-simulator", daemon=True)
+        self._server_thread.start()
+
+        if self.drop_dir:
+            os.makedirs(self.drop_dir, exist_ok=True)
+            self._seen_prompts = set(self._prompt_files())
+            self._drop_pool = ThreadPoolExecutor(max_workers=max(1, self.config.file_workers), thread_name_prefix="llm-sim-file")
+            self._drop_thread = threading.Thread(target=self._watch_drop_dir, name="llm-simulator-drop", daemon=True)
+            self._drop_thread.start()
+
+        logger.info(f"[LLM-SIM] Listening on {self.base_url}" + (f", answering prompts in {self.drop_dir}" if self.drop_dir else ""))
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._drop_thread is not None:
+            self._drop_thread.join(timeout=5)
+            self._drop_thread = None
+        if self._drop_pool is not None:
+            self._drop_pool.shutdown(wait=False, cancel_futures=True)
+            self._drop_pool = None
+
+    def __enter__(self) -> 'LLMSimulator':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def generate_url(self) -> str:
+        return f"{self.base_url}/api/generate"
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+            stats['active'] = self._active
+            stats['peak_active'] = self._peak_active
+            stats['pending'] = self._pending
+        return stats
+
+    # --- Deterministic outputs ---
+
+    def embedding(self, text: str) -> List[float]:
+        """Unit vector: sum of hashed per-token vectors, weighted by token counts."""
+        counts = Counter(_TOKEN.findall(text.lower())) or Counter([text])
+        total = [0.0] * self.config.vector_dim
+        for token, count in counts.items():
+            vector = _token_vector(self.config.seed, token, self.config.vector_dim)
+            if count == 1:
+                total = list(map(operator.add, total, vector))
+            else:
+                total = [t + count * v for t, v in zip(total, vector)]
+        norm = sum(x * x for x in total) ** 0.5 or 1.0
+        return [round(x / norm, 6) for x in total]
+
+    def response_for(self, prompt: str, endpoint: str = "generate") -> str:
+        """Canned response for the prompt, or a JSON object derived from its hash."""
+        for matches, entry_endpoint, response in self._canned:
+            if entry_endpoint in (None, endpoint) and matches(prompt):
+                return response
+
+        digest = hashlib.sha256(f"{self.config.seed}:{prompt}".encode('utf-8')).hexdigest()
+        rng = random.Random(int(digest[:16], 16))
+        case_ids = sorted({int(cid) for cid in _CASE_ID.findall(prompt)})[:20]
+        words: List[str] = []
+        while sum(len(w) + 1 for w in words) < self.config.generate_chars:
+            words.append(rng.choice(_VOCABULARY))
+        return json.dumps({
+            "results": {
+                "simulated": True,
+                "prompt_hash": digest[:12],
+                "total_analizate": len(case_ids) or rng.randint(5, 200),
+                "distributie": {f"categoria_{i + 1}": rng.randint(1, 50) for i in range(rng.randint(2, 5))}
+            },
+            "interpretation": " ".join(words).capitalize() + ".",
+            "referenced_case_ids": case_ids,
+            "charts": []
+        }, ensure_ascii=False)
+
+    # --- Request handling (called from server threads) ---
+
+    def request_rng(self, kind: str, text: str) -> random.Random:
+        """RNG for one request: same (seed, request, n-th repetition) -> same draws."""
+        key = hashlib.sha256(f"{kind}\0{text}".encode('utf-8')).hexdigest()
+        with self._lock:
+            occurrence = self._occurrences[key]
+            self._occurrences[key] += 1
+        seed = hashlib.sha256(f"{self.config.seed}:{key}:{occurrence}".encode('utf-8')).digest()
+        return random.Random(int.from_bytes(seed[:8], 'big'))
+
+    def acquire_slot(self) -> bool:
+        """Waits for a free slot; False (server busy) when the queue is full."""
+        with self._lock:
+            if self._pending >= self.config.max_queue:
+                self._stats['rejected_busy'] += 1
+                return False
+            self._pending += 1
+        self._slots.acquire()
+        with self._lock:
+            self._pending -= 1
+            self._active += 1
+            self._peak_active = max(self._peak_active, self._active)
+        return True
+
+    def release_slot(self):
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def sample_first_token(self, rng: random.Random) -> float:
+        return self._first_token_latency(rng)
+
+    def sample_embed_latency(self, rng: random.Random, inputs: int) -> float:
+        return self._embed_latency(rng) + sum(self._embed_latency_per_input(rng) for _ in range(inputs))
+
+    # --- File drop ---
+
+    def _prompt_files(self) -> List[str]:
+        try:
+            with os.scandir(self.drop_dir) as entries:
+                return [e.name for e in entries if e.is_file() and e.name.startswith('prompt_') and e.name.endswith('.txt')]
+        except OSError as e:
+            logger.warning(f"[LLM-SIM] Cannot scan {self.drop_dir}: {e}")
+            return []
+
+    def _watch_drop_dir(self):
+        while not self._stop.wait(self.config.file_poll_interval):
+            for name in self._prompt_files():
+                if name in self._seen_prompts:
+                    continue
+                self._seen_prompts.add(name)
+                self._drop_pool.submit(self._answer_prompt_file, name)
+
+    def _answer_prompt_file(self, name: str):
+        path = os.path.join(self.drop_dir, name)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                prompt = f.read()
+        except OSError as e:
+            logger.warning(f"[LLM-SIM] Cannot read {path}: {e}")
+            return
+
+        rng = self.request_rng("file", prompt)
+        self.count('file_prompts')
+        if self._stop.wait(self._file_latency(rng)):
+            return
+        if rng.random() < self.config.file_drop_rate:
+            self.count('file_dropped')
+            logger.info(f"[LLM-SIM] Dropping {name} (simulated lost response)")
+            return
+
+        response_name = name.replace('prompt_', 'raspuns_+_prompt_', 1)
+        temp_path = os.path.join(self.drop_dir, f".{response_name}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.response_for(prompt, endpoint="file"))
+        # Rename: watchers see the complete file at once (IN_MOVED_TO)
+        os.replace(temp_path, os.path.join(self.drop_dir, response_name))
+        self.count('file_responses')
+
+    # --- Helpers ---
+
+    @staticmethod
+    def _compile_canned(entry: Dict[str, Any]) -> Tuple[Callable[[str], bool], Optional[str], str]:
+        if 'response' not in entry or not ('contains' in entry or 'regex' in entry):
+            raise ValueError(f"Canned response needs 'response' and 'contains' or 'regex': {entry}")
+        if 'regex' in entry:
+            pattern = re.compile(entry['regex'], re.DOTALL)
+            matches = lambda prompt: pattern.search(prompt) is not None
+        else:
+            needle = entry['contains']
+            matches = lambda prompt: needle in prompt
+        response = entry['response']
+        if not isinstance(response, str):
+            response = json.dumps(response, ensure_ascii=False)
+        return matches, entry.get('endpoint'), response
+
+
+@lru_cache(maxsize=65536)
+def _token_vector(seed: int, token: str, dim: int) -> Tuple[float, ...]:
+    """Pseudo-random vector of a token, uniform in [-1, 1) per component."""
+    raw = hashlib.shake_256(f"{seed}:{token}".encode('utf-8')).digest(2 * dim)
+    return tuple(v / 32768.0 for v in struct.unpack(f'<{dim}h', raw))
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    """Ollama API subset over HTTP/1.1 (keep-alive, chunked NDJSON streams)."""
+
+    protocol_version = "HTTP/1.1"
+    simulator: LLMSimulator = None
+
+    def log_message(self, format, *args):
+        logger.debug(f"[LLM-SIM] {self.address_string()} {format % args}")
+
+    def do_GET(self):
+        if self.path == '/api/version':
+            self._send_json(200, {"version": "0.0.0-simulator"})
+        elif self.path == '/api/tags':
+            self._send_json(200, {"models": []})
+        else:
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except (ValueError, json.JSONDecodeError):
+            self._send_json(400, {"error": "invalid JSON body"})
+            return
+
+        if self.path == '/api/embed':
+            handler = self._embed
+        elif self.path == '/api/generate':
+            handler = self._generate
+        else:
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+            return
+
+        sim = self.simulator
+        if not sim.acquire_slot():
+            self._send_json(503, {"error": "server busy, please try again.  maximum pending requests exceeded"})
+            return
+        try:
+            handler(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client closed the stream (e.g. JSON object complete): generation stops
+            sim.count('client_disconnects')
+            self.close_connection = True
+        finally:
+            sim.release_slot()
+
+    def _embed(self, payload: Dict[str, Any]):
+        sim = self.simulator
+        inputs = payload.get('input', payload.get('prompt', ''))
+        texts = [inputs] if isinstance(inputs, str) else [str(t) for t in inputs]
+        rng = sim.request_rng("embed", "\0".join(texts))
+        sim.count('embed_requests')
+        sim.count('embed_inputs', len(texts))
+
+        start = time.monotonic()
+        time.sleep(sim.sample_embed_latency(rng, len(texts)))
+        if rng.random() < sim.config.embed_error_rate:
+            sim.count('embed_errors')
+            self._send_json(500, {"error": "simulated embedding failure"})
+            return
+
+        self._send_json(200, {
+            "model": payload.get('model', ''),
+            "embeddings": [sim.embedding(text) for text in texts],
+            "total_duration": int((time.monotonic() - start) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": sum(len(_TOKEN.findall(text)) for text in texts)
+        })
+
+    def _generate(self, payload: Dict[str, Any]):
+        sim = self.simulator
+        config = sim.config
+        prompt = str(payload.get('prompt', ''))
+        model = payload.get('model', '')
+        rng = sim.request_rng("generate", prompt)
+        sim.count('generate_requests')
+
+        start = time.monotonic()
+        time.sleep(sim.sample_first_token(rng))
+        if rng.random() < config.error_rate:
+            sim.count('generate_errors')
+            self._send_json(500, {"error": "simulated model failure"})
+            return
+
+        pieces = _STREAM_PIECE.findall(sim.response_for(prompt))
+        done_reason = "stop"
+        error_at = None
+        if rng.random() < config.truncate_rate:
+            pieces = pieces[:rng.randint(0, max(0, len(pieces) - 1))]
+            done_reason = "length"
+            sim.count('generate_truncated')
+        elif rng.random() < config.stream_error_rate:
+            error_at = rng.randint(0, len(pieces))
+
+        stream = payload.get('stream', True)
+        first_token = time.monotonic()
+        if not stream:
+            if config.tokens_per_second > 0:
+                time.sleep(len(pieces) / config.tokens_per_second)
+            if error_at is not None:
+                sim.count('generate_errors')
+                self._send_json(500, {"error": "simulated model failure"})
+                return
+            self._send_json(200, {
+                "model": model, "created_at": _timestamp(), "response": "".join(pieces),
+                **self._final_stats(prompt, len(pieces), start, first_token, done_reason)
+            })
+            sim.count('generate_tokens', len(pieces))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        for index, piece in enumerate(pieces):
+            if index == error_at:
+                sim.count('generate_errors')
+                self._send_chunk({"error": "simulated failure during generation"})
+                self._end_chunks()
+                return
+            if config.tokens_per_second > 0:
+                # Absolute schedule: steady throughput regardless of sleep granularity
+                delay = first_token + index / config.tokens_per_second - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self._send_chunk({"model": model, "created_at": _timestamp(), "response": piece, "done": False})
+            sim.count('generate_tokens')
+
+        self._send_chunk({
+            "model": model, "created_at": _timestamp(), "response": "",
+            **self._final_stats(prompt, len(pieces), start, first_token, done_reason)
+        })
+        self._end_chunks()
+
+    @staticmethod
+    def _final_stats(prompt: str, tokens: int, start: float, first_token: float, done_reason: str) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "done": True,
+            "done_reason": done_reason,
+            "total_duration": int((now - start) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": len(prompt) // 4,
+            "prompt_eval_duration": int((first_token - start) * 1e9),
+            "eval_count": tokens,
+            "eval_duration": max(1, int((now - first_token) * 1e9))
+        }
+
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, body: Dict[str, Any]):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8') + b'\n'
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunks(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline Ollama / network-LLM simulator for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--config", help="JSON file with SimulatorConfig fields")
+    parser.add_argument("--drop-dir", help="Directory to answer prompt_*.txt files in (file drop protocol)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--tokens-per-second", type=float)
+    parser.add_argument("--max-concurrency", type=int)
+    parser.add_argument("--error-rate", type=float)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    config = SimulatorConfig.from_file(args.config) if args.config else SimulatorConfig()
+    for name in ("seed", "tokens_per_second", "max_concurrency", "error_rate"):
+        value = getattr(args, name)
+        if value is not None:
+            setattr(config, name, value)
+
+    simulator = LLMSimulator(config, host=args.host, port=args.port, drop_dir=args.drop_dir)
+    logger.info(f"[LLM-SIM] Config: {json.dumps(asdict(config), ensure_ascii=False)}")
+    with simulator:
+        try:
+            while True:
+                time.sleep(60)
+                logger.info(f"[LLM-SIM] Stats: {simulator.get_stats()}")
+        except KeyboardInterrupt:
+            pass
+    logger.info(f"[LLM-SIM] Final stats: {simulator.get_stats()}")
+
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def llm_simulator(request, tmp_path):
+        """
+        Running simulator without latency; parametrize indirectly with a
+        SimulatorConfig to change its behaviour. Prompts dropped in
+        `llm_simulator.drop_dir` are answered.
+        """
+        config = getattr(request, 'param', None) or SimulatorConfig(
+            first_token_latency="fixed:0",
+            tokens_per_second=0,
+            embed_latency="fixed:0",
+            embed_latency_per_input="fixed:0",
+            file_latency="fixed:0",
+            file_poll_interval=0.05
+        )
+        with LLMSimulator(config, drop_dir=str(tmp_path / "llm_drop")) as simulator:
+            yield simulator
+
+
+if __name__ == "__main__":
+    main()
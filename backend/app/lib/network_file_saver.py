@@ -269,12 +269,16 @@ class NetworkFileSaver:
         poll_interval: int = 10
     ) -> Tuple[bool, str, str]:
         """
-        Polling pentru fișierul de răspuns după salvarea promptului în rețea.
+        Așteaptă fișierul de răspuns după salvarea promptului în rețea.
+
+        Așteptarea este delegată către ResponseWatcher (inotify sau backoff adaptiv,
+        comun pentru toate cererile în curs), deci răspunsul este preluat imediat
+        ce fișierul este complet, nu la următorul interval fix.
 
         Args:
             saved_path: Calea completă unde a fost salvat promptul
-            timeout_seconds: Timeout-ul maxim pentru polling (default: 1200s = 20 min)
-            poll_interval: Interval între verificări în secunde (default: 10s)
+            timeout_seconds: Timeout-ul maxim de așteptare (default: 1200s = 20 min)
+            poll_interval: Păstrat pentru compatibilitate; nu mai este folosit
 
         Returns:
             Tuple[bool, str, str]: (success, content_or_error, response_path)
@@ -288,12 +292,13 @@ class NetworkFileSaver:
             ... )
         """
         import asyncio
+        import time
+        from .response_watcher import get_response_watcher
 
         logger.info("=" * 70)
-        logger.info("[NETWORK POLLING] Începem polling pentru răspuns...")
+        logger.info("[NETWORK POLLING] Așteptăm răspunsul...")
         logger.info(f"[NETWORK POLLING] Prompt salvat la: {saved_path}")
         logger.info(f"[NETWORK POLLING] Timeout: {timeout_seconds}s")
-        logger.info(f"[NETWORK POLLING] Interval polling: {poll_interval}s")
 
         try:
             # Extragem directorul și numele fișierului
@@ -313,51 +318,53 @@ class NetworkFileSaver:
 
             logger.info(f"[NETWORK POLLING] Căutăm fișier: {response_filename}")
             logger.info(f"[NETWORK POLLING] Cale completă: {response_path}")
-
-            # Calculăm numărul maxim de iterații
-            max_iterations = timeout_seconds // poll_interval
-            iteration = 0
-
-            logger.info(f"[NETWORK POLLING] Iterații maxime: {max_iterations}")
             logger.info("=" * 70)
 
-            # Începem polling
-            while iteration < max_iterations:
-                iteration += 1
-
-                # Verificăm dacă fișierul există
-                if os.path.exists(response_path):
-                    logger.info("=" * 70)
-                    logger.info(f"[NETWORK POLLING] ✅ RĂSPUNS GĂSIT la iterația {iteration}!")
-                    logger.info(f"[NETWORK POLLING] Cale: {response_path}")
+            watcher = get_response_watcher()
+            future = watcher.watch(response_path)
+            start_time = time.monotonic()
+            found = False
 
+            try:
+                while True:
+                    remaining = timeout_seconds - (time.monotonic() - start_time)
+                    if remaining <= 0:
+                        break
                     try:
-                        # Citim conținutul
-                        with open(response_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-
-                        logger.info(f"[NETWORK POLLING] ✓ Conținut citit: {len(content)} caractere")
+                        # Logging periodic (la fiecare minut) pentru a arăta că așteptarea este activă
+                        await asyncio.wait_for(asyncio.shield(future), min(60, remaining))
+                        found = True
+                        break
+                    except asyncio.TimeoutError:
+                        elapsed_time = int(time.monotonic() - start_time)
+                        logger.info(f"[NETWORK POLLING] Așteptăm răspuns... ({elapsed_time}s / {timeout_seconds}s)")
+            finally:
+                watcher.cancel(response_path, future)
+
+            if found:
+                logger.info("=" * 70)
+                logger.info(f"[NETWORK POLLING] ✅ RĂSPUNS GĂSIT după {time.monotonic() - start_time:.2f}s!")
+                logger.info(f"[NETWORK POLLING] Cale: {response_path}")
 
-                        # Preview conținut
-                        preview_len = 500
-                        content_preview = content[:preview_len] + "..." if len(content) > preview_len else content
-                        logger.info(f"[NETWORK POLLING] Preview răspuns:\n{content_preview}")
-                        logger.info("=" * 70)
+                try:
+                    # Citim conținutul
+                    with open(response_path, 'r', encoding='utf-8') as f:
+                        content = f.read()
 
-                        return True, content, response_path
+                    logger.info(f"[NETWORK POLLING] ✓ Conținut citit: {len(content)} caractere")
 
-                    except Exception as read_error:
-                        error_msg = f"Eroare la citirea răspunsului: {str(read_error)}"
-                        logger.error(f"[NETWORK POLLING] ❌ {error_msg}")
-                        return False, error_msg, response_path
+                    # Preview conținut
+                    preview_len = 500
+                    content_preview = content[:preview_len] + "..." if len(content) > preview_len else content
+                    logger.info(f"[NETWORK POLLING] Preview răspuns:\n{content_preview}")
+                    logger.info("=" * 70)
 
-                # Logging periodic pentru a arăta că polling-ul este activ
-                if iteration % 6 == 0:  # La fiecare minut (6 iterații x 10s)
-                    elapsed_time = iteration * poll_interval
-                    logger.info(f"[NETWORK POLLING] Așteptăm răspuns... ({elapsed_time}s / {timeout_seconds}s)")
+                    return True, content, response_path
 
-                # Așteptăm înainte de următoarea verificare
-                await asyncio.sleep(poll_interval)
+                except Exception as read_error:
+                    error_msg = f"Eroare la citirea răspunsului: {str(read_error)}"
+                    logger.error(f"[NETWORK POLLING] ❌ {error_msg}")
+                    return False, error_msg, response_path
 
             # Timeout - nu am găsit răspunsul
             logger.error("=" * 70)
@@ -1,14 +1,46 @@
 """
 Modul pentru execuția securizată a codului Python generat de LLM.
+
+Codul nu rulează în procesul API: un pool de procese worker, pornit la prima
+utilizare și apoi menținut cald (cu pandas/numpy/sqlmodel și app.db deja
+importate), îl execută izolat, fiecare cu:
+- limită de memorie (RLIMIT_AS) și de timp CPU per fragment (RLIMIT_CPU)
+- oprire forțată (SIGKILL) la depășirea timpului real, urmată de înlocuirea workerului
+- sesiune DB proprie, read-only, cu statement_timeout
+Codul și rezultatele circulă prin pipe-uri, deci un fragment lent sau care
+consumă multă memorie nu blochează event loop-ul și nu afectează alte cereri.
 """
+import asyncio
 import logging
+import math
+import multiprocessing
+import queue
 import re
 import ast
-from typing import Dict, Any, List
-from sqlmodel import Session, text
+import signal
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: fără limite de resurse, rămâne timeout-ul real
+    resource = None
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_WORKERS = 2
+DEFAULT_TIMEOUT_SECONDS = 30
+DEFAULT_MEMORY_MB = 2048
+
+# Workerii sunt reporniți periodic, ca scurgerile de memorie să nu se acumuleze
+MAX_TASKS_PER_WORKER = 200
+
+# Module importate o singură dată (în forkserver), moștenite de toți workerii.
+# app.db (engine + modele) este inclus, altfel primul fragment al fiecărui worker nou
+# ar plăti importul lui (~240 ms); engine-ul nu deschide conexiuni la import.
+PRELOAD_MODULES = ['numpy', 'pandas', 'sqlmodel', 'sqlalchemy', __package__.rsplit('.', 1)[0] + '.db']
+
 class SecurePythonExecutor:
     """
     Execută cod Python generat de LLM într-un mediu controlat.
@@ -62,41 +94,307 @@ class SecurePythonExecutor:
 
     def execute_code_with_db_access(self, wrapper_code: str) -> Dict[str, Any]:
         """
-        Execută codul într-un mediu izolat, injectând sesiunea DB.
+        Execută codul într-un proces worker izolat, cu sesiunea DB injectată ca `session`.
 
         Args:
             wrapper_code: Codul complet care include funcția filter_data și apelul ei
 
         Returns:
-            Dict cu rezultatele sau eroare
+            Dict cu rezultatele ('filtered_results') sau eroare ('error')
         """
+        # Nota: wrapper_code vine din analizor și conține codul generat de LLM
+        # care a fost deja validat de validate_code.
+        return get_executor_pool().execute(wrapper_code)
+
+    async def execute_code_async(self, wrapper_code: str) -> Dict[str, Any]:
+        """Varianta pentru event loop: așteptarea rezultatului are loc într-un thread."""
+        return await asyncio.to_thread(self.execute_code_with_db_access, wrapper_code)
+
+
+class _CpuTimeExceeded(Exception):
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise _CpuTimeExceeded()
+
+
+def _to_plain(value: Any) -> Any:
+    """Rânduri SQLAlchemy și alte rezultate -> structuri simple, transmisibile prin pipe."""
+    if hasattr(value, '_mapping'):
+        return {k: _to_plain(v) for k, v in value._mapping.items()}
+    if isinstance(value, dict):
+        return {k: _to_plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_to_plain(v) for v in value]
+    if hasattr(value, 'to_dict') and callable(value.to_dict):
+        # pandas DataFrame / Series
+        try:
+            return _to_plain(value.to_dict(orient='records'))
+        except TypeError:
+            return _to_plain(value.to_dict())
+    if hasattr(value, 'item') and callable(value.item):
+        # scalari numpy
+        try:
+            return value.item()
+        except (TypeError, ValueError):
+            pass
+    return value
+
+
+def _worker_main(conn, timeout_seconds: int, cpu_seconds: int, memory_mb: int):
+    """Bucla unui worker: primește cod prin pipe, trimite înapoi rezultatul."""
+    from sqlmodel import Session, text
+
+    if resource is not None and memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    if resource is not None and hasattr(signal, 'SIGXCPU'):
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    # Întreruperile (Ctrl+C) sunt tratate de procesul API, care oprește pool-ul
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    engine = None
+
+    while True:
+        try:
+            code = conn.recv()
+        except (EOFError, OSError):
+            break
+        if code is None:
+            break
+
+        if engine is None:
+            from ..db import engine
+
+        reply: Dict[str, Any]
         try:
-            # Validare sumară a wrapper-ului (care conține codul generat)
-            # Nota: wrapper_code vine din TwoRoundLLMAnalyzer și este de încredere,
-            # dar conține codul generat de LLM care a fost deja validat de validate_code.
-
-            # Pregătim contextul global limitat
-            local_scope = {}
-            global_scope = {
-                'text': text,
-                'Session': Session,
-                'List': List,
-                'Dict': Dict,
-                'Any': Any,
-                # Putem adăuga alte utilitare sigure dacă e nevoie
-            }
-
-            # Execuția efectivă
-            # Atenție: exec() este puternic. Ne bazăm pe validarea anterioară.
-            exec(wrapper_code, global_scope, local_scope)
-
-            # Extragem rezultatele din local_scope
-            # Wrapper-ul ar trebui să seteze o variabilă 'filtered_results'
-            if 'filtered_results' in local_scope:
-                return {'filtered_results': local_scope['filtered_results']}
-            else:
-                return {'error': 'Codul nu a returnat variabila filtered_results'}
+            _set_cpu_budget(cpu_seconds)
+            with Session(engine) as session:
+                if engine.dialect.name == "postgresql":
+                    session.execute(text("SET TRANSACTION READ ONLY"))
+                    session.execute(text(f"SET LOCAL statement_timeout = {int(timeout_seconds * 1000)}"))
+
+                local_scope: Dict[str, Any] = {}
+                global_scope: Dict[str, Any] = {
+                    'text': text,
+                    'Session': Session,
+                    'session': session,
+                    'List': List,
+                    'Dict': Dict,
+                    'Any': Any,
+                }
+                for alias, module in (('np', 'numpy'), ('pd', 'pandas')):
+                    try:
+                        global_scope[alias] = __import__(module)
+                    except ImportError:
+                        pass
 
+                # Atenție: exec() este puternic. Ne bazăm pe validarea anterioară și pe izolarea procesului.
+                exec(code, global_scope, local_scope)
+
+                # Wrapper-ul ar trebui să seteze o variabilă 'filtered_results'
+                if 'filtered_results' in local_scope:
+                    reply = {'filtered_results': _to_plain(local_scope['filtered_results'])}
+                else:
+                    reply = {'error': 'Codul nu a returnat variabila filtered_results'}
+        except _CpuTimeExceeded:
+            reply = {'error': f"Limita de timp CPU depășită ({cpu_seconds}s)", 'recycle': True}
+        except MemoryError:
+            reply = {'error': f"Limita de memorie depășită ({memory_mb} MB)", 'recycle': True}
         except Exception as e:
-            logger.error(f"Eroare execuție cod Python: {e}", exc_info=True)
-            return {'error': str(e)}
+            reply = {'error': str(e)}
+        finally:
+            _set_cpu_budget(None)
+
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # Rezultat care nu poate fi serializat: pipe-ul rămâne curat (pickle are loc înainte de scriere)
+            conn.send({'error': f"Rezultatul nu poate fi transmis: {e}"})
+
+
+def _set_cpu_budget(cpu_seconds: Optional[int]):
+    """Limita CPU este cumulativă per proces: o mutăm la consumul curent + bugetul fragmentului."""
+    if resource is None or not hasattr(signal, 'SIGXCPU'):
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if cpu_seconds is None:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_seconds)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.tasks = 0
+
+
+class PythonExecutorPool:
+    """
+    Pool de procese worker pre-pornite pentru execuția codului generat.
+
+    Args:
+        size: Număr de workeri (fragmente executate în paralel)
+        timeout_seconds: Timp real maxim per fragment; la depășire workerul este oprit
+        cpu_seconds: Timp CPU maxim per fragment (RLIMIT_CPU)
+        memory_mb: Memorie virtuală maximă per worker (RLIMIT_AS)
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_WORKERS,
+        timeout_seconds: int = DEFAULT_TIMEOUT_SECONDS,
+        cpu_seconds: Optional[int] = None,
+        memory_mb: int = DEFAULT_MEMORY_MB,
+        max_tasks_per_worker: int = MAX_TASKS_PER_WORKER
+    ):
+        self.size = max(1, size)
+        self.timeout_seconds = timeout_seconds
+        self.cpu_seconds = cpu_seconds or timeout_seconds
+        self.memory_mb = memory_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self._context = self._make_context()
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self.stats = {'executed': 0, 'errors': 0, 'timeouts': 0, 'limit_kills': 0, 'crashes': 0, 'restarts': 0}
+
+    def start(self):
+        """Pornește workerii (idempotent). Apelat de execute la prima utilizare, nu la pornirea API-ului."""
+        with self._lock:
+            if self._started:
+                return
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+            self._started = True
+        logger.info(
+            f"[PY-EXEC] Pool started: {self.size} workers ({self._context.get_start_method()}), "
+            f"timeout {self.timeout_seconds}s, CPU {self.cpu_seconds}s, memory {self.memory_mb} MB"
+        )
+
+    def execute(self, code: str) -> Dict[str, Any]:
+        """Execută codul într-un worker liber. Blochează thread-ul apelant, nu procesul API."""
+        self.start()
+        started = time.monotonic()
+        try:
+            worker = self._idle.get(timeout=self.timeout_seconds)
+        except queue.Empty:
+            self.stats['errors'] += 1
+            return {'error': 'Toate procesele de execuție sunt ocupate. Reîncercați mai târziu.'}
+
+        try:
+            if not worker.process.is_alive():
+                worker = self._replace(worker)
+            worker.conn.send(code)
+            remaining = self.timeout_seconds - (time.monotonic() - started)
+            if not worker.conn.poll(max(remaining, 1)):
+                self.stats['timeouts'] += 1
+                logger.warning(f"[PY-EXEC] Snippet exceeded {self.timeout_seconds}s, killing worker {worker.process.pid}")
+                worker = self._replace(worker)
+                return {'error': f"Timpul maxim de execuție a fost depășit ({self.timeout_seconds}s)"}
+
+            reply = worker.conn.recv()
+            worker.tasks += 1
+            if reply.pop('recycle', False):
+                self.stats['limit_kills'] += 1
+                worker = self._replace(worker)
+            elif worker.tasks >= self.max_tasks_per_worker:
+                worker = self._replace(worker)
+
+            self.stats['executed'] += 1
+            if 'error' in reply:
+                self.stats['errors'] += 1
+                logger.error(f"Eroare execuție cod Python: {reply['error']}")
+            return reply
+
+        except (EOFError, OSError) as e:
+            # Workerul a murit în timpul execuției (ex. limita de memorie atinsă în cod nativ)
+            self.stats['crashes'] += 1
+            logger.error(f"[PY-EXEC] Worker {worker.process.pid} died: {e} (exit code {worker.process.exitcode})")
+            worker = self._replace(worker)
+            return {'error': 'Procesul de execuție s-a oprit neașteptat (posibil limita de memorie depășită)'}
+        finally:
+            self._idle.put(worker)
+
+    def shutdown(self):
+        with self._lock:
+            while True:
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                self._stop(worker)
+            self._started = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'started': self._started, 'workers': self.size, 'idle': self._idle.qsize()}
+
+    # --- Helpers ---
+
+    @staticmethod
+    def _make_context():
+        methods = multiprocessing.get_all_start_methods()
+        if 'forkserver' in methods:
+            # Nu copiem procesul API (thread-uri, conexiuni DB); serverul de fork are deja importurile grele
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(PRELOAD_MODULES + [__name__])
+            return context
+        return multiprocessing.get_context('spawn')
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.timeout_seconds, self.cpu_seconds, self.memory_mb),
+            name="python-executor",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _replace(self, worker: _Worker) -> _Worker:
+        self._stop(worker, graceful=False)
+        self.stats['restarts'] += 1
+        return self._spawn()
+
+    @staticmethod
+    def _stop(worker: _Worker, graceful: bool = True):
+        if graceful and worker.process.is_alive():
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=2)
+        if worker.process.is_alive():
+            worker.process.kill()
+            worker.process.join(timeout=5)
+        worker.conn.close()
+
+
+_executor_pool: Optional[PythonExecutorPool] = None
+_executor_pool_lock = threading.Lock()
+
+
+def get_executor_pool() -> PythonExecutorPool:
+    """Returns the process-wide pool, created on first use with the configured limits."""
+    global _executor_pool
+    with _executor_pool_lock:
+        if _executor_pool is None:
+            from ..settings_manager import settings_manager
+            _executor_pool = PythonExecutorPool(
+                size=int(settings_manager.get_value('setari_llm', 'python_executor_workers', DEFAULT_WORKERS)),
+                timeout_seconds=int(settings_manager.get_value('setari_llm', 'python_executor_timeout_seconds', DEFAULT_TIMEOUT_SECONDS)),
+                memory_mb=int(settings_manager.get_value('setari_llm', 'python_executor_memory_mb', DEFAULT_MEMORY_MB))
+            )
+    return _executor_pool
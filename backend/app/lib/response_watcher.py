@@ -0,0 +1,330 @@
+"""
+Response Watcher for the network LLM file bridge.
+
+One service per event loop waits for all outstanding `raspuns_+_prompt_*.txt`
+files at once and completes a future for each when its file is ready.
+
+Features:
+- inotify (via libc) on local filesystems: completion within milliseconds of
+  the writer closing the file
+- Network mounts (CIFS/SMB/NFS, where inotify misses remote writes) and other
+  platforms use adaptive exponential backoff with jitter
+- One directory scan per tick serves every waiter in that directory
+- A file seen by a scan is only delivered once its size is stable, so a
+  response still being written is not read half-way
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import random
+import struct
+import sys
+import time
+import weakref
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Backoff for directories without inotify
+MIN_SCAN_INTERVAL = 0.05
+MAX_SCAN_INTERVAL = 1.0
+JITTER_RATIO = 0.2
+
+# Safety rescan for inotify-watched directories (missed or coalesced events)
+INOTIFY_SAFETY_INTERVAL = 30.0
+
+# Filesystems on which inotify does not see writes made by other machines
+NETWORK_FS_TYPES = {
+    'cifs', 'smb3', 'smbfs', 'nfs', 'nfs4', 'afs', '9p', 'fuse.sshfs', 'fuse.rclone', 'davfs', 'ceph', 'glusterfs'
+}
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_IGNORED = 0x00008000
+_IN_Q_OVERFLOW = 0x00004000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _Inotify:
+    """Minimal non-blocking inotify wrapper over libc (Linux only)."""
+
+    def __init__(self, libc, fd: int):
+        self._libc = libc
+        self.fd = fd
+
+    @classmethod
+    def create(cls) -> Optional['_Inotify']:
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify unavailable, using polling: {e}")
+            return None
+        if fd < 0:
+            logger.info(f"inotify_init1 failed (errno {ctypes.get_errno()}), using polling")
+            return None
+        return cls(libc, fd)
+
+    def add_watch(self, directory: str) -> Optional[int]:
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), _IN_CLOSE_WRITE | _IN_MOVED_TO
+        )
+        return wd if wd >= 0 else None
+
+    def rm_watch(self, wd: int):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self) -> List[tuple]:
+        """Returns (wd, mask, name) for all queued events."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _WatchedDir:
+    """Waiters of one directory and its scan schedule."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.waiters: Dict[str, List[asyncio.Future]] = {}
+        self.seen_sizes: Dict[str, int] = {}
+        self.wd: Optional[int] = None
+        self.interval = MIN_SCAN_INTERVAL
+        self.next_scan = 0.0
+
+
+def _is_network_fs(directory: str) -> bool:
+    """Looks up the filesystem type of the mount holding `directory`."""
+    try:
+        target = os.path.realpath(directory)
+        best, fs_type = '', ''
+        with open('/proc/mounts', 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point = parts[1].replace('\\040', ' ')
+                if (target == mount_point or target.startswith(mount_point.rstrip('/') + '/')) and len(mount_point) > len(best):
+                    best, fs_type = mount_point, parts[2]
+        return fs_type in NETWORK_FS_TYPES
+    except OSError:
+        return True
+
+
+class ResponseWatcher:
+    """
+    Multiplexes waits for response files.
+
+    Use `get_response_watcher()` to get the instance bound to the running loop.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.dirs: Dict[str, _WatchedDir] = {}
+        self._wd_dirs: Dict[int, _WatchedDir] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._inotify = _Inotify.create()
+        if self._inotify is not None:
+            loop.add_reader(self._inotify.fd, self._on_inotify_readable)
+
+    def watch(self, path: str) -> asyncio.Future:
+        """
+        Registers a waiter for `path`.
+
+        Returns:
+            Future resolved with the path once the file is complete
+        """
+        directory, name = os.path.split(os.path.abspath(path))
+        watched = self.dirs.get(directory)
+        if watched is None:
+            watched = self._add_dir(directory)
+
+        future = self.loop.create_future()
+        watched.waiters.setdefault(name, []).append(future)
+
+        # New waiter: check right away and restart the backoff
+        watched.interval = MIN_SCAN_INTERVAL
+        watched.next_scan = 0.0
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._run())
+        return future
+
+    def cancel(self, path: str, future: asyncio.Future):
+        """Unregisters a waiter (e.g. after a timeout)."""
+        directory, name = os.path.split(os.path.abspath(path))
+        watched = self.dirs.get(directory)
+        if watched is None:
+            return
+        futures = watched.waiters.get(name, [])
+        if future in futures:
+            futures.remove(future)
+        if not futures:
+            watched.waiters.pop(name, None)
+            watched.seen_sizes.pop(name, None)
+        if not future.done():
+            future.cancel()
+        if not watched.waiters:
+            self._remove_dir(watched)
+
+    async def wait_for_file(self, path: str, timeout: float) -> bool:
+        """Waits until `path` is complete. Returns False on timeout."""
+        future = self.watch(path)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.cancel(path, future)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'directories': len(self.dirs),
+            'waiters': sum(len(f) for d in self.dirs.values() for f in d.waiters.values()),
+            'inotify_directories': len(self._wd_dirs)
+        }
+
+    # --- Helpers ---
+
+    def _add_dir(self, directory: str) -> _WatchedDir:
+        watched = _WatchedDir(directory)
+        if self._inotify is not None and not _is_network_fs(directory):
+            watched.wd = self._inotify.add_watch(directory)
+            if watched.wd is not None:
+                self._wd_dirs[watched.wd] = watched
+        logger.info(f"[WATCHER] Watching {directory} ({'inotify' if watched.wd is not None else 'polling'})")
+        self.dirs[directory] = watched
+        return watched
+
+    def _remove_dir(self, watched: _WatchedDir):
+        self.dirs.pop(watched.path, None)
+        if watched.wd is not None:
+            self._wd_dirs.pop(watched.wd, None)
+            try:
+                self._inotify.rm_watch(watched.wd)
+            except OSError:
+                pass
+
+    def _resolve(self, watched: _WatchedDir, name: str):
+        for future in watched.waiters.pop(name, []):
+            if not future.done():
+                future.set_result(os.path.join(watched.path, name))
+        watched.seen_sizes.pop(name, None)
+
+    def _on_inotify_readable(self):
+        for wd, mask, name in self._inotify.read_events():
+            if mask & _IN_Q_OVERFLOW:
+                # Events were lost: rescan everything now
+                for watched in self.dirs.values():
+                    watched.next_scan = 0.0
+                self._wakeup.set()
+                continue
+            watched = self._wd_dirs.get(wd)
+            if watched is None:
+                continue
+            if mask & _IN_IGNORED:
+                # Directory removed or unmounted: fall back to polling it
+                self._wd_dirs.pop(wd, None)
+                watched.wd = None
+                watched.interval = MIN_SCAN_INTERVAL
+                watched.next_scan = 0.0
+                self._wakeup.set()
+            elif name in watched.waiters:
+                # CLOSE_WRITE / MOVED_TO: the writer is done with the file
+                self._resolve(watched, name)
+
+    async def _scan(self, watched: _WatchedDir) -> bool:
+        """Scans a directory once for all its waiters. Returns True if anything changed."""
+        names = list(watched.waiters)
+
+        def stat_waited():
+            sizes = {}
+            with os.scandir(watched.path) as entries:
+                for entry in entries:
+                    if entry.name in watched.waiters:
+                        sizes[entry.name] = entry.stat().st_size
+            return sizes
+
+        try:
+            sizes = await asyncio.to_thread(stat_waited)
+        except OSError as e:
+            logger.warning(f"[WATCHER] Cannot scan {watched.path}: {e}")
+            return False
+
+        changed = False
+        for name in names:
+            size = sizes.get(name)
+            if size is None:
+                continue
+            changed = True
+            # Deliver once two consecutive scans agree on a non-empty size
+            if size > 0 and watched.seen_sizes.get(name) == size:
+                self._resolve(watched, name)
+            else:
+                watched.seen_sizes[name] = size
+        return changed
+
+    async def _run(self):
+        """Single loop scanning due directories; exits when nobody is waiting."""
+        while self.dirs:
+            now = time.monotonic()
+            for watched in list(self.dirs.values()):
+                if not watched.waiters:
+                    self._remove_dir(watched)
+                    continue
+                if watched.next_scan > now:
+                    continue
+
+                changed = await self._scan(watched)
+
+                if watched.wd is not None and not watched.seen_sizes:
+                    watched.interval = INOTIFY_SAFETY_INTERVAL
+                elif changed:
+                    watched.interval = MIN_SCAN_INTERVAL
+                else:
+                    watched.interval = min(watched.interval * 2, MAX_SCAN_INTERVAL)
+                jitter = 1 + random.uniform(-JITTER_RATIO, JITTER_RATIO)
+                watched.next_scan = time.monotonic() + watched.interval * jitter
+
+            if not self.dirs:
+                break
+            delay = max(min(w.next_scan for w in self.dirs.values()) - time.monotonic(), 0.0)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+_watchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ResponseWatcher]" = weakref.WeakKeyDictionary()
+
+
+def get_response_watcher() -> ResponseWatcher:
+    """Returns the watcher for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    watcher = _watchers.get(loop)
+    if watcher is None:
+        watcher = ResponseWatcher(loop)
+        _watchers[loop] = watcher
+    return watcher
@@ -6,7 +6,7 @@ import logging
 import asyncio
 import time
 from sqlmodel import Session
-from typing import Dict, Any, Optional, Callable, Awaitable, List
+from typing import Dict, Any, Optional, Callable, Awaitable, List, Tuple
 
 from ..lib.prompt_logger import PromptLogger
 from ..logic.search_logic import build_pro_search_query_sql, build_vector_search_query_sql
@@ -18,6 +18,14 @@ from .analyzer.llm_client import LLMClient
 from .analyzer.plan_manager import PlanManager
 from .analyzer.data_fetcher import DataFetcher
 from .analyzer.strategy_engine import StrategyEngine
+from .analyzer.chunk_packer import case_budget_chars, prompt_max_chars
+from .analyzer.analysis_cache import get_analysis_cache
+from .analyzer.prompt_compactor import (
+    DEFAULT_FIELD_CHARS, dedupe_shared_sentences, field_legend, format_compact_chunk
+)
+from .analyzer.synthesis_reducer import (
+    HierarchicalReducer, merge_partial_stats, split_extracted_data, union_case_ids
+)
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +52,20 @@ class ThreeStageAnalyzer:
         try:
             logger.info(f"--- START PHASE 1: DISCOVERY for: {user_query[:50]}... ---")
 
+            # 0. Same (or trivially reworded) question planned before on nearly the same data
+            cache_lookup = await self._analysis_cache_lookup("plan", user_query)
+            if cache_lookup.get("hit"):
+                cached_plan = cache_lookup["hit"]["value"]
+                # The requester gets a private copy (own plan_id, email, case limit, chunk writes)
+                plan_copy = self._clone_cached_plan(cached_plan)
+                if plan_copy:
+                    return {
+                        **cached_plan, 'plan_id': plan_copy['plan_id'],
+                        'cache_hit': cache_lookup["hit"]["match"], 'cached_query': cache_lookup["hit"]["cached_query"]
+                    }
+                get_analysis_cache().invalidate("plan", cache_lookup["hit"]["cached_query"])
+                cache_lookup = await self._analysis_cache_lookup("plan", user_query, lookup=False)
+
             # 1. Generate Strategy with Retries
             strategy = await self._generate_strategy_loop(user_query)
             if not strategy:
@@ -82,8 +104,23 @@ class ThreeStageAnalyzer:
             if not strategy.get('selected_columns'):
                 strategy['selected_columns'] = list(DEFAULT_SELECTED_COLUMNS)
 
-            plan = self.plan_manager.create_plan_object(user_query, strategy, total_cases, all_ids)
+            # Size every case's projected columns so chunks can be packed to the prompt budget
+            case_sizes = None
+            budget_chars = case_budget_chars(prompt_max_chars(self._get_llm_mode()), user_query)
+            try:
+                size_map = self.data_fetcher.fetch_case_sizes(
+                    all_ids, strategy['selected_columns'], field_chars=self._compaction_field_chars()
+                )
+                case_sizes = [size_map.get(cid, 0) for cid in all_ids]
+            except Exception as e:
+                logger.warning(f"Could not size cases for packing, using fixed chunks: {e}")
+
+            plan = self.plan_manager.create_plan_object(
+                user_query, strategy, total_cases, all_ids,
+                case_sizes=case_sizes, case_budget_chars=budget_chars
+            )
             self.plan_manager.save_plan(plan)
+            logger.info(f"Plan {plan['plan_id']}: {len(all_ids)} cases packed into {plan['total_chunks']} chunks")
 
             # 5. Preview Data
             preview_ids = all_ids[:3]
@@ -92,8 +129,10 @@ class ThreeStageAnalyzer:
             # 6. Verification
             await self._verify_strategy(user_query, strategy, preview_data) # Log only
 
-            est_sec = (plan['total_chunks'] + 1) * 60
-            return {
+            # Chunks run in parallel waves, plus one synthesis call
+            concurrency = self._get_chunk_concurrency()
+            est_sec = (-(-plan['total_chunks'] // concurrency) + 1) * 60
+            response = {
                 'success': True,
                 'plan_id': plan['plan_id'],
                 'total_cases': total_cases,
@@ -105,6 +144,8 @@ class ThreeStageAnalyzer:
                 'strategies_used': plan.get("strategies_used"),
                 'strategy_breakdown': plan.get("strategy_breakdown")
             }
+            self._analysis_cache_store("plan", user_query, response, cache_lookup)
+            return response
 
         except Exception as e:
             logger.error(f"[PHASE 1] Error: {e}", exc_info=True)
@@ -188,18 +229,53 @@ class ThreeStageAnalyzer:
 
             total_chunks = plan['total_chunks']
 
-            # Phase 2: Chunks
+            # Phase 2: Chunks (bounded-parallel; each chunk checkpoints into the plan store)
+            self.plan_manager.set_plan_status(plan_id, "executing")
+            completed_chunks = self.plan_manager.get_completed_chunks(plan_id)
+            pending_chunks = []
             for i in range(total_chunks):
-                if self.plan_manager.load_chunk_result(plan_id, i):
+                if i in completed_chunks:
                      if progress_callback: await progress_callback({"stage": "execution", "chunk_index": i, "status": "skipped"})
                      continue
+                pending_chunks.append(i)
 
-                if progress_callback: await progress_callback({"stage": "execution", "chunk_index": i, "total": total_chunks})
-                await self.execute_chunk(plan, i)
+            # Producer/consumer pipeline: one producer fetches and formats the next chunks in a
+            # worker thread while up to `concurrency` consumers have their chunks with the LLM.
+            concurrency = self._get_chunk_concurrency()
+            workers = max(1, min(concurrency, len(pending_chunks)))
+            prepared: asyncio.Queue = asyncio.Queue(maxsize=workers)
+            logger.info(f"[EXECUTION] {len(pending_chunks)}/{total_chunks} chunks pending, concurrency={concurrency}")
+
+            async def produce():
+                # A single producer keeps DB access on the session sequential
+                try:
+                    for chunk_index in pending_chunks:
+                        try:
+                            prepared_chunk = await asyncio.to_thread(self.prepare_chunk_prompt, plan, chunk_index)
+                        except Exception as e:
+                            logger.error(f"Chunk {chunk_index} failed during data preparation: {e}")
+                            continue
+                        await prepared.put((chunk_index, prepared_chunk))
+                finally:
+                    for _ in range(workers):
+                        await prepared.put(None)
+
+            async def consume():
+                while True:
+                    job = await prepared.get()
+                    if job is None:
+                        return
+                    chunk_index, prepared_chunk = job
+                    if progress_callback: await progress_callback({"stage": "execution", "chunk_index": chunk_index, "total": total_chunks})
+                    await self.execute_chunk(plan, chunk_index, prepared=prepared_chunk, progress_callback=progress_callback)
+
+            await asyncio.gather(produce(), *(consume() for _ in range(workers)))
+            logger.info(f"[EXECUTION] Chunks finished in {time.time() - start_time:.1f}s")
 
             # Phase 3: Synthesis
             if progress_callback: await progress_callback({"stage": "synthesis"})
-            result = await self.synthesize_results(plan_id)
+            result = await self.synthesize_results(plan_id, progress_callback=progress_callback)
+            self.plan_manager.set_plan_status(plan_id, "completed" if result.get('success') else "failed")
 
             # Send success email if notification is enabled and NOT suppressed
             if notification_email and result.get('success') and not suppress_email:
@@ -235,35 +311,90 @@ class ThreeStageAnalyzer:
             return error_result
 
 
-    async def execute_chunk(self, plan: Dict[str, Any], chunk_index: int) -> Dict[str, Any]:
-        try:
-            chunk_ids = plan['chunks'][chunk_index]
+    def prepare_chunk_prompt(self, plan: Dict[str, Any], chunk_index: int) -> Tuple[str, Dict[str, Any]]:
+        """
+        Fetches a chunk's cases, fits them to the prompt budget and formats the prompt.
 
-            # Safe access to selected_columns with fallback
-            selected_cols = plan['strategy'].get('selected_columns')
-            if not selected_cols:
-                selected_cols = list(DEFAULT_SELECTED_COLUMNS)
+        Blocking (DB query + JSON encoding); execute_plan runs it in a worker thread.
 
-            data = self.data_fetcher.fetch_chunk_data(chunk_ids, selected_cols)
-            truncated_data, _ = self.data_fetcher.validate_and_truncate_data(data, plan['user_query'])
+        Returns:
+            (prompt, truncation metadata with the cases left out of or shortened in the prompt)
+        """
+        chunk_ids = plan['chunks'][chunk_index]
+
+        # Safe access to selected_columns with fallback
+        selected_cols = plan['strategy'].get('selected_columns')
+        if not selected_cols:
+            selected_cols = list(DEFAULT_SELECTED_COLUMNS)
 
-            prompt = self.prompt_manager.build_chunk_analysis_prompt(
+        max_chars = prompt_max_chars(self._get_llm_mode())
+        field_chars = self._compaction_field_chars()
+
+        if not field_chars:
+            data = self.data_fetcher.fetch_chunk_data(chunk_ids, selected_cols)
+            truncated_data, coverage = self.data_fetcher.validate_and_truncate_data(data, plan['user_query'], max_chars=max_chars)
+            return self.prompt_manager.build_chunk_analysis_prompt(
                 plan['user_query'], truncated_data, chunk_index, plan['total_chunks']
-            )
+            ), coverage
+
+        # Compacted payload: aliased fields, keyword-focused texts, shared sentences once
+        data = self.data_fetcher.fetch_compact_chunk_data(chunk_ids, selected_cols, plan['user_query'], field_chars)
+        data, shared = dedupe_shared_sentences(data)
+        legend = field_legend([c.replace("'", "") for c in selected_cols])
+        header_chars = len(format_compact_chunk([], shared, legend))
+        truncated_data, coverage = self.data_fetcher.validate_and_truncate_data(
+            data, plan['user_query'], max_chars=max_chars - header_chars
+        )
+
+        return self.prompt_manager.build_chunk_analysis_prompt(
+            plan['user_query'], truncated_data, chunk_index, plan['total_chunks'],
+            data_text=format_compact_chunk(truncated_data, shared, legend)
+        ), coverage
+
+    async def execute_chunk(
+        self,
+        plan: Dict[str, Any],
+        chunk_index: int,
+        prepared: Optional[Tuple[str, Dict[str, Any]]] = None,
+        progress_callback: Optional[Callable] = None
+    ) -> Dict[str, Any]:
+        try:
+            if prepared is None:
+                prepared = await asyncio.to_thread(self.prepare_chunk_prompt, plan, chunk_index)
+            prompt, coverage = prepared
 
             # Check LLM mode setting
             from ..settings_manager import settings_manager
             llm_mode = settings_manager.get_value('setari_llm', 'advanced_llm_mode', 'network')
 
             if llm_mode == 'local':
-                success, content, path = await LLMClient.call_llm_local(prompt, label=f"Chunk {chunk_index}")
+                async def on_llm_progress(llm_progress: Dict[str, Any]):
+                    await progress_callback({
+                        "stage": "execution", "chunk_index": chunk_index,
+                        "total": plan['total_chunks'], **llm_progress
+                    })
+
+                success, content, path = await LLMClient.call_llm_local(
+                    prompt, label=f"Chunk {chunk_index}",
+                    progress_callback=on_llm_progress if progress_callback else None
+                )
             else:
-                success, content, path = await LLMClient.call_llm(prompt, label=f"Chunk {chunk_index}")
+                # Suffix keeps filenames unique when several chunks are sent within the same second
+                success, content, path = await LLMClient.call_llm(
+                    prompt, label=f"Chunk {chunk_index}",
+                    filename_suffix=f"_{plan['plan_id'][:8]}_chunk{chunk_index}"
+                )
             if not success: raise RuntimeError(content)
 
             result = LLMClient.parse_json_response(content)
             LLMClient.delete_response(path)
 
+            # Cases that did not fit the prompt stay visible in the chunk result
+            if coverage.get('uncovered_case_ids') or coverage.get('shortened_case_ids'):
+                result['coverage'] = {
+                    'uncovered_case_ids': coverage['uncovered_case_ids'],
+                    'shortened_case_ids': coverage['shortened_case_ids']
+                }
             self.plan_manager.save_chunk_result(plan['plan_id'], chunk_index, result)
             return {'success': True}
 
@@ -271,9 +402,9 @@ class ThreeStageAnalyzer:
             logger.error(f"Chunk {chunk_index} failed: {e}")
             return {'success': False, 'error': str(e)}
 
-    async def synthesize_results(self, plan_id: str) -> Dict[str, Any]:
+    async def synthesize_results(self, plan_id: str, progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
         try:
-            plan = self.plan_manager.load_plan(plan_id)
+            plan = self.plan_manager.load_plan_meta(plan_id)
             aggregated = []
             missing = []
 
@@ -284,13 +415,50 @@ class ThreeStageAnalyzer:
 
             if not aggregated: return {'success': False, 'error': 'No chunk results available.'}
 
-            prompt = self.prompt_manager.build_synthesis_prompt(plan['user_query'], aggregated, missing)
+            # Statistics are merged in Python; only the findings go through the LLM reduction tree
+            merged_stats = merge_partial_stats(
+                [chunk.get('partial_stats') for chunk in aggregated],
+                weights=[chunk.get('analyzed_count') for chunk in aggregated]
+            )
+            partial_results = [
+                {
+                    'chunk_index': chunk.get('chunk_index', i),
+                    'extracted_data': chunk.get('extracted_data'),
+                    'summary': chunk.get('summary'),
+                    'referenced_case_ids': chunk.get('referenced_case_ids')
+                }
+                for i, chunk in enumerate(aggregated)
+            ]
+
+            async def merge_group(group: List[Dict[str, Any]], level: int, index: int) -> Dict[str, Any]:
+                return await self._merge_partial_results(
+                    plan['user_query'], group, level, f"_{plan_id[:8]}_reduce{level}_{index}"
+                )
+
+            reducer = HierarchicalReducer(
+                merge_group,
+                budget_chars=self._synthesis_budget_chars("synthesis_prompt", plan['user_query']),
+                concurrency=self._get_chunk_concurrency(),
+                split_item=split_extracted_data,
+                progress_callback=progress_callback
+            )
+            partial_results = await reducer.reduce(partial_results)
+
+            prompt = self.prompt_manager.build_synthesis_prompt(
+                plan['user_query'], partial_results, missing, merged_stats=merged_stats
+            )
             # Check LLM mode setting
             from ..settings_manager import settings_manager
             llm_mode = settings_manager.get_value('setari_llm', 'advanced_llm_mode', 'network')
 
             if llm_mode == 'local':
-                success, content, path = await LLMClient.call_llm_local(prompt, label="Synthesis")
+                async def on_llm_progress(llm_progress: Dict[str, Any]):
+                    await progress_callback({"stage": "synthesis", **llm_progress})
+
+                success, content, path = await LLMClient.call_llm_local(
+                    prompt, label="Synthesis",
+                    progress_callback=on_llm_progress if progress_callback else None
+                )
             else:
                 success, content, path = await LLMClient.call_llm(prompt, label="Synthesis")
             if not success: raise RuntimeError(content)
@@ -316,10 +484,16 @@ class ThreeStageAnalyzer:
 
             # Inject top-level stats for frontend display
             result['cases_analyzed'] = plan.get('total_cases', 0)
+            result['aggregated_stats'] = merged_stats
 
+            uncovered = [
+                cid for chunk in aggregated
+                for cid in (chunk.get('coverage') or {}).get('uncovered_case_ids', [])
+            ]
             result['process_metadata'] = {
                 'plan_id': plan_id, 'total_cases': plan['total_cases'],
-                'chunks_processed': len(aggregated)
+                'chunks_processed': len(aggregated),
+                'uncovered_case_ids': uncovered
             }
             result['success'] = True
             return result
@@ -327,8 +501,255 @@ class ThreeStageAnalyzer:
             logger.error(f"Synthesis failed: {e}")
             return {'success': False, 'error': str(e)}
 
+    async def find_cached_final_report(self, original_query: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the stored final report of an earlier full analysis of the same question
+        (shaped like synthesize_final_report's result), or None.
+        """
+        cache_lookup = await self._analysis_cache_lookup("final_report", original_query)
+        hit = cache_lookup.get("hit")
+        if not hit:
+            return None
+        report_id = hit["value"].get("report_id")
+        try:
+            report = self.plan_manager.load_final_report(report_id)
+        except (FileNotFoundError, ValueError) as e:
+            logger.warning(f"[ANALYSIS-CACHE] Cached report {report_id} unavailable: {e}")
+            get_analysis_cache().invalidate("final_report", hit["cached_query"])
+            return None
+        return {
+            'success': True,
+            'report': report,
+            'report_id': report_id,
+            'file_path': f"analyzer_plans/final_report_{report_id}.json",
+            'cache_hit': hit["match"],
+            'cached_query': hit["cached_query"]
+        }
+
+    async def remember_final_report(self, original_query: str, report_id: str):
+        """Records the report of a completed full analysis for find_cached_final_report."""
+        cache_lookup = await self._analysis_cache_lookup("final_report", original_query, lookup=False)
+        self._analysis_cache_store("final_report", original_query, {'report_id': report_id}, cache_lookup)
+
     # --- Helpers ---
 
+    async def _analysis_cache_lookup(self, kind: str, query: str, lookup: bool = True) -> Dict[str, Any]:
+        """
+        Computes the cache context (query embedding, blocuri watermark) and looks the query up.
+
+        Returns {} when the cache is disabled; otherwise the context plus 'hit' (or None).
+        """
+        from ..settings_manager import settings_manager
+        if not settings_manager.get_value('setari_llm', 'analysis_cache_enabled', True):
+            return {}
+
+        # The watermark is a max(id) lookup; it is needed to validate even exact hits
+        watermark = self.data_fetcher.blocuri_watermark() if kind != "decomposition" else None
+        context = {'enabled': True, 'embedding': None, 'watermark': watermark, 'hit': None}
+        if lookup:
+            # Exact match first: the query is only embedded when it misses
+            context['hit'] = get_analysis_cache().get(kind, query, watermark=watermark, record_miss=False)
+            if context['hit']:
+                return context
+
+        from ..logic.embedding import embed_text
+        try:
+            context['embedding'] = await embed_text(query)
+        except Exception as e:
+            logger.warning(f"[ANALYSIS-CACHE] Query embedding unavailable, exact matching only: {e}")
+
+        if lookup and context['embedding'] is not None:
+            context['hit'] = get_analysis_cache().get(
+                kind, query, embedding=context['embedding'], watermark=watermark
+            )
+        return context
+
+    @staticmethod
+    def _analysis_cache_store(kind: str, query: str, value: Dict[str, Any], cache_lookup: Dict[str, Any]):
+        if not cache_lookup.get('enabled'):
+            return
+        get_analysis_cache().put(
+            kind, query, value, embedding=cache_lookup.get('embedding'), watermark=cache_lookup.get('watermark')
+        )
+
+    def _clone_cached_plan(self, cached_plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Copy of the plan behind a cache entry, or None if it is gone or was re-limited since."""
+        plan_id = cached_plan.get("plan_id")
+        if not plan_id:
+            return None
+        try:
+            meta = self.plan_manager.load_plan_meta(plan_id)
+            if meta.get('total_cases') != cached_plan.get('total_cases'):
+                return None
+            return self.plan_manager.clone_plan(plan_id)
+        except Exception as e:
+            logger.warning(f"[ANALYSIS-CACHE] Cached plan {plan_id} unavailable: {e}")
+            return None
+
+    async def _merge_partial_results(
+        self,
+        user_query: str,
+        group: List[Dict[str, Any]],
+        level: int,
+        filename_suffix: str
+    ) -> Dict[str, Any]:
+        """
+        One node of the synthesis tree: condenses a group of partial results with the LLM.
+
+        Case IDs are unioned in Python. If the LLM call or its JSON fails, the group is
+        concatenated instead, so no finding is dropped.
+        """
+        first, last = self._chunk_span(group[0])[0], self._chunk_span(group[-1])[1]
+        merged = {
+            'chunk_index': f"{first}-{last}",
+            'referenced_case_ids': union_case_ids(group)
+        }
+
+        prompt_items = [
+            {'chunk_index': item.get('chunk_index'), 'extracted_data': item.get('extracted_data'), 'summary': item.get('summary')}
+            for item in group
+        ]
+        prompt = self.prompt_manager.build_intermediate_synthesis_prompt(user_query, prompt_items, level)
+
+        content = None
+        try:
+            success, content, path = await self._call_llm(
+                prompt, label=f"Synthesis L{level} {first}-{last}", filename_suffix=filename_suffix
+            )
+            if not success:
+                raise RuntimeError(content)
+            result = LLMClient.parse_json_response(content)
+            LLMClient.delete_response(path)
+            if not isinstance(result.get('extracted_data'), list):
+                raise ValueError("extracted_data lipsă din răspuns")
+            merged['extracted_data'] = result['extracted_data']
+            merged['summary'] = result.get('summary', '')
+        except Exception as e:
+            logger.warning(f"[SYNTHESIS] Merge of chunks {first}-{last} failed, concatenating instead: {e}")
+            if content:
+                LLMClient.discard_cached(content)
+            merged['extracted_data'] = [
+                entry for item in group if isinstance(item.get('extracted_data'), list) for entry in item['extracted_data']
+            ]
+            merged['summary'] = " ".join(str(item['summary']) for item in group if item.get('summary'))
+        return merged
+
+    async def _merge_task_results(
+        self,
+        original_query: str,
+        group: List[Dict[str, Any]],
+        level: int,
+        index: int
+    ) -> Dict[str, Any]:
+        """
+        One node of the final-report reduction tree: condenses several task results.
+
+        Charts, tables and case IDs are carried over in Python, only the findings are
+        condensed by the LLM (with concatenation as fallback).
+        """
+        task_results = [item.get('task_result') or {} for item in group]
+        charts = [c for r in task_results if isinstance(r.get('charts'), list) for c in r['charts']]
+        tables = [t for r in task_results if isinstance(r.get('tables'), list) for t in r['tables']]
+
+        prompt_items = [
+            {
+                'chunk_index': item.get('task_title'),
+                'extracted_data': {k: v for k, v in result.items() if k not in ('charts', 'tables')},
+                'summary': result.get('summary') or result.get('interpretation')
+            }
+            for item, result in zip(group, task_results)
+        ]
+        prompt = self.prompt_manager.build_intermediate_synthesis_prompt(original_query, prompt_items, level)
+
+        condensed: Dict[str, Any]
+        content = None
+        try:
+            success, content, path = await self._call_llm(
+                prompt, label=f"Final Report L{level} group {index}", filename_suffix=f"_final_reduce{level}_{index}"
+            )
+            if not success:
+                raise RuntimeError(content)
+            condensed = LLMClient.parse_json_response(content)
+            LLMClient.delete_response(path)
+            if not isinstance(condensed.get('extracted_data'), list):
+                raise ValueError("extracted_data lipsă din răspuns")
+        except Exception as e:
+            logger.warning(f"[SYNTHESIS] Merge of task group {index} (level {level}) failed, concatenating instead: {e}")
+            if content:
+                LLMClient.discard_cached(content)
+            condensed = {
+                'extracted_data': [item['extracted_data'] for item in prompt_items],
+                'summary': " ".join(str(item['summary']) for item in prompt_items if item.get('summary'))
+            }
+
+        categories = []
+        for item in group:
+            if item.get('task_category') not in categories:
+                categories.append(item.get('task_category'))
+
+        return {
+            'task_title': " | ".join(str(item.get('task_title')) for item in group),
+            'task_category': ", ".join(str(c) for c in categories),
+            'task_result': {
+                'summary': condensed.get('summary', ''),
+                'extracted_data': condensed['extracted_data'],
+                'charts': charts,
+                'tables': tables
+            },
+            'referenced_case_ids': union_case_ids(group)
+        }
+
+    @staticmethod
+    def _chunk_span(item: Dict[str, Any]) -> tuple:
+        """(first, last) chunk index covered by a chunk result or a merged one ("3-7")."""
+        label = str(item.get('chunk_index', '0'))
+        first, _, last = label.partition('-')
+        return first, last or first
+
+    def _synthesis_budget_chars(self, template_name: str, user_query: str) -> int:
+        """Characters available for partial results in a synthesis prompt."""
+        available = (
+            prompt_max_chars(self._get_llm_mode())
+            - self.prompt_manager.template_chars(template_name)
+            - len(user_query)
+        )
+        return max(available, 4000)
+
+    async def _call_llm(self, prompt: str, label: str, filename_suffix: str = ""):
+        """Calls the LLM configured by advanced_llm_mode (local Ollama or network file bridge)."""
+        if self._get_llm_mode() == 'local':
+            return await LLMClient.call_llm_local(prompt, label=label)
+        return await LLMClient.call_llm(prompt, label=label, filename_suffix=filename_suffix)
+
+    def _get_llm_mode(self) -> str:
+        from ..settings_manager import settings_manager
+        return settings_manager.get_value('setari_llm', 'advanced_llm_mode', 'network')
+
+    def _compaction_field_chars(self) -> Optional[int]:
+        """Per-field budget of compacted case texts, or None when prompt compaction is disabled."""
+        from ..settings_manager import settings_manager
+        if not settings_manager.get_value('setari_llm', 'prompt_compaction_enabled', True):
+            return None
+        try:
+            return max(200, int(settings_manager.get_value('setari_llm', 'prompt_compaction_field_chars', DEFAULT_FIELD_CHARS)))
+        except (TypeError, ValueError):
+            return DEFAULT_FIELD_CHARS
+
+    def _get_chunk_concurrency(self) -> int:
+        """Max chunks in flight, configured separately for network and local LLM modes."""
+        from ..settings_manager import settings_manager
+        llm_mode = self._get_llm_mode()
+
+        if llm_mode == 'local':
+            value = settings_manager.get_value('setari_llm', 'advanced_chunk_concurrency_local', 2)
+        else:
+            value = settings_manager.get_value('setari_llm', 'advanced_chunk_concurrency_network', 4)
+
+        try:
+            return max(1, int(value))
+        except (TypeError, ValueError):
+            return 1
+
     async def _generate_strategy_loop(self, user_query: str) -> Dict[str, Any]:
         for attempt in range(1, 4):
             feedback = "" # Could implement feedback loop logic here if needed
@@ -339,9 +760,13 @@ class ThreeStageAnalyzer:
             llm_mode = settings_manager.get_value('setari_llm', 'advanced_llm_mode', 'network')
 
             if llm_mode == 'local':
-                success, content, path = await LLMClient.call_llm_local(prompt, label=f"Discovery {attempt}")
+                success, content, path = await LLMClient.call_llm_local(
+                    prompt, label=f"Discovery {attempt}", use_cache=attempt == 1
+                )
             else:
-                success, content, path = await LLMClient.call_llm(prompt, label=f"Discovery {attempt}")
+                success, content, path = await LLMClient.call_llm(
+                    prompt, label=f"Discovery {attempt}", use_cache=attempt == 1
+                )
 
             if not success: continue # Retry loop handled by return check
 
@@ -363,6 +788,7 @@ class ThreeStageAnalyzer:
                 return strategy
             except Exception as e:
                 logger.warning(f"Strategy enrichment failed: {e}")
+                LLMClient.discard_cached(content)
 
         return self._generate_fallback_strategy(user_query)
 
@@ -484,7 +910,7 @@ class ThreeStageAnalyzer:
 
     async def _verify_strategy(self, user_query: str, strategy: Dict[str, Any], preview_data: list):
         prompt = self.prompt_manager.build_verification_prompt(user_query, strategy, preview_data)
-        await LLMClient.call_llm(prompt, timeout=300, label="Verification")
+        await LLMClient.call_llm(prompt, timeout=300, label="Verification", use_cache=False)
 
     async def _send_completion_email(
         self,
@@ -539,7 +965,14 @@ class ThreeStageAnalyzer:
             logger.error(f"Failed to send error email: {e}", exc_info=True)
 
     def update_plan_case_limit(self, plan_id: str, max_cases: int) -> Dict[str, Any]:
-        return self.plan_manager.update_plan_case_limit(plan_id, max_cases)
+        result = self.plan_manager.update_plan_case_limit(plan_id, max_cases)
+        if result.get('success'):
+            # Same estimate as create_plan: parallel chunk waves plus synthesis
+            concurrency = self._get_chunk_concurrency()
+            est_sec = (-(-result['total_chunks'] // concurrency) + 1) * 60
+            result['estimated_time_seconds'] = est_sec
+            result['estimated_time_minutes'] = round(est_sec / 60, 1)
+        return result
 
     async def decompose_into_tasks(self, user_query: str) -> Dict[str, Any]:
         """
@@ -563,6 +996,10 @@ class ThreeStageAnalyzer:
         try:
             logger.info(f"--- START TASK DECOMPOSITION for: {user_query[:50]}... ---")
 
+            cache_lookup = await self._analysis_cache_lookup("decomposition", user_query)
+            if cache_lookup.get("hit"):
+                return {**cache_lookup["hit"]["value"], 'cache_hit': cache_lookup["hit"]["match"]}
+
             # 1. Build task breakdown prompt
             prompt = self.prompt_manager.build_task_breakdown_prompt(user_query)
 
@@ -590,19 +1027,23 @@ class ThreeStageAnalyzer:
             except Exception as parse_error:
                 logger.error(f"[Task Breakdown] JSON parsing failed: {parse_error}")
                 LLMClient.delete_response(path)
+                LLMClient.discard_cached(content)
                 return {
                     'success': False,
                     'error': f'Răspunsul LLM nu este în format JSON valid: {str(parse_error)}'
                 }
 
-            # 4. Validate response structure
+            # 4. Validate response structure (a rejected answer must not be served from cache again)
             if not isinstance(result, dict):
+                LLMClient.discard_cached(content)
                 return {'success': False, 'error': 'Răspunsul LLM nu este un obiect JSON.'}
 
             if 'tasks' not in result or not isinstance(result['tasks'], list):
+                LLMClient.discard_cached(content)
                 return {'success': False, 'error': 'Răspunsul LLM nu conține un array "tasks" valid.'}
 
             if len(result['tasks']) == 0:
+                LLMClient.discard_cached(content)
                 return {'success': False, 'error': 'LLM-ul nu a generat niciun task.'}
 
             # 5. Validate each task has required fields
@@ -636,6 +1077,7 @@ class ThreeStageAnalyzer:
                     logger.warning(f"Task {task.get('id', 'unknown')} missing required fields: {missing}")
 
             if len(valid_tasks) == 0:
+                LLMClient.discard_cached(content)
                 return {
                     'success': False,
                     'error': 'Niciunul dintre taskurile generate nu are toate câmpurile obligatorii.'
@@ -643,13 +1085,15 @@ class ThreeStageAnalyzer:
 
             logger.info(f"[Task Breakdown] Successfully generated {len(valid_tasks)} tasks")
 
-            return {
+            response = {
                 'success': True,
                 'tasks': valid_tasks,
                 'decomposition_rationale': result.get('decomposition_rationale', 'N/A'),
                 'total_tasks': len(valid_tasks),
                 'estimated_complexity': result.get('estimated_complexity', 'medium')
             }
+            self._analysis_cache_store("decomposition", user_query, response, cache_lookup)
+            return response
 
         except Exception as e:
             logger.error(f"[Task Breakdown] Unexpected error: {e}", exc_info=True)
@@ -707,6 +1151,14 @@ class ThreeStageAnalyzer:
                             'referenced_case_ids': task.get('result', {}).get('bibliography_ids', [])
                         })
 
+                    # Too many tasks for one prompt: condense them in a reduction tree first
+                    reducer = HierarchicalReducer(
+                        lambda group, level, index: self._merge_task_results(original_query, group, level, index),
+                        budget_chars=self._synthesis_budget_chars("final_report_synthesis_prompt", original_query),
+                        concurrency=self._get_chunk_concurrency()
+                    )
+                    aggregated_data = await reducer.reduce(aggregated_data)
+
                 # 3. Build prompt
                 logger.info("Step 3/6: Building LLM prompt...")
                 if attempt == 1:
@@ -730,11 +1182,12 @@ class ThreeStageAnalyzer:
 
                 if llm_mode == 'local':
                     success, content, path = await LLMClient.call_llm_local(
-                        prompt, timeout=600, label=f"Final Report (Attempt {attempt})"
+                        prompt, timeout=600, label=f"Final Report (Attempt {attempt})", use_cache=attempt == 1
                     )
                 else:
                     success, content, path = await LLMClient.call_llm(
-                        prompt, timeout=600, label=f"Final Report (Attempt {attempt})", filename_suffix="_final"
+                        prompt, timeout=600, label=f"Final Report (Attempt {attempt})", filename_suffix="_final",
+                        use_cache=attempt == 1
                     )
 
                 if not success:
@@ -756,6 +1209,7 @@ class ThreeStageAnalyzer:
                 except Exception as e:
                     logger.error(f"Parse error on attempt {attempt}: {e}")
                     LLMClient.delete_response(path)
+                    LLMClient.discard_cached(content)
                     if attempt < max_retries:
                         continue
                     # Last attempt - create fallback
@@ -973,6 +1427,7 @@ class ThreeStageAnalyzer:
 
                 if missing_final:
                     logger.error(f"❌ CRITICAL: Still missing fields after auto-repair: {missing_final}")
+                    LLMClient.discard_cached(content)
                     if attempt < max_retries:
                         logger.warning("⏰ Retrying with enhanced prompt...")
                         continue
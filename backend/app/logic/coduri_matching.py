@@ -6,6 +6,7 @@ Logic for matching legal code articles to cases based on multiple criteria:
 - Embedding cosine similarity
 - Trigram text similarity
 """
+import json
 import logging
 import re
 import math
@@ -13,12 +14,15 @@ from sqlmodel import Session, text
 from typing import List, Dict, Any, Optional
 
 from ..config import get_settings
-from .search_logic import embed_text, normalize_query
+from .search_logic import case_embedding_text, embed_text, normalize_query
 from ..settings_manager import settings_manager
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Nearest-embedding candidates per requested article in get_relevant_articles_batch
+CANDIDATE_MULTIPLIER = 10
+
 
 # Cache for available code tables
 _code_tables_cache: Optional[List[str]] = None
@@ -124,7 +128,8 @@ def determine_relevant_codes(materie: str, available_tables: List[str] = None) -
 def get_relevant_articles(
     session: Session,
     case_data: Dict[str, Any],
-    limit: int = 10
+    limit: int = 10,
+    embedding: Optional[List[float]] = None
 ) -> List[Dict[str, Any]]:
     """
     Finds relevant legal code articles for a case using multi-criteria scoring.
@@ -133,6 +138,7 @@ def get_relevant_articles(
         session: Database session for coduri database
         case_data: Dictionary containing case metadata (materie, obiect, keywords, situatia_de_fapt, etc.)
         limit: Maximum number of articles to return
+        embedding: Precomputed case embedding (e.g. the stored vectori.embedding); computed if None
 
     Returns:
         List of legal articles with relevance scores, sorted by score (highest first)
@@ -148,15 +154,10 @@ def get_relevant_articles(
 
     # Extract case metadata
     materie = (case_data.get('materie') or '').strip()
-    obiect = (case_data.get('obiect') or '').strip()
-    keywords = case_data.get('keywords') or []
-    situatia_de_fapt = (case_data.get('situatia_de_fapt') or '').strip()
-    rezumat_ai = (case_data.get('rezumat_ai') or '').strip()
 
     # Extract extra search parameters
     table_name_filter = case_data.get('table_name')
     article_number = case_data.get('article_number')
-    text_query = case_data.get('text_query')
 
     # Get available code tables in the database
     available_tables = get_available_code_tables(session)
@@ -182,61 +183,21 @@ def get_relevant_articles(
     # Generate embedding for the case (only if necessary)
     # If we are doing a simple keyword search, embedding might be overkill or irrelevant if text is short
     # But let's keep it for hybrid search
-    text_for_embedding = ' '.join(filter(None, [
-        situatia_de_fapt[:500] if situatia_de_fapt else '',
-        rezumat_ai[:300] if rezumat_ai else '',
-        obiect,
-        materie,
-        text_query if text_query else '' # Include search query in embedding
-    ])).strip()
-
-    if not text_for_embedding:
-        logger.warning("No text available for embedding generation, using zero vector")
-        embedding = [0.0] * settings.VECTOR_DIM
-    else:
-        embedding = embed_text(text_for_embedding)
+    if embedding is None:
+        text_for_embedding = case_embedding_text(case_data)
+        if not text_for_embedding:
+            logger.warning("No text available for embedding generation, using zero vector")
+            embedding = [0.0] * settings.VECTOR_DIM
+        else:
+            embedding = embed_text(text_for_embedding)
 
     # Prepare query parameters
     params = {
+        **_match_params(case_data, embedding),
         "embedding": str(embedding),
-        "materie": materie.lower() if materie else '',
-        "obiect": obiect.lower() if obiect else '',
-        "article_number": article_number.strip() if article_number else '',
-        "text_query": text_query.strip() if text_query else ''
+        "min_embedding_score": settings_manager.get_value("ponderi_cautare_coduri", "min_embedding_score", 0.20)
     }
-
-    # Normalize query text for trigram similarity
-    q_norm = normalize_query(f"{materie} {obiect} {text_query or ''}")
-    params["q"] = q_norm
-
-    # Build keywords regex pattern
-    keywords_list = []
-    if isinstance(keywords, list):
-        keywords_list = keywords
-    elif isinstance(keywords, str):
-        keywords_list = [kw.strip() for kw in keywords.split(',') if kw.strip()]
-
-    # Add text_query to keywords list for regex matching if it's short
-    if text_query and len(text_query.split()) < 5:
-        keywords_list.append(text_query)
-
-    if keywords_list:
-        escaped_keywords = [re.escape(normalize_query(kw)) for kw in keywords_list[:10]]
-        keywords_regex = '|'.join(escaped_keywords)
-        params["keywords_regex"] = f"\\y({keywords_regex})\\y"
-    else:
-        params["keywords_regex"] = '^$'  # Never matches
-
-    # Scoring weights - optimized for legal relevance
-    W_EXACT_ARTICLE = settings_manager.get_value("ponderi_cautare_coduri", "w_exact_article", 20.0) # Boosted for direct search
-    W_EXACT_MATERIE = settings_manager.get_value("ponderi_cautare_coduri", "w_exact_materie", 3.0)
-    W_EXACT_OBIECT = settings_manager.get_value("ponderi_cautare_coduri", "w_exact_obiect", 4.0)
-    W_KEYWORDS = settings_manager.get_value("ponderi_cautare_coduri", "w_keywords", 5.0) # Boosted for text search
-    W_EMBEDDING = settings_manager.get_value("ponderi_cautare_coduri", "w_embedding", 2.0)
-    W_TRIGRAM = settings_manager.get_value("ponderi_cautare_coduri", "w_trigram", 1.0)
-
-    MIN_EMBEDDING_SCORE = settings_manager.get_value("ponderi_cautare_coduri", "min_embedding_score", 0.20)
-    params["min_embedding_score"] = MIN_EMBEDDING_SCORE
+    score_sql, relevance_where_sql = _relevance_sql(':')
 
     # Collect results from all relevant tables
     all_results = []
@@ -256,17 +217,7 @@ def get_relevant_articles(
 
         # Base where clause for relevance if no strict filter
         if not article_number:
-            where_clauses.append(f"""
-                (
-                    (:text_query != '' AND (COALESCE(t.text, '') ~* :keywords_regex OR array_to_string(t.keywords, ' ', '') ~* :keywords_regex)) OR
-                    (LOWER(COALESCE(t.materie, '')) LIKE '%' || :materie || '%' AND :materie != '') OR
-                    (LOWER(COALESCE(t.obiect, '')) LIKE '%' || :obiect || '%' AND :obiect != '') OR
-                    (COALESCE(t.text, '') ~* :keywords_regex) OR
-                    (array_to_string(t.keywords, ' ', '') ~* :keywords_regex) OR
-                    (t.text_embeddings IS NOT NULL AND
-                     (1.0 - (t.text_embeddings <=> :embedding)) > :min_embedding_score)
-                )
-            """)
+            where_clauses.append(relevance_where_sql)
 
         where_sql = " AND ".join(where_clauses) if where_clauses else "TRUE"
 
@@ -281,56 +232,278 @@ def get_relevant_articles(
                 t.keywords,
                 t.art_conex,
                 t.doctrina,
-                (
-                    -- Exact article number match (highest priority)
+                {score_sql} AS relevance_score
+            FROM (
+                (SELECT e.id
+                 FROM {table_name} e
+                 WHERE c.has_embedding AND e.text_embeddings IS NOT NULL
+                 ORDER BY e.text_embeddings <=> c.embedding
+                 LIMIT :candidate_limit)
+                UNION
+                SELECT t.id FROM {table_name} t WHERE {lexical_sql}
+            ) candidates
+            JOIN {table_name} t ON t.id = candidates.id
+            WHERE {where_sql}
+            ORDER BY relevance_score DESC
+            LIMIT :limit_per_table;
+        """)
+
+        try:
+            params_with_limit = {**params, "limit_per_table": limit}
+            result = session.execute(query_sql, params_with_limit)
+            rows = result.mappings().all()
+
+            # Add results with table name annotation
+            all_results.extend(_article_from_row(row, table_name) for row in rows)
+
+            logger.info(f"Found {len(rows)} articles in {table_name}")
+
+        except Exception as e:
+            logger.error(f"Error querying table {table_name}: {e}", exc_info=True)
+            # Rollback the transaction to prevent "current transaction is aborted" errors
+            session.rollback()
+            continue
+
+    # Sort all results by relevance score and return top N
+    all_results.sort(key=lambda x: x['relevance_score'], reverse=True)
+    final_results = all_results[:limit]
+
+    logger.info(f"Returning {len(final_results)} total relevant articles from {len(tables_to_query)} tables")
+    return final_results
+
+
+def get_relevant_articles_batch(
+    session: Session,
+    cases: List[Dict[str, Any]],
+    limit: int = 10
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Set-based get_relevant_articles for a batch of cases (used by precalculation).
+
+    One statement for the whole batch: a UNION ALL with one branch per code table,
+    each matching the cases mapped to that table (determine_relevant_codes) in a
+    LATERAL subquery with the same scoring as get_relevant_articles. The per-table
+    results are then merged per case, as in get_relevant_articles.
+    To avoid a full scan per case, only a candidate set is scored: the
+    CANDIDATE_MULTIPLIER * limit nearest articles by embedding (served by the
+    vector index) plus the lexical matches.
+    Explicit table_name / article_number filters are not supported here.
+
+    Args:
+        session: Database session for coduri database
+        cases: [{'case_id', 'case_data', 'embedding'}]; embeddings are required
+        limit: Maximum number of articles per case
+
+    Returns:
+        {case_id: articles sorted by score}; cases without matches map to []
+
+    Raises:
+        Database errors, so callers can fall back to the per-case path
+    """
+    results: Dict[int, List[Dict[str, Any]]] = {case['case_id']: [] for case in cases}
+    available_tables = get_available_code_tables(session)
+    if not cases or not available_tables:
+        return results
+
+    records = []
+    tables_in_batch = set()
+    for case in cases:
+        case_data = case['case_data']
+        tables = [t for t in determine_relevant_codes((case_data.get('materie') or '').strip(), available_tables)
+                  if t in available_tables] or available_tables[:3]
+        tables_in_batch.update(tables)
+        records.append({
+            'case_id': case['case_id'],
+            'embedding': str(case['embedding']),
+            'tables': tables,
+            **_match_params(case_data, case['embedding'])
+        })
+
+    score_sql, where_sql = _relevance_sql('c.')
+    lexical_sql = _lexical_sql('c.')
+    branches = [
+        f"""
+        SELECT c.case_id, '{table_name}' AS cod_sursa, r.*
+        FROM (SELECT * FROM batch_cases WHERE '{table_name}' = ANY(tables)) c
+        CROSS JOIN LATERAL (
+            SELECT
+                t.id,
+                t.numar,
+                t.titlu,
+                t.obiect,
+                t.materie,
+                t.text,
+                t.keywords,
+                t.art_conex,
+                t.doctrina,
+                {score_sql} AS relevance_score
+            FROM (
+                (SELECT e.id
+                 FROM {table_name} e
+                 WHERE c.has_embedding AND e.text_embeddings IS NOT NULL
+                 ORDER BY e.text_embeddings <=> c.embedding
+                 LIMIT :candidate_limit)
+                UNION
+                SELECT t.id FROM {table_name} t WHERE {lexical_sql}
+            ) candidates
+            JOIN {table_name} t ON t.id = candidates.id
+            WHERE {where_sql}
+            ORDER BY relevance_score DESC
+            LIMIT :limit_per_table
+        ) r
+        """
+        for table_name in sorted(tables_in_batch)
+    ]
+    query_sql = text(f"""
+        WITH batch_cases AS (
+            SELECT
+                case_id, tables, materie, obiect, article_number, text_query, q, keywords_regex,
+                regex_art_prefix, has_embedding,
+                CAST(embedding AS vector) AS embedding
+            FROM jsonb_to_recordset(CAST(:cases AS jsonb)) AS x(
+                case_id bigint, tables text[], materie text, obiect text, article_number text,
+                text_query text, q text, keywords_regex text, regex_art_prefix text,
+                has_embedding boolean, embedding text
+            )
+        )
+        {" UNION ALL ".join(branches)};
+    """)
+
+    candidate_limit = limit * CANDIDATE_MULTIPLIER
+    # The index scan returns at most ef_search rows; widen it for this transaction
+    session.execute(text("SELECT set_config('hnsw.ef_search', :ef_search, true)"),
+                    {'ef_search': str(max(candidate_limit, 40))})
+    rows = session.execute(query_sql, {
+        'cases': json.dumps(records),
+        'limit_per_table': limit,
+        'candidate_limit': candidate_limit,
+        'min_embedding_score': settings_manager.get_value("ponderi_cautare_coduri", "min_embedding_score", 0.20)
+    }).mappings().all()
+
+    for row in rows:
+        results[row['case_id']].append(_article_from_row(row, row['cod_sursa']))
+
+    # Sort all results by relevance score and keep top N per case
+    for case_id, articles in results.items():
+        articles.sort(key=lambda x: x['relevance_score'], reverse=True)
+        results[case_id] = articles[:limit]
+
+    logger.info(
+        f"Matched articles for {len(cases)} cases in one query "
+        f"({len(tables_in_batch)} tables, {len(rows)} rows)"
+    )
+    return results
+
+
+# --- Helpers ---
+
+def _match_params(case_data: Dict[str, Any], embedding: Optional[List[float]]) -> Dict[str, Any]:
+    """Per-case bind values of the scoring SQL (see _relevance_sql)."""
+    materie = (case_data.get('materie') or '').strip()
+    obiect = (case_data.get('obiect') or '').strip()
+    keywords = case_data.get('keywords') or []
+    article_number = case_data.get('article_number')
+    text_query = case_data.get('text_query')
+
+    # Build keywords regex pattern
+    keywords_list = []
+    if isinstance(keywords, list):
+        keywords_list = list(keywords)
+    elif isinstance(keywords, str):
+        keywords_list = [kw.strip() for kw in keywords.split(',') if kw.strip()]
+
+    # Add text_query to keywords list for regex matching if it's short
+    if text_query and len(text_query.split()) < 5:
+        keywords_list.append(text_query)
+
+    if keywords_list:
+        escaped_keywords = [re.escape(normalize_query(kw)) for kw in keywords_list[:10]]
+        keywords_regex = f"\\y({'|'.join(escaped_keywords)})\\y"
+    else:
+        keywords_regex = '^$'  # Never matches
+
+    return {
+        "materie": materie.lower() if materie else '',
+        "obiect": obiect.lower() if obiect else '',
+        "article_number": article_number.strip() if article_number else '',
+        "text_query": text_query.strip() if text_query else '',
+        # Normalize query text for trigram similarity
+        "q": normalize_query(f"{materie} {obiect} {text_query or ''}"),
+        "keywords_regex": keywords_regex,
+        "regex_art_prefix": '^(?:art\\.?\\s*)?',
+        # Check if embedding is valid (not null and not zero-vector)
+        "has_embedding": bool(embedding) and any(x != 0 for x in embedding)
+    }
+
+
+def _relevance_sql(ref: str) -> tuple[str, str]:
+    """
+    Scoring expression and relevance filter for code table rows (alias t).
+
+    Args:
+        ref: How per-case values are referenced: ':' for bind parameters
+             (":materie") or a column prefix for set-based queries ("c.materie")
+
+    Returns:
+        Tuple of (relevance score expression, WHERE condition without the article filter)
+    """
+    # Scoring weights - optimized for legal relevance
+    W_EXACT_ARTICLE = settings_manager.get_value("ponderi_cautare_coduri", "w_exact_article", 20.0) # Boosted for direct search
+    W_EXACT_MATERIE = settings_manager.get_value("ponderi_cautare_coduri", "w_exact_materie", 3.0)
+    W_EXACT_OBIECT = settings_manager.get_value("ponderi_cautare_coduri", "w_exact_obiect", 4.0)
+    W_KEYWORDS = settings_manager.get_value("ponderi_cautare_coduri", "w_keywords", 5.0) # Boosted for text search
+    W_EMBEDDING = settings_manager.get_value("ponderi_cautare_coduri", "w_embedding", 2.0)
+    W_TRIGRAM = settings_manager.get_value("ponderi_cautare_coduri", "w_trigram", 1.0)
+
+    score_sql = f"""(
                     -- Exact article number match (highest priority)
                     (CASE
                         -- Strict match for "12", "Art. 12", "Art 12", "Art.12" (case insensitive)
                         -- Escaping colon for SQLAlchemy with backslash or passing as param is tricky inside string.
                         -- Safest is to use bind param for the prefix part.
-                        WHEN :article_number != '' AND COALESCE(t.numar, '') ~* (:regex_art_prefix || :article_number || '$')
+                        WHEN {ref}article_number != '' AND COALESCE(t.numar, '') ~* ({ref}regex_art_prefix || {ref}article_number || '$')
                         THEN {W_EXACT_ARTICLE} * 2
 
                         -- Partial match (contains number)
-                        WHEN :article_number != '' AND LOWER(COALESCE(t.numar, '')) LIKE '%' || LOWER(:article_number) || '%'
+                        WHEN {ref}article_number != '' AND LOWER(COALESCE(t.numar, '')) LIKE '%' || LOWER({ref}article_number) || '%'
                         THEN {W_EXACT_ARTICLE}
                         ELSE 0
                     END) +
 
                     -- Exact materie match
                     (CASE
-                        WHEN LOWER(COALESCE(t.materie, '')) LIKE '%' || :materie || '%'
-                        AND :materie != ''
+                        WHEN LOWER(COALESCE(t.materie, '')) LIKE '%' || {ref}materie || '%'
+                        AND {ref}materie != ''
                         THEN {W_EXACT_MATERIE}
                         ELSE 0
                     END) +
 
                     -- Exact obiect match
                     (CASE
-                        WHEN LOWER(COALESCE(t.obiect, '')) LIKE '%' || :obiect || '%'
-                        AND :obiect != ''
+                        WHEN LOWER(COALESCE(t.obiect, '')) LIKE '%' || {ref}obiect || '%'
+                        AND {ref}obiect != ''
                         THEN {W_EXACT_OBIECT}
                         ELSE 0
                     END) +
 
                     -- Keywords/Text Query regex match in text field
                     (CASE
-                        WHEN COALESCE(t.text, '') ~* :keywords_regex
+                        WHEN COALESCE(t.text, '') ~* {ref}keywords_regex
                         THEN {W_KEYWORDS}
                         ELSE 0
                     END) +
 
                     -- Keywords match in array field (convert array to text first)
                     (CASE
-                        WHEN array_to_string(t.keywords, ' ', '') ~* :keywords_regex
+                        WHEN array_to_string(t.keywords, ' ', '') ~* {ref}keywords_regex
                         THEN {W_KEYWORDS}
                         ELSE 0
                     END) +
 
                     -- Embedding cosine similarity (HANDLE ZERO VECTOR / NULL)
                     (CASE
-                        WHEN t.text_embeddings IS NOT NULL AND :has_embedding = true
-                        THEN (1.0 - (t.text_embeddings <=> :embedding)) * {W_EMBEDDING}
+                        WHEN t.text_embeddings IS NOT NULL AND {ref}has_embedding = true
+                        THEN (1.0 - (t.text_embeddings <=> {ref}embedding)) * {W_EMBEDDING}
                         ELSE 0
                     END) +
 
@@ -340,85 +513,72 @@ def get_relevant_articles(
                         COALESCE(t.titlu, '') || ' ' ||
                         COALESCE(t.obiect, '') || ' ' ||
                         array_to_string(COALESCE(t.keywords, ARRAY[]::text[]), ' ', ''),
-                        :q
+                        {ref}q
                     ) * {W_TRIGRAM})
-                ) AS relevance_score
-            FROM {table_name} t
-            WHERE {where_sql}
-            ORDER BY relevance_score DESC
-            LIMIT :limit_per_table;
-        """)
-
-        # Check if embedding is valid (not null and not zero-vector)
-        has_embedding = False
-        if embedding and any(x != 0 for x in embedding):
-            has_embedding = True
+                )"""
 
-        # Add the regex prefix bind parameter
-        params['regex_art_prefix'] = '^(?:art\.?\s*)?'
-        params['has_embedding'] = has_embedding
-
-        try:
-            params_with_limit = {**params, "limit_per_table": limit}
-            result = session.execute(query_sql, params_with_limit)
-            rows = result.mappings().all()
-
-            # Add results with table name annotation
-            for row in rows:
-                # Convert PostgreSQL arrays to strings for Pydantic validation
-                keywords_str = None
-                if row['keywords']:
-                    if isinstance(row['keywords'], list):
-                        keywords_str = ', '.join(row['keywords'])
-                    else:
-                        keywords_str = str(row['keywords'])
-
-                art_conex_str = None
-                if row['art_conex']:
-                    if isinstance(row['art_conex'], list):
-                        art_conex_str = '; '.join(row['art_conex'])
-                    else:
-                        art_conex_str = str(row['art_conex'])
-
-                # Sanitize score to prevent NaN/Inf JSON errors
-                raw_score = row['relevance_score']
-                score = 0.0
-                if raw_score is not None:
-                     try:
-                         val = float(raw_score)
-                         if not (math.isnan(val) or math.isinf(val)):
-                             score = val
-                     except (ValueError, TypeError):
-                         score = 0.0
-
-                all_results.append({
-                    "id": row['id'],
-                    "numar": row['numar'],
-                    "titlu": row['titlu'],
-                    "obiect": row['obiect'],
-                    "materie": row['materie'],
-                    "text": row['text'],
-                    "keywords": keywords_str,
-                    "art_conex": art_conex_str,
-                    "doctrina": row['doctrina'],
-                    "relevance_score": score,
-                    "cod_sursa": table_name
-                })
-
-            logger.info(f"Found {len(rows)} articles in {table_name}")
-
-        except Exception as e:
-            logger.error(f"Error querying table {table_name}: {e}", exc_info=True)
-            # Rollback the transaction to prevent "current transaction is aborted" errors
-            session.rollback()
-            continue
-
-    # Sort all results by relevance score and return top N
-    all_results.sort(key=lambda x: x['relevance_score'], reverse=True)
-    final_results = all_results[:limit]
-
-    logger.info(f"Returning {len(final_results)} total relevant articles from {len(tables_to_query)} tables")
-    return final_results
+    where_sql = f"""
+                (
+                    {_lexical_sql(ref)} OR
+                    (t.text_embeddings IS NOT NULL AND
+                     (1.0 - (t.text_embeddings <=> {ref}embedding)) > :min_embedding_score)
+                )
+            """
+
+    return score_sql, where_sql
+
+
+def _lexical_sql(ref: str) -> str:
+    """Non-embedding part of the relevance filter (alias t); see _relevance_sql."""
+    return f"""(
+                    ({ref}text_query != '' AND (COALESCE(t.text, '') ~* {ref}keywords_regex OR array_to_string(t.keywords, ' ', '') ~* {ref}keywords_regex)) OR
+                    (LOWER(COALESCE(t.materie, '')) LIKE '%' || {ref}materie || '%' AND {ref}materie != '') OR
+                    (LOWER(COALESCE(t.obiect, '')) LIKE '%' || {ref}obiect || '%' AND {ref}obiect != '') OR
+                    (COALESCE(t.text, '') ~* {ref}keywords_regex) OR
+                    (array_to_string(t.keywords, ' ', '') ~* {ref}keywords_regex)
+                )"""
+
+
+def _article_from_row(row, table_name: str) -> Dict[str, Any]:
+    # Convert PostgreSQL arrays to strings for Pydantic validation
+    keywords_str = None
+    if row['keywords']:
+        if isinstance(row['keywords'], list):
+            keywords_str = ', '.join(row['keywords'])
+        else:
+            keywords_str = str(row['keywords'])
+
+    art_conex_str = None
+    if row['art_conex']:
+        if isinstance(row['art_conex'], list):
+            art_conex_str = '; '.join(row['art_conex'])
+        else:
+            art_conex_str = str(row['art_conex'])
+
+    # Sanitize score to prevent NaN/Inf JSON errors
+    raw_score = row['relevance_score']
+    score = 0.0
+    if raw_score is not None:
+         try:
+             val = float(raw_score)
+             if not (math.isnan(val) or math.isinf(val)):
+                 score = val
+         except (ValueError, TypeError):
+             score = 0.0
+
+    return {
+        "id": row['id'],
+        "numar": row['numar'],
+        "titlu": row['titlu'],
+        "obiect": row['obiect'],
+        "materie": row['materie'],
+        "text": row['text'],
+        "keywords": keywords_str,
+        "art_conex": art_conex_str,
+        "doctrina": row['doctrina'],
+        "relevance_score": score,
+        "cod_sursa": table_name
+    }
 
 
 def get_article_by_id(session: Session, article_id: str, table_name: str) -> Optional[Dict[str, Any]]:
@@ -1,5 +1,6 @@
 import httpx
 from ..config import get_settings
+from .single_flight import embedding_flight
 
 settings = get_settings()
 OLLAMA_URL = settings.OLLAMA_URL
@@ -8,6 +9,12 @@ VECTOR_DIM = settings.VECTOR_DIM
 
 
 async def embed_text(text: str) -> list[float]:
+    # Identical texts embedded concurrently (e.g. the same search from several users) share one call
+    emb = await embedding_flight.do((MODEL_NAME, text), lambda: _request_embedding(text))
+    return list(emb)
+
+
+async def _request_embedding(text: str) -> list[float]:
     async with httpx.AsyncClient() as client:
         r = await client.post(
             f"{OLLAMA_URL}/api/embed",
@@ -63,29 +63,7 @@ async def embed_texts_batch(texts: List[str], batch_size: int = 10) -> List[list
                 response.raise_for_status()
 
                 # Response format: {"embeddings": [[...], [...], ...]}
-                batch_embeddings = response.json().get("embeddings", [])
-
-                # Validate we got the right number of embeddings
-                if len(batch_embeddings) != len(batch):
-                    logger.error(
-                        f"Batch size mismatch: sent {len(batch)} texts, "
-                        f"received {len(batch_embeddings)} embeddings"
-                    )
-                    # Fill with zero vectors for missing embeddings
-                    while len(batch_embeddings) < len(batch):
-                        batch_embeddings.append([0.0] * VECTOR_DIM)
-
-                # Validate dimensions for each embedding
-                for idx, emb in enumerate(batch_embeddings):
-                    if len(emb) != VECTOR_DIM:
-                        logger.error(
-                            f"Embedding dimension mismatch at index {idx}: "
-                            f"Expected {VECTOR_DIM}, got {len(emb)}"
-                        )
-                        # Replace with zero vector
-                        batch_embeddings[idx] = [0.0] * VECTOR_DIM
-
-                results.extend(batch_embeddings)
+                results.extend(_checked_embeddings(batch, response.json().get("embeddings", [])))
 
     except httpx.HTTPError as e:
         logger.error(f"HTTP error in batch embedding: {e}")
@@ -99,6 +77,54 @@ async def embed_texts_batch(texts: List[str], batch_size: int = 10) -> List[list
     return results
 
 
+def embed_texts_batch_sync(texts: List[str], batch_size: int = 32) -> List[list[float]]:
+    """
+    Blocking variant of embed_texts_batch, for worker threads (e.g. precalculation).
+
+    Failed batches yield zero vectors, like the async variant.
+    """
+    results = []
+    with httpx.Client(timeout=60) as client:
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            try:
+                response = client.post(
+                    f"{OLLAMA_URL}/api/embed",
+                    json={"model": MODEL_NAME, "input": batch}
+                )
+                response.raise_for_status()
+                results.extend(_checked_embeddings(batch, response.json().get("embeddings", [])))
+            except (httpx.HTTPError, ValueError) as e:
+                logger.error(f"Error in batch embedding ({len(batch)} texts): {e}")
+                results.extend([0.0] * VECTOR_DIM for _ in batch)
+    return results
+
+
+def _checked_embeddings(batch: List[str], batch_embeddings: List[list[float]]) -> List[list[float]]:
+    """Pads a short response and replaces wrongly sized vectors with zero vectors."""
+    # Validate we got the right number of embeddings
+    if len(batch_embeddings) != len(batch):
+        logger.error(
+            f"Batch size mismatch: sent {len(batch)} texts, "
+            f"received {len(batch_embeddings)} embeddings"
+        )
+        # Fill with zero vectors for missing embeddings
+        while len(batch_embeddings) < len(batch):
+            batch_embeddings.append([0.0] * VECTOR_DIM)
+
+    # Validate dimensions for each embedding
+    for idx, emb in enumerate(batch_embeddings):
+        if len(emb) != VECTOR_DIM:
+            logger.error(
+                f"Embedding dimension mismatch at index {idx}: "
+                f"Expected {VECTOR_DIM}, got {len(emb)}"
+            )
+            # Replace with zero vector
+            batch_embeddings[idx] = [0.0] * VECTOR_DIM
+
+    return batch_embeddings[:len(batch)]
+
+
 async def embed_text_single(text: str) -> list[float]:
     """
     Generate embedding for a single text (optimized).
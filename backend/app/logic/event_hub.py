@@ -0,0 +1,139 @@
+"""
+Event Hub for SSE fan-out.
+
+Publish/subscribe hub used by the queue manager to push queue position and
+progress events to SSE clients.
+
+Features:
+- publish() never blocks and never awaits subscribers
+- Bounded per-subscriber buffers with drop-oldest policy
+- One shared keepalive ticker for all subscribers
+- Events delivered in publish order per topic (job)
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Returned by Subscription.next() when the shared ticker fires instead of an event
+KEEPALIVE = None
+
+
+class Subscription:
+    """A single subscriber's bounded buffer for one topic."""
+
+    def __init__(self, topic: str, max_buffer: int):
+        self.topic = topic
+        self.buffer: Deque[Dict[str, Any]] = deque(maxlen=max_buffer)
+        self.dropped: int = 0
+        self._wakeup = asyncio.Event()
+        self._keepalive_pending = False
+        self.closed = False
+
+    def push(self, data: Dict[str, Any]):
+        """Appends an event, discarding the oldest one if the buffer is full."""
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(data)
+        self._wakeup.set()
+
+    def tick(self):
+        """Marks a keepalive as due and wakes the reader."""
+        self._keepalive_pending = True
+        self._wakeup.set()
+
+    async def next(self) -> Optional[Dict[str, Any]]:
+        """
+        Waits for the next event.
+
+        Returns:
+            The next event dict, or KEEPALIVE (None) when the shared ticker fired
+        """
+        while True:
+            if self.buffer:
+                return self.buffer.popleft()
+            if self._keepalive_pending:
+                self._keepalive_pending = False
+                return KEEPALIVE
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+
+class EventHub:
+    """
+    Topic-based fan-out hub.
+
+    Topics are job/request IDs. Subscribers each get their own bounded buffer so a
+    slow SSE client only loses its own oldest events and never stalls publishers.
+    """
+
+    def __init__(self, max_buffer: int = 100, keepalive_interval: float = 30.0):
+        self.max_buffer = max_buffer
+        self.keepalive_interval = keepalive_interval
+        self.topics: Dict[str, Set[Subscription]] = {}
+        self._ticker_task: Optional[asyncio.Task] = None
+
+    def subscribe(self, topic: str) -> Subscription:
+        """Creates a subscription for a topic. Must be called from the event loop."""
+        subscription = Subscription(topic, self.max_buffer)
+        self.topics.setdefault(topic, set()).add(subscription)
+        self._ensure_ticker()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Removes a subscription; drops the topic when it has no subscribers left."""
+        subscription.closed = True
+        subscribers = self.topics.get(subscription.topic)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self.topics[subscription.topic]
+        if subscription.dropped:
+            logger.info(f"Subscriber for {subscription.topic} dropped {subscription.dropped} events (slow client)")
+
+    def close_topic(self, topic: str):
+        """Forgets all subscribers of a topic (their streams end on the next status check)."""
+        for subscription in self.topics.pop(topic, set()):
+            subscription.closed = True
+            subscription.tick()
+
+    def publish(self, topic: str, data: Dict[str, Any]) -> int:
+        """
+        Delivers an event to every subscriber of the topic without awaiting.
+
+        Returns:
+            Number of subscribers the event was delivered to
+        """
+        subscribers = self.topics.get(topic)
+        if not subscribers:
+            return 0
+        for subscription in subscribers:
+            subscription.push(data)
+        return len(subscribers)
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self.topics.get(topic))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'topics': len(self.topics),
+            'subscribers': sum(len(s) for s in self.topics.values())
+        }
+
+    # --- Helpers ---
+
+    def _ensure_ticker(self):
+        if self._ticker_task is None or self._ticker_task.done():
+            self._ticker_task = asyncio.get_running_loop().create_task(self._run_ticker())
+
+    async def _run_ticker(self):
+        """Single keepalive loop for all subscribers; exits when nobody is listening."""
+        while self.topics:
+            await asyncio.sleep(self.keepalive_interval)
+            for subscribers in list(self.topics.values()):
+                for subscription in subscribers:
+                    subscription.tick()
@@ -6,23 +6,28 @@ Logic for matching legal document models to cases based on multiple criteria:
 - Embedding cosine similarity
 - Trigram text similarity
 """
+import json
 import logging
 import re
 from sqlmodel import Session, text
 from typing import List, Dict, Any, Optional
 
 from ..config import get_settings
-from .search_logic import embed_text, normalize_query
+from .search_logic import case_embedding_text, embed_text, normalize_query
 from ..settings_manager import settings_manager
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Nearest-embedding candidates per requested model in get_relevant_modele_batch
+CANDIDATE_MULTIPLIER = 10
+
 
 def get_relevant_modele(
     session: Session,
     case_data: Dict[str, Any],
-    limit: int = 10
+    limit: int = 10,
+    embedding: Optional[List[float]] = None
 ) -> List[Dict[str, Any]]:
     """
     Finds relevant document models for a case using multi-criteria scoring.
@@ -31,6 +36,7 @@ def get_relevant_modele(
         session: Database session for modele_documente database
         case_data: Dictionary containing case metadata (materie, obiect, keywords, situatia_de_fapt, etc.)
         limit: Maximum number of models to return
+        embedding: Precomputed case embedding (e.g. the stored vectori.embedding); computed if None
 
     Returns:
         List of document models with relevance scores, sorted by score (highest first)
@@ -44,49 +50,161 @@ def get_relevant_modele(
     """
     logger.info(f"Finding relevant modele for case with materie='{case_data.get('materie')}', obiect='{case_data.get('obiect')}'")
 
-    # Extract case metadata
-    materie = (case_data.get('materie') or '').strip()
-    obiect = (case_data.get('obiect') or '').strip()
-    keywords = case_data.get('keywords') or []
-    situatia_de_fapt = (case_data.get('situatia_de_fapt') or '').strip()
-    rezumat_ai = (case_data.get('rezumat_ai') or '').strip()
-
-    # Extract extra search parameters
-    text_query = case_data.get('text_query')
-
-    # Generate embedding for the case
-    # Combine relevant text fields for embedding generation
-    text_for_embedding = ' '.join(filter(None, [
-        situatia_de_fapt[:500] if situatia_de_fapt else '',  # Limit to 500 chars
-        rezumat_ai[:300] if rezumat_ai else '',
-        obiect,
-        materie,
-        text_query if text_query else ''
-    ])).strip()
-
-    if not text_for_embedding:
-        logger.warning("No text available for embedding generation, using zero vector")
-        embedding = [0.0] * settings.VECTOR_DIM
-    else:
-        embedding = embed_text(text_for_embedding)
+    # Generate embedding for the case (unless the caller already has one)
+    if embedding is None:
+        text_for_embedding = case_embedding_text(case_data)
+        if not text_for_embedding:
+            logger.warning("No text available for embedding generation, using zero vector")
+            embedding = [0.0] * settings.VECTOR_DIM
+        else:
+            embedding = embed_text(text_for_embedding)
 
     # Prepare query parameters
     params = {
+        **_match_params(case_data),
         "embedding": str(embedding),
         "limit": limit,
-        "materie": materie.lower() if materie else '',
-        "obiect": obiect.lower() if obiect else '',
-        "text_query": text_query.strip() if text_query else ''
+        "min_embedding_score": settings_manager.get_value("ponderi_cautare_modele", "min_embedding_score", 0.5)
     }
 
-    # Normalize query text for trigram similarity
-    q_norm = normalize_query(f"{materie} {obiect} {text_query or ''}")
-    params["q"] = q_norm
+    # Build the query
+    # We need to check if materie and obiect fields exist and match
+    score_sql, where_sql = _relevance_sql(':')
+    query_sql = text(f"""
+        SELECT
+            m.id,
+            m.titlu_model,
+            m.obiect_model,
+            m.materie_model,
+            m.sursa_model,
+            m.text_model,
+            m.keywords_model,
+            {score_sql} AS relevance_score
+        FROM modele_documente m
+        WHERE {where_sql}
+        ORDER BY relevance_score DESC
+        LIMIT :limit;
+    """)
+
+    try:
+        result = session.execute(query_sql, params)
+        rows = result.mappings().all()
+
+        logger.info(f"Found {len(rows)} relevant modele")
+
+        # Process results
+        return [_model_from_row(row) for row in rows]
+
+    except Exception as e:
+        logger.error(f"Error finding relevant modele: {e}", exc_info=True)
+        return []
+
+
+def get_relevant_modele_batch(
+    session: Session,
+    cases: List[Dict[str, Any]],
+    limit: int = 10
+) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Set-based get_relevant_modele for a batch of cases (used by precalculation).
+
+    All cases are scored in a single statement: the cases are passed as one JSONB
+    array and each is matched in a LATERAL subquery with the same scoring as
+    get_relevant_modele. To avoid a full scan per case, only a candidate set is
+    scored: the CANDIDATE_MULTIPLIER * limit nearest models by embedding (served
+    by the vector index) plus the lexical matches. Models that would match only
+    through a weak embedding outside that neighbourhood are not considered.
+
+    Args:
+        session: Database session for modele_documente database
+        cases: [{'case_id', 'case_data', 'embedding'}]; embeddings are required
+        limit: Maximum number of models per case
+
+    Returns:
+        {case_id: models sorted by score}; cases without matches map to []
+
+    Raises:
+        Database errors, so callers can fall back to the per-case path
+    """
+    if not cases:
+        return {}
+
+    records = [
+        {'case_id': case['case_id'], 'embedding': str(case['embedding']), **_match_params(case['case_data'])}
+        for case in cases
+    ]
+    score_sql, where_sql = _relevance_sql('c.')
+    lexical_sql = _lexical_sql('c.')
+    query_sql = text(f"""
+        SELECT
+            c.case_id,
+            r.*
+        FROM (
+            SELECT
+                case_id, materie, obiect, text_query, q, keywords_regex,
+                CAST(embedding AS vector) AS embedding
+            FROM jsonb_to_recordset(CAST(:cases AS jsonb)) AS x(
+                case_id bigint, materie text, obiect text, text_query text,
+                q text, keywords_regex text, embedding text
+            )
+        ) c
+        CROSS JOIN LATERAL (
+            SELECT
+                m.id,
+                m.titlu_model,
+                m.obiect_model,
+                m.materie_model,
+                m.sursa_model,
+                {score_sql} AS relevance_score
+            FROM (
+                (SELECT e.id
+                 FROM modele_documente e
+                 WHERE e.comentariiLLM_model_embedding IS NOT NULL
+                 ORDER BY e.comentariiLLM_model_embedding <=> c.embedding
+                 LIMIT :candidate_limit)
+                UNION
+                SELECT m.id FROM modele_documente m WHERE {lexical_sql}
+            ) candidates
+            JOIN modele_documente m ON m.id = candidates.id
+            WHERE {where_sql}
+            ORDER BY relevance_score DESC
+            LIMIT :limit
+        ) r
+        ORDER BY c.case_id, r.relevance_score DESC;
+    """)
+
+    candidate_limit = limit * CANDIDATE_MULTIPLIER
+    # The index scan returns at most ef_search rows; widen it for this transaction
+    session.execute(text("SELECT set_config('hnsw.ef_search', :ef_search, true)"),
+                    {'ef_search': str(max(candidate_limit, 40))})
+    rows = session.execute(query_sql, {
+        'cases': json.dumps(records),
+        'limit': limit,
+        'candidate_limit': candidate_limit,
+        'min_embedding_score': settings_manager.get_value("ponderi_cautare_modele", "min_embedding_score", 0.5)
+    }).mappings().all()
+
+    results: Dict[int, List[Dict[str, Any]]] = {case['case_id']: [] for case in cases}
+    for row in rows:
+        results[row['case_id']].append(_model_from_row(row))
+
+    logger.info(f"Matched modele for {len(cases)} cases in one query ({len(rows)} rows)")
+    return results
+
+
+# --- Helpers ---
+
+def _match_params(case_data: Dict[str, Any]) -> Dict[str, str]:
+    """Per-case bind values of the scoring SQL (see _relevance_sql)."""
+    materie = (case_data.get('materie') or '').strip()
+    obiect = (case_data.get('obiect') or '').strip()
+    keywords = case_data.get('keywords') or []
+    text_query = case_data.get('text_query')
 
     # Build keywords regex pattern for matching
     # Keywords can be a list or a string
     if isinstance(keywords, list):
-        keywords_list = keywords
+        keywords_list = list(keywords)
     elif isinstance(keywords, str):
         keywords_list = [kw.strip() for kw in keywords.split(',') if kw.strip()]
     else:
@@ -99,12 +217,31 @@ def get_relevant_modele(
     if keywords_list:
         # Escape special regex characters and join with OR
         escaped_keywords = [re.escape(normalize_query(kw)) for kw in keywords_list[:10]]  # Limit to 10 keywords
-        keywords_regex = '|'.join(escaped_keywords)
-        params["keywords_regex"] = f"\\y({keywords_regex})\\y"
+        keywords_regex = f"\\y({'|'.join(escaped_keywords)})\\y"
     else:
-        keywords_regex = ''
-        params["keywords_regex"] = '^$'  # Pattern that never matches
+        keywords_regex = '^$'  # Pattern that never matches
 
+    return {
+        "materie": materie.lower() if materie else '',
+        "obiect": obiect.lower() if obiect else '',
+        "text_query": text_query.strip() if text_query else '',
+        # Normalize query text for trigram similarity
+        "q": normalize_query(f"{materie} {obiect} {text_query or ''}"),
+        "keywords_regex": keywords_regex
+    }
+
+
+def _relevance_sql(ref: str) -> tuple[str, str]:
+    """
+    Scoring expression and relevance filter for modele_documente rows (alias m).
+
+    Args:
+        ref: How per-case values are referenced: ':' for bind parameters
+             (":materie") or a column prefix for set-based queries ("c.materie")
+
+    Returns:
+        Tuple of (relevance score expression, WHERE condition)
+    """
     # Scoring weights
     W_EXACT_MATERIE = settings_manager.get_value("ponderi_cautare_modele", "w_exact_materie", 3.0)
     W_EXACT_OBIECT = settings_manager.get_value("ponderi_cautare_modele", "w_exact_obiect", 4.0)
@@ -112,47 +249,33 @@ def get_relevant_modele(
     W_EMBEDDING = settings_manager.get_value("ponderi_cautare_modele", "w_embedding", 1.0)
     W_TRIGRAM = settings_manager.get_value("ponderi_cautare_modele", "w_trigram", 0.5)
 
-    MIN_EMBEDDING_SCORE = settings_manager.get_value("ponderi_cautare_modele", "min_embedding_score", 0.5)
-    params["min_embedding_score"] = MIN_EMBEDDING_SCORE
-
-    # Build the query
-    # We need to check if materie and obiect fields exist and match
-    query_sql = text(f"""
-        SELECT
-            m.id,
-            m.titlu_model,
-            m.obiect_model,
-            m.materie_model,
-            m.sursa_model,
-            m.text_model,
-            m.keywords_model,
-            (
+    score_sql = f"""(
                 -- Exact materie match (case-insensitive)
                 (CASE
-                    WHEN LOWER(COALESCE(m.materie_model, '')) LIKE '%' || :materie || '%'
-                    AND :materie != ''
+                    WHEN LOWER(COALESCE(m.materie_model, '')) LIKE '%' || {ref}materie || '%'
+                    AND {ref}materie != ''
                     THEN {W_EXACT_MATERIE}
                     ELSE 0
                 END) +
 
                 -- Exact obiect match (case-insensitive)
                 (CASE
-                    WHEN LOWER(COALESCE(m.obiect_model, '')) LIKE '%' || :obiect || '%'
-                    AND :obiect != ''
+                    WHEN LOWER(COALESCE(m.obiect_model, '')) LIKE '%' || {ref}obiect || '%'
+                    AND {ref}obiect != ''
                     THEN {W_EXACT_OBIECT}
                     ELSE 0
                 END) +
 
                 -- Keywords regex match
                 (CASE
-                    WHEN COALESCE(array_to_string(m.keywords_model, ' '), '') ~* :keywords_regex
+                    WHEN COALESCE(array_to_string(m.keywords_model, ' '), '') ~* {ref}keywords_regex
                     THEN {W_KEYWORDS}
                     ELSE 0
                 END) +
 
                 -- Text Query regex match in full text (if query provided)
                 (CASE
-                     WHEN :text_query != '' AND COALESCE(m.text_model, '') ~* :keywords_regex
+                     WHEN {ref}text_query != '' AND COALESCE(m.text_model, '') ~* {ref}keywords_regex
                      THEN {W_KEYWORDS}
                      ELSE 0
                 END) +
@@ -160,7 +283,7 @@ def get_relevant_modele(
                 -- Embedding cosine similarity (1 - cosine_distance)
                 (CASE
                     WHEN m.comentariiLLM_model_embedding IS NOT NULL
-                    THEN (1.0 - (m.comentariiLLM_model_embedding <=> :embedding)) * {W_EMBEDDING}
+                    THEN (1.0 - (m.comentariiLLM_model_embedding <=> {ref}embedding)) * {W_EMBEDDING}
                     ELSE 0
                 END) +
 
@@ -169,48 +292,40 @@ def get_relevant_modele(
                     COALESCE(m.obiect_model, '') || ' ' ||
                     COALESCE(m.materie_model, '') || ' ' ||
                     COALESCE(array_to_string(m.keywords_model, ' '), ''),
-                    :q
+                    {ref}q
                 ) * {W_TRIGRAM})
-            ) AS relevance_score
-        FROM modele_documente m
-        WHERE
-            -- Only return results with some relevance
-            (
-                (LOWER(COALESCE(m.materie_model, '')) LIKE '%' || :materie || '%' AND :materie != '') OR
-                (LOWER(COALESCE(m.obiect_model, '')) LIKE '%' || :obiect || '%' AND :obiect != '') OR
-                (COALESCE(array_to_string(m.keywords_model, ' '), '') ~* :keywords_regex) OR
-                (:text_query != '' AND COALESCE(m.text_model, '') ~* :keywords_regex) OR
-                (m.comentariiLLM_model_embedding IS NOT NULL AND
-                 (1.0 - (m.comentariiLLM_model_embedding <=> :embedding)) > :min_embedding_score)
-            )
-        ORDER BY relevance_score DESC
-        LIMIT :limit;
-    """)
+            )"""
 
-    try:
-        result = session.execute(query_sql, params)
-        rows = result.mappings().all()
-
-        logger.info(f"Found {len(rows)} relevant modele")
-
-        # Process results
-        modele_list = []
-        for row in rows:
-            modele_list.append({
-                "id": row['id'],
-                "titlu_model": row['titlu_model'],
-                "obiect_model": row['obiect_model'],
-                "materie_model": row['materie_model'],
-                "sursa_model": row['sursa_model'],
-                "relevance_score": float(row['relevance_score']) if row['relevance_score'] else 0.0,
-                # Don't include full text_model in list response to save bandwidth
-            })
-
-        return modele_list
-
-    except Exception as e:
-        logger.error(f"Error finding relevant modele: {e}", exc_info=True)
-        return []
+    # Only return results with some relevance
+    where_sql = f"""(
+                {_lexical_sql(ref)} OR
+                (m.comentariiLLM_model_embedding IS NOT NULL AND
+                 (1.0 - (m.comentariiLLM_model_embedding <=> {ref}embedding)) > :min_embedding_score)
+            )"""
+
+    return score_sql, where_sql
+
+
+def _lexical_sql(ref: str) -> str:
+    """Non-embedding part of the relevance filter (alias m); see _relevance_sql."""
+    return f"""(
+                (LOWER(COALESCE(m.materie_model, '')) LIKE '%' || {ref}materie || '%' AND {ref}materie != '') OR
+                (LOWER(COALESCE(m.obiect_model, '')) LIKE '%' || {ref}obiect || '%' AND {ref}obiect != '') OR
+                (COALESCE(array_to_string(m.keywords_model, ' '), '') ~* {ref}keywords_regex) OR
+                ({ref}text_query != '' AND COALESCE(m.text_model, '') ~* {ref}keywords_regex)
+            )"""
+
+
+def _model_from_row(row) -> Dict[str, Any]:
+    return {
+        "id": row['id'],
+        "titlu_model": row['titlu_model'],
+        "obiect_model": row['obiect_model'],
+        "materie_model": row['materie_model'],
+        "sursa_model": row['sursa_model'],
+        "relevance_score": float(row['relevance_score']) if row['relevance_score'] else 0.0,
+        # Don't include full text_model in list response to save bandwidth
+    }
 
 
 def get_model_by_id(session: Session, model_id: str) -> Optional[Dict[str, Any]]:
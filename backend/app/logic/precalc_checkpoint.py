@@ -0,0 +1,249 @@
+"""
+Persisted progress of the precalculation jobs (table precalc_checkpoints).
+
+One row per job holds the current run (mode, id range, counters)
+and the bounds of the last completed run, which incremental runs start from.
+Checkpoints are written in the same transaction as the batch they describe, so
+a run stopped or killed at any point resumes exactly after its last commit.
+
+A run's id range is split into precalc_ranges rows that parallel workers claim
+with FOR UPDATE SKIP LOCKED (so no two workers get the same range), each with
+its own keyset cursor.
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlmodel import Session, text
+
+logger = logging.getLogger(__name__)
+
+# Run status values
+RUNNING = 'running'
+STOPPED = 'stopped'
+FAILED = 'failed'
+COMPLETED = 'completed'
+
+# Range status values
+PENDING = 'pending'
+CLAIMED = 'claimed'
+DONE = 'done'
+
+
+def ensure_checkpoint_table(session: Session) -> bool:
+    """Creates the precalc_checkpoints and precalc_ranges tables if needed."""
+    try:
+        session.execute(text("""
+            CREATE TABLE IF NOT EXISTS precalc_checkpoints (
+                job TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                cursor_id BIGINT NOT NULL DEFAULT 0,
+                high_water_id BIGINT NOT NULL DEFAULT 0,
+                since_id BIGINT,
+                since_at TIMESTAMP,
+                total INTEGER NOT NULL DEFAULT 0,
+                stats JSONB,
+                run_started_at TIMESTAMP,
+                checkpoint_at TIMESTAMP,
+                completed_high_water_id BIGINT,
+                completed_started_at TIMESTAMP,
+                completed_at TIMESTAMP
+            )
+        """))
+        session.execute(text("""
+            CREATE TABLE IF NOT EXISTS precalc_ranges (
+                job TEXT NOT NULL,
+                range_start BIGINT NOT NULL,
+                range_end BIGINT NOT NULL,
+                cursor_id BIGINT NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                claimed_at TIMESTAMP,
+                done_at TIMESTAMP,
+                PRIMARY KEY (job, range_start)
+            )
+        """))
+        session.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error ensuring precalc_checkpoints table: {e}", exc_info=True)
+        session.rollback()
+        return False
+
+
+def load_checkpoint(session: Session, job: str) -> Optional[Dict[str, Any]]:
+    """Returns the checkpoint row of a job, or None."""
+    row = session.execute(
+        text("SELECT * FROM precalc_checkpoints WHERE job = :job"),
+        {'job': job}
+    ).mappings().first()
+    if row is None:
+        return None
+    checkpoint = dict(row)
+    if isinstance(checkpoint.get('stats'), str):
+        checkpoint['stats'] = json.loads(checkpoint['stats'])
+    return checkpoint
+
+
+def start_run(
+    session: Session,
+    job: str,
+    mode: str,
+    high_water_id: int,
+    total: int,
+    since_id: Optional[int] = None,
+    since_at: Optional[datetime] = None
+):
+    """
+    Records a new run (keeping the last completed run's bounds). Caller commits.
+
+    run_started_at comes from the database clock (NOW()), like the updated_at values
+    the next incremental run compares it with.
+    """
+    session.execute(text("""
+        INSERT INTO precalc_checkpoints
+            (job, status, mode, cursor_id, high_water_id, since_id, since_at, total, stats,
+             run_started_at, checkpoint_at)
+        VALUES
+            (:job, :status, :mode, 0, :high_water_id, :since_id, :since_at, :total, NULL, NOW(), NOW())
+        ON CONFLICT (job) DO UPDATE SET
+            status = EXCLUDED.status,
+            mode = EXCLUDED.mode,
+            cursor_id = 0,
+            high_water_id = EXCLUDED.high_water_id,
+            since_id = EXCLUDED.since_id,
+            since_at = EXCLUDED.since_at,
+            total = EXCLUDED.total,
+            stats = NULL,
+            run_started_at = EXCLUDED.run_started_at,
+            checkpoint_at = EXCLUDED.checkpoint_at
+    """), {
+        'job': job, 'status': RUNNING, 'mode': mode, 'high_water_id': high_water_id,
+        'since_id': since_id, 'since_at': since_at, 'total': total
+    })
+
+
+def complete_run(session: Session, job: str, stats: Dict[str, Any]):
+    """Marks the current run completed: its range becomes the next incremental run's lower bound."""
+    session.execute(text("""
+        UPDATE precalc_checkpoints
+        SET status = :status,
+            stats = CAST(:stats AS jsonb),
+            cursor_id = high_water_id,
+            checkpoint_at = :now,
+            completed_high_water_id = high_water_id,
+            completed_started_at = run_started_at,
+            completed_at = :now
+        WHERE job = :job
+    """), {'job': job, 'status': COMPLETED, 'now': datetime.now(), 'stats': json.dumps(stats, default=str)})
+    session.commit()
+
+
+def save_stats(session: Session, job: str, stats: Dict[str, Any]):
+    """Updates the counters of the current run. Caller commits."""
+    session.execute(
+        text("UPDATE precalc_checkpoints SET stats = CAST(:stats AS jsonb), checkpoint_at = :now WHERE job = :job"),
+        {'job': job, 'now': datetime.now(), 'stats': json.dumps(stats, default=str)}
+    )
+
+
+def create_ranges(session: Session, job: str, ranges: List[Tuple[int, int]]):
+    """Replaces the ranges of a job with (first_id, last_id) pairs, all pending. Caller commits."""
+    session.execute(text("DELETE FROM precalc_ranges WHERE job = :job"), {'job': job})
+    if not ranges:
+        return
+    session.execute(
+        text("""
+            INSERT INTO precalc_ranges (job, range_start, range_end, cursor_id, status)
+            VALUES (:job, :range_start, :range_end, :cursor_id, :status)
+        """),
+        [
+            {'job': job, 'range_start': first, 'range_end': last, 'cursor_id': first - 1, 'status': PENDING}
+            for first, last in ranges
+        ]
+    )
+
+
+def release_claimed_ranges(session: Session, job: str) -> int:
+    """Makes ranges claimed by workers of an interrupted run claimable again (cursors kept)."""
+    released = session.execute(
+        text("UPDATE precalc_ranges SET status = :pending, worker = NULL WHERE job = :job AND status = :claimed"),
+        {'job': job, 'pending': PENDING, 'claimed': CLAIMED}
+    ).rowcount
+    session.commit()
+    return released
+
+
+def claim_range(session: Session, job: str, worker: str) -> Optional[Dict[str, Any]]:
+    """
+    Claims the next pending range for a worker (commits).
+
+    Returns:
+        {'range_start', 'range_end', 'cursor_id'} or None when no range is left
+    """
+    row = session.execute(text("""
+        UPDATE precalc_ranges
+        SET status = :claimed, worker = :worker, claimed_at = :now
+        WHERE (job, range_start) IN (
+            SELECT job, range_start
+            FROM precalc_ranges
+            WHERE job = :job AND status = :pending
+            ORDER BY range_start
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING range_start, range_end, cursor_id
+    """), {
+        'job': job, 'worker': worker, 'now': datetime.now(), 'claimed': CLAIMED, 'pending': PENDING
+    }).mappings().first()
+    session.commit()
+    return dict(row) if row else None
+
+
+def save_range_progress(session: Session, job: str, range_start: int, cursor_id: int, done: bool = False):
+    """Moves the cursor of a claimed range (marks it done at the end). Caller commits."""
+    session.execute(text("""
+        UPDATE precalc_ranges
+        SET cursor_id = :cursor_id,
+            status = CASE WHEN :done THEN :done_status ELSE status END,
+            done_at = CASE WHEN :done THEN :now ELSE done_at END
+        WHERE job = :job AND range_start = :range_start
+    """), {
+        'job': job, 'range_start': range_start, 'cursor_id': cursor_id,
+        'done': done, 'done_status': DONE, 'now': datetime.now()
+    })
+
+
+def range_counts(session: Session, job: str) -> Dict[str, int]:
+    """Number of ranges of a job per status."""
+    rows = session.execute(
+        text("SELECT status, COUNT(*) FROM precalc_ranges WHERE job = :job GROUP BY status"),
+        {'job': job}
+    ).all()
+    return {status: count for status, count in rows}
+
+
+def set_status(session: Session, job: str, status: str):
+    """Marks the current run stopped/failed (it stays resumable)."""
+    try:
+        session.execute(
+            text("UPDATE precalc_checkpoints SET status = :status, checkpoint_at = :now WHERE job = :job"),
+            {'job': job, 'status': status, 'now': datetime.now()}
+        )
+        session.commit()
+    except Exception as e:
+        logger.error(f"Error updating checkpoint status for {job}: {e}")
+        session.rollback()
+
+
+def summarize(checkpoint: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """JSON-friendly view of a checkpoint for the status endpoints."""
+    if checkpoint is None:
+        return None
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in checkpoint.items()
+        if key != 'stats'
+    }
@@ -2,20 +2,43 @@
 Service for pre-calculating and caching relevant models and legal codes for each case.
 This optimization reduces query response times by storing pre-computed matches.
 """
+import json
 import logging
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from sqlmodel import Session, select, text
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+from ..config import get_settings
 from ..db import get_session
 from ..db_modele import get_modele_session
 from ..db_coduri import get_coduri_session
-from .modele_matching import get_relevant_modele
-from .coduri_matching import get_relevant_articles
-
+from .embedding_batch import embed_texts_batch_sync
+from . import precalc_checkpoint
+from .modele_matching import get_relevant_modele, get_relevant_modele_batch
+from .coduri_matching import get_relevant_articles, get_relevant_articles_batch
+from .search_logic import case_embedding_text
+from ..settings_manager import settings_manager
+
+settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Checkpoint job name (see precalc_checkpoint)
+PRECALC_JOB = 'modele_coduri'
+
+# A worker claims RANGE_BATCHES batches of ids at a time
+RANGE_BATCHES = 10
+DEFAULT_WORKERS = 4
+
+# Row filters of the run modes (applied on top of the keyset range)
+MODE_FILTERS = {
+    'full': "TRUE",
+    'incomplete': "(b.modele_speta IS NULL OR b.coduri_speta IS NULL)",
+    'incremental': "(b.id > :since_id OR b.updated_at > :since_at)",
+}
+
 # Global state for process control
 precalc_stop_event = threading.Event()
 precalc_status_lock = threading.Lock()
@@ -34,7 +57,8 @@ precalc_status = {
 
 def ensure_columns_exist(session: Session) -> bool:
     """
-    Ensures that modele_speta and coduri_speta columns exist in the blocuri table.
+    Ensures that modele_speta, coduri_speta, updated_at and precalculated_at columns
+    exist in the blocuri table.
     Uses ALTER TABLE to add columns if they don't exist.
 
     Returns:
@@ -48,7 +72,7 @@ def ensure_columns_exist(session: Session) -> bool:
             SELECT column_name
             FROM information_schema.columns
             WHERE table_name = 'blocuri'
-            AND column_name IN ('modele_speta', 'coduri_speta')
+            AND column_name IN ('modele_speta', 'coduri_speta', 'updated_at', 'precalculated_at')
         """)
 
         result = session.execute(check_query)
@@ -61,6 +85,8 @@ def ensure_columns_exist(session: Session) -> bool:
             columns_to_add.append('coduri_speta')
         if 'updated_at' not in existing_columns:
             columns_to_add.append('updated_at')
+        if 'precalculated_at' not in existing_columns:
+            columns_to_add.append('precalculated_at')
 
         if not columns_to_add:
             logger.info("Pre-calculation columns already exist")
@@ -74,6 +100,11 @@ def ensure_columns_exist(session: Session) -> bool:
                     ALTER TABLE blocuri
                     ADD COLUMN IF NOT EXISTS {column_name} TIMESTAMP DEFAULT NOW()
                 """)
+            elif column_name == 'precalculated_at':
+                alter_query = text(f"""
+                    ALTER TABLE blocuri
+                    ADD COLUMN IF NOT EXISTS {column_name} TIMESTAMP
+                """)
             else:
                 alter_query = text(f"""
                     ALTER TABLE blocuri
@@ -91,6 +122,50 @@ def ensure_columns_exist(session: Session) -> bool:
         return False
 
 
+def ensure_incremental_support(session: Session) -> bool:
+    """
+    Prepares blocuri for keyset-paged and incremental runs:
+    - a trigger keeping updated_at current when a case's obj changes
+      (precalculation itself only sets precalculated_at)
+    - indexes on updated_at and on the ids of cases still missing results
+    - the precalc_checkpoints table
+
+    Returns:
+        True if everything exists or was created, False otherwise
+    """
+    try:
+        session.execute(text("""
+            CREATE OR REPLACE FUNCTION blocuri_touch_updated_at() RETURNS trigger AS $$
+            BEGIN
+                NEW.updated_at := NOW();
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql
+        """))
+        trigger_exists = session.execute(text("""
+            SELECT 1 FROM pg_trigger WHERE tgname = 'trg_blocuri_touch_updated_at'
+        """)).first()
+        if not trigger_exists:
+            logger.info("Creating updated_at trigger on blocuri...")
+            session.execute(text("""
+                CREATE TRIGGER trg_blocuri_touch_updated_at
+                BEFORE UPDATE OF obj ON blocuri
+                FOR EACH ROW EXECUTE FUNCTION blocuri_touch_updated_at()
+            """))
+        session.execute(text("CREATE INDEX IF NOT EXISTS idx_blocuri_updated_at ON blocuri (updated_at)"))
+        session.execute(text("""
+            CREATE INDEX IF NOT EXISTS idx_blocuri_precalc_incomplete ON blocuri (id)
+            WHERE modele_speta IS NULL OR coduri_speta IS NULL
+        """))
+        session.commit()
+    except Exception as e:
+        logger.error(f"Error ensuring incremental precalculation support: {e}", exc_info=True)
+        session.rollback()
+        return False
+
+    return precalc_checkpoint.ensure_checkpoint_table(session)
+
+
 def extract_case_metadata(obj_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Extracts relevant metadata from a case's obj JSONB field for matching.
@@ -125,13 +200,67 @@ def extract_case_metadata(obj_data: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def parse_stored_vector(raw: Any) -> Optional[List[float]]:
+    """
+    Parses a vectori.embedding value (pgvector text form '[x, y, ...]').
+
+    Returns None for missing, wrongly sized or all-zero vectors (the placeholders
+    index maintenance inserts for cases without text).
+    """
+    if raw is None:
+        return None
+    try:
+        vector = json.loads(raw) if isinstance(raw, str) else [float(x) for x in raw]
+    except (TypeError, ValueError):
+        return None
+    if len(vector) != settings.VECTOR_DIM or not any(vector):
+        return None
+    return vector
+
+
+def resolve_case_embeddings(rows: List[Dict[str, Any]]) -> tuple[Dict[int, List[float]], int, int]:
+    """
+    One embedding per case of a batch: the stored vectori.embedding when usable,
+    otherwise a single batched Ollama call for all the cases without one.
+
+    Args:
+        rows: Batch rows with 'id', 'obj' and 'embedding' (the stored vector text, or None)
+
+    Returns:
+        Tuple of ({case_id: embedding}, stored vectors reused, cases embedded now)
+    """
+    embeddings: Dict[int, List[float]] = {}
+    missing_ids: List[int] = []
+    missing_texts: List[str] = []
+    reused = 0
+
+    for row in rows:
+        vector = parse_stored_vector(row.get('embedding'))
+        if vector is not None:
+            embeddings[row['id']] = vector
+            reused += 1
+            continue
+        embedding_text = case_embedding_text(extract_case_metadata(row['obj'] or {}))
+        if embedding_text:
+            missing_ids.append(row['id'])
+            missing_texts.append(embedding_text)
+
+    if missing_texts:
+        for case_id, vector in zip(missing_ids, embed_texts_batch_sync(missing_texts)):
+            if any(vector):
+                embeddings[case_id] = vector
+
+    return embeddings, reused, len(missing_texts)
+
+
 def precalculate_for_single_case(
     case_id: int,
     obj_data: Dict[str, Any],
     modele_session: Session,
     coduri_session: Session,
     limit_modele: int = 5,
-    limit_coduri: int = 5
+    limit_coduri: int = 5,
+    embedding: Optional[List[float]] = None
 ) -> tuple[Optional[List[Dict]], Optional[List[Dict]]]:
     """
     Pre-calculates relevant models and codes for a single case.
@@ -143,6 +272,7 @@ def precalculate_for_single_case(
         coduri_session: Database session for coduri
         limit_modele: Maximum number of models to store
         limit_coduri: Maximum number of codes to store
+        embedding: Case embedding shared by both matchers (each embeds the case itself if None)
 
     Returns:
         Tuple of (modele_list, coduri_list)
@@ -159,41 +289,179 @@ def precalculate_for_single_case(
 
     # Get relevant models
     try:
-        modele_results = get_relevant_modele(modele_session, case_metadata, limit=limit_modele)
-        if modele_results:
-            # Store only essential fields to save space
-            modele_results = [
-                {
-                    'id': m['id'],
-                    'titlu_model': m.get('titlu_model'),
-                    'relevance_score': m.get('relevance_score', 0.0)
-                }
-                for m in modele_results
-            ]
+        modele_results = _essential_modele(
+            get_relevant_modele(modele_session, case_metadata, limit=limit_modele, embedding=embedding)
+        )
     except Exception as e:
         logger.error(f"Error getting models for case {case_id}: {e}", exc_info=True)
 
     # Get relevant codes
     try:
-        coduri_results = get_relevant_articles(coduri_session, case_metadata, limit=limit_coduri)
-        if coduri_results:
-            # Store only essential fields
-            coduri_results = [
-                {
-                    'id': c['id'],
-                    'numar': c.get('numar'),
-                    'titlu': c.get('titlu'),
-                    'cod_sursa': c.get('cod_sursa'),
-                    'relevance_score': c.get('relevance_score', 0.0)
-                }
-                for c in coduri_results
-            ]
+        coduri_results = _essential_coduri(
+            get_relevant_articles(coduri_session, case_metadata, limit=limit_coduri, embedding=embedding)
+        )
     except Exception as e:
         logger.error(f"Error getting codes for case {case_id}: {e}", exc_info=True)
 
     return modele_results, coduri_results
 
 
+def precalculate_batch(
+    rows: List[Dict[str, Any]],
+    modele_session: Session,
+    coduri_session: Session,
+    limit_modele: int,
+    limit_coduri: int,
+    stats: Dict[str, Any]
+) -> List[tuple]:
+    """
+    Pre-calculates models and codes for a batch of cases.
+
+    Cases with an embedding and some metadata are matched set-based, with one
+    query per database for the whole batch (get_relevant_modele_batch /
+    get_relevant_articles_batch). The rest, or the whole batch if a set-based
+    query fails, go through precalculate_for_single_case.
+
+    Args:
+        rows: Batch rows with 'id', 'obj' and 'embedding' (stored vector text, or None)
+        stats: Run statistics, updated in place (embeddings, skipped, errors, stopped)
+
+    Returns:
+        List of (case_id, modele_list, coduri_list) to write
+    """
+    # One embedding per case, shared by the models and codes matchers
+    try:
+        case_embeddings, reused, embedded = resolve_case_embeddings(rows)
+    except Exception as e:
+        logger.error(f"Error resolving embeddings for batch: {e}", exc_info=True)
+        case_embeddings, reused, embedded = {}, 0, 0
+    stats['stored_vectors'] += reused
+    stats['embedded'] += embedded
+
+    updates = []
+    remaining = rows
+
+    batch_cases = []
+    for row in rows:
+        case_metadata = extract_case_metadata(row['obj'] or {})
+        if row['id'] in case_embeddings and (case_metadata.get('materie') or case_metadata.get('obiect')):
+            batch_cases.append({
+                'case_id': row['id'],
+                'case_data': case_metadata,
+                'embedding': case_embeddings[row['id']]
+            })
+
+    if batch_cases:
+        try:
+            modele_by_case = get_relevant_modele_batch(modele_session, batch_cases, limit=limit_modele)
+            coduri_by_case = get_relevant_articles_batch(coduri_session, batch_cases, limit=limit_coduri)
+        except Exception as e:
+            logger.error(f"Set-based matching failed, falling back to per-case matching: {e}", exc_info=True)
+            modele_session.rollback()
+            coduri_session.rollback()
+        else:
+            for case in batch_cases:
+                case_id = case['case_id']
+                updates.append((
+                    case_id,
+                    _essential_modele(modele_by_case.get(case_id)),
+                    _essential_coduri(coduri_by_case.get(case_id))
+                ))
+            matched_ids = {case['case_id'] for case in batch_cases}
+            remaining = [row for row in rows if row['id'] not in matched_ids]
+
+    # Process the remaining cases one by one
+    for row in remaining:
+        # Check for stop signal at the start of each case
+        if precalc_stop_event.is_set():
+            logger.warning("Stop signal detected during case processing")
+            stats['stopped'] = True
+            break
+
+        case_id = row['id']
+        try:
+            modele_results, coduri_results = precalculate_for_single_case(
+                case_id,
+                row['obj'],
+                modele_session,
+                coduri_session,
+                limit_modele,
+                limit_coduri,
+                embedding=case_embeddings.get(case_id)
+            )
+        except Exception as e:
+            logger.error(f"Error processing case {case_id}: {e}", exc_info=True)
+            stats['errors'] += 1
+            continue
+
+        if modele_results is None and coduri_results is None:
+            stats['skipped'] += 1
+            continue
+        updates.append((case_id, modele_results, coduri_results))
+
+    return updates
+
+
+def write_precalculated_batch(main_session: Session, updates: List[tuple]) -> int:
+    """
+    Stores (case_id, modele_list, coduri_list) results with a single
+    UPDATE ... FROM (VALUES ...). Empty lists are stored as NULL.
+
+    Returns:
+        Number of cases written
+    """
+    if not updates:
+        return 0
+
+    values_sql = []
+    params: Dict[str, Any] = {'precalculated_at': datetime.now()}
+    for i, (case_id, modele_results, coduri_results) in enumerate(updates):
+        values_sql.append(f"(:id_{i}, CAST(:modele_{i} AS jsonb), CAST(:coduri_{i} AS jsonb))")
+        params[f'id_{i}'] = case_id
+        params[f'modele_{i}'] = json.dumps(modele_results) if modele_results else None
+        params[f'coduri_{i}'] = json.dumps(coduri_results) if coduri_results else None
+
+    main_session.execute(text(f"""
+        UPDATE blocuri b
+        SET modele_speta = v.modele,
+            coduri_speta = v.coduri,
+            precalculated_at = :precalculated_at
+        FROM (VALUES {', '.join(values_sql)}) AS v(id, modele, coduri)
+        WHERE b.id = v.id
+    """), params)
+    return len(updates)
+
+
+def _essential_modele(modele_results: Optional[List[Dict]]) -> Optional[List[Dict]]:
+    """Store only essential fields to save space."""
+    if not modele_results:
+        return modele_results
+    return [
+        {
+            'id': m['id'],
+            'titlu_model': m.get('titlu_model'),
+            'relevance_score': m.get('relevance_score', 0.0)
+        }
+        for m in modele_results
+    ]
+
+
+def _essential_coduri(coduri_results: Optional[List[Dict]]) -> Optional[List[Dict]]:
+    """Store only essential fields."""
+    if not coduri_results:
+        return coduri_results
+    return [
+        {
+            'id': c['id'],
+            'numar': c.get('numar'),
+            'titlu': c.get('titlu'),
+            'cod_sursa': c.get('cod_sursa'),
+            'relevance_score': c.get('relevance_score', 0.0)
+        }
+        for c in coduri_results
+    ]
+
+
 def get_precalculation_status(main_session: Session) -> Dict[str, Any]:
     """
     Get the current status of the precalculation process.
@@ -225,9 +493,20 @@ def get_precalculation_status(main_session: Session) -> Dict[str, Any]:
             status_copy['incomplete_count'] = incomplete_count
         except Exception as e:
             logger.error(f"Error checking incomplete cases: {e}")
+            main_session.rollback()
             status_copy['can_resume'] = False
             status_copy['incomplete_count'] = 0
 
+    # Persisted run state: an unfinished run is resumed from its cursor
+    try:
+        checkpoint = precalc_checkpoint.load_checkpoint(main_session, PRECALC_JOB)
+    except Exception:
+        main_session.rollback()
+        checkpoint = None
+    status_copy['checkpoint'] = precalc_checkpoint.summarize(checkpoint)
+    if checkpoint and checkpoint['status'] != precalc_checkpoint.COMPLETED and not status_copy['is_running']:
+        status_copy['can_resume'] = True
+
     return status_copy
 
 
@@ -255,6 +534,25 @@ def stop_precalculation() -> Dict[str, Any]:
     }
 
 
+def resolve_worker_count(requested: Optional[int], *sessions: Session) -> int:
+    """
+    Number of parallel precalculation workers: the requested (or configured) count,
+    bounded so that workers leave at least one pooled connection of each database
+    free for the API.
+    """
+    if requested is None:
+        requested = int(settings_manager.get_value('setari_generale', 'precalc_workers', DEFAULT_WORKERS))
+    workers = max(1, requested)
+    for session in sessions:
+        pool = session.get_bind().pool
+        pool_size = pool.size() if hasattr(pool, 'size') else None
+        if pool_size:
+            workers = min(workers, max(1, pool_size - 1))
+    if workers < requested:
+        logger.warning(f"Precalculation workers limited to {workers} (requested {requested}) by the DB pool size")
+    return workers
+
+
 def precalculate_models_and_codes(
     main_session: Session,
     modele_session: Session,
@@ -262,11 +560,19 @@ def precalculate_models_and_codes(
     batch_size: int = 100,
     limit_modele: int = 5,
     limit_coduri: int = 5,
-    restart_from_zero: bool = False
+    restart_from_zero: bool = False,
+    incremental: bool = False,
+    workers: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Main function to pre-calculate and store models and codes for all cases.
 
+    The id range of a run (up to the max id seen when it started) is split into
+    ranges of RANGE_BATCHES batches, which `workers` threads claim with
+    FOR UPDATE SKIP LOCKED and process in id order by keyset (id > cursor), each
+    with its own sessions. Range cursors are checkpointed with every committed
+    batch, so a stopped or interrupted run resumes where it left off.
+
     Args:
         main_session: Database session for main database (blocuri)
         modele_session: Database session for modele_documente
@@ -274,15 +580,19 @@ def precalculate_models_and_codes(
         batch_size: Number of cases to process before committing
         limit_modele: Maximum models to store per case
         limit_coduri: Maximum codes to store per case
-        restart_from_zero: If True, reset all precalculated data and start from scratch.
-                          If False, only process cases with incomplete data.
+        restart_from_zero: If True, start a new run over all cases, overwriting existing data.
+                          If False, resume the unfinished run if any, else process cases with incomplete data.
+        incremental: Process only cases added (id above the last completed run's range) or
+                     changed (updated_at after that run started) since the last completed run.
+                     An unfinished run is resumed first.
+        workers: Parallel workers (default: setari_generale.precalc_workers), bounded by the DB pools
 
     Returns:
         Statistics dictionary with processing results
     """
     start_time = datetime.now()
     logger.info("=" * 80)
-    logger.info(f"Starting pre-calculation (restart_from_zero={restart_from_zero})")
+    logger.info(f"Starting pre-calculation (restart_from_zero={restart_from_zero}, incremental={incremental})")
     logger.info("=" * 80)
 
     # Clear stop event and set running status
@@ -296,8 +606,8 @@ def precalculate_models_and_codes(
             'with_coduri': 0
         }
 
-    # Ensure columns exist
-    if not ensure_columns_exist(main_session):
+    # Ensure columns, indexes and the checkpoint tables exist
+    if not ensure_columns_exist(main_session) or not ensure_incremental_support(main_session):
         with precalc_status_lock:
             precalc_status['is_running'] = False
         return {
@@ -306,11 +616,6 @@ def precalculate_models_and_codes(
             'processed': 0
         }
 
-    # Note: When restart_from_zero=True, we process all cases and overwrite existing data
-    # No need to explicitly reset - the UPDATE will handle it
-    if restart_from_zero:
-        logger.info("Restart mode: Will process ALL cases and overwrite existing data")
-
     stats = {
         'total_cases': 0,
         'processed': 0,
@@ -318,158 +623,80 @@ def precalculate_models_and_codes(
         'with_coduri': 0,
         'errors': 0,
         'skipped': 0,
+        'stored_vectors': 0,
+        'embedded': 0,
         'stopped': False
     }
 
     try:
-        # Build query based on restart mode
-        if restart_from_zero:
-            count_query = text("SELECT COUNT(*) FROM blocuri")
-            logger.info("Processing ALL cases (restart from zero)")
-        else:
-            count_query = text("""
-                SELECT COUNT(*) FROM blocuri
-                WHERE modele_speta IS NULL OR coduri_speta IS NULL
-            """)
-            logger.info("Processing only INCOMPLETE cases (resume mode)")
-
-        total_cases = main_session.execute(count_query).scalar()
-        stats['total_cases'] = total_cases
-
-        # Update status with total
-        with precalc_status_lock:
-            precalc_status['current_progress']['total'] = total_cases
-
-        logger.info(f"Total cases to process: {total_cases}")
-
-        # Process in batches
-        offset = 0
-
-        while True:
-            # Check for stop signal
-            if precalc_stop_event.is_set():
-                logger.warning("Stop signal received. Stopping precalculation...")
-                stats['stopped'] = True
-                break
-
-            # Fetch batch of cases
-            if restart_from_zero:
-                query = text("""
-                    SELECT id, obj
-                    FROM blocuri
-                    ORDER BY id
-                    LIMIT :batch_size OFFSET :offset
-                """)
-            else:
-                query = text("""
-                    SELECT id, obj
-                    FROM blocuri
-                    WHERE modele_speta IS NULL OR coduri_speta IS NULL
-                    ORDER BY id
-                    LIMIT :batch_size OFFSET :offset
-                """)
-
-            result = main_session.execute(
-                query,
-                {'batch_size': batch_size, 'offset': offset}
-            )
-            rows = result.mappings().all()
+        checkpoint = _begin_run(main_session, restart_from_zero, incremental, stats)
+        mode = checkpoint['mode']
+        total_cases = stats['total_cases']
+        range_total = _prepare_ranges(main_session, checkpoint, batch_size)
+        worker_count = resolve_worker_count(workers, main_session, modele_session, coduri_session)
+
+        run = {
+            'mode': mode,
+            'checkpoint': checkpoint,
+            'stats': stats,
+            'stats_lock': threading.Lock(),
+            'processed_at_start': stats['processed'],
+            'started': time.monotonic(),
+            'batch_size': batch_size,
+            'limit_modele': limit_modele,
+            'limit_coduri': limit_coduri,
+            'ranges_total': range_total,
+            'ranges_done': precalc_checkpoint.range_counts(main_session, PRECALC_JOB).get(precalc_checkpoint.DONE, 0),
+            'workers_active': worker_count,
+            'binds': (main_session.get_bind(), modele_session.get_bind(), coduri_session.get_bind())
+        }
 
-            if not rows:
-                break  # No more cases to process
+        # Release the coordinator's snapshot while the workers run
+        main_session.commit()
 
-            logger.info(f"Processing batch: cases {offset + 1} to {offset + len(rows)}")
+        logger.info(
+            f"Mode: {mode}, ids up to {checkpoint['high_water_id']}, {range_total} ranges, "
+            f"{worker_count} workers, total cases to process: {total_cases}"
+        )
+        _publish_progress(run)
 
-            # Process each case in batch
-            for row in rows:
-                # Check for stop signal at the start of each case
-                if precalc_stop_event.is_set():
-                    logger.warning("Stop signal detected during case processing")
-                    stats['stopped'] = True
-                    break
+        with ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix='precalc') as executor:
+            futures = [executor.submit(_precalc_worker, f"w{i + 1}", run) for i in range(worker_count)]
+            for future in futures:
+                future.result()
 
-                case_id = row['id']
-                obj_data = row['obj']
-
-                try:
-                    modele_results, coduri_results = precalculate_for_single_case(
-                        case_id,
-                        obj_data,
-                        modele_session,
-                        coduri_session,
-                        limit_modele,
-                        limit_coduri
-                    )
-
-                    if modele_results is None and coduri_results is None:
-                        stats['skipped'] += 1
-                        continue
-
-                    # Update the case with pre-calculated data
-                    import json
-                    update_query = text("""
-                        UPDATE blocuri
-                        SET modele_speta = CAST(:modele AS jsonb),
-                            coduri_speta = CAST(:coduri AS jsonb),
-                            updated_at = :updated_at
-                        WHERE id = :case_id
-                    """)
-
-                    main_session.execute(update_query, {
-                        'case_id': case_id,
-                        'modele': json.dumps(modele_results) if modele_results else None,
-                        'coduri': json.dumps(coduri_results) if coduri_results else None,
-                        'updated_at': datetime.now()
-                    })
-
-                    stats['processed'] += 1
-                    if modele_results:
-                        stats['with_modele'] += 1
-                    if coduri_results:
-                        stats['with_coduri'] += 1
-
-                except Exception as e:
-                    logger.error(f"Error processing case {case_id}: {e}", exc_info=True)
-                    stats['errors'] += 1
-                    main_session.rollback()
-                    continue
-
-            # Check if we should stop after processing this batch
-            if stats.get('stopped'):
-                logger.info("Stopping after current batch as requested")
-                break
-
-            # Commit batch
-            main_session.commit()
-            logger.info(f"Committed batch. Progress: {stats['processed']}/{total_cases}")
-
-            # Update status after each batch
-            with precalc_status_lock:
-                precalc_status['current_progress']['processed'] = stats['processed']
-                precalc_status['current_progress']['with_modele'] = stats['with_modele']
-                precalc_status['current_progress']['with_coduri'] = stats['with_coduri']
-
-            offset += batch_size
+        counts = precalc_checkpoint.range_counts(main_session, PRECALC_JOB)
+        unfinished = counts.get(precalc_checkpoint.PENDING, 0) + counts.get(precalc_checkpoint.CLAIMED, 0)
+        stats['stopped'] = stats['stopped'] or precalc_stop_event.is_set()
 
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
 
         logger.info("=" * 80)
         if stats['stopped']:
-            logger.info("Pre-calculation STOPPED by user")
+            precalc_checkpoint.set_status(main_session, PRECALC_JOB, precalc_checkpoint.STOPPED)
+            logger.info(f"Pre-calculation STOPPED by user ({unfinished} ranges left, resumable)")
+        elif unfinished:
+            precalc_checkpoint.set_status(main_session, PRECALC_JOB, precalc_checkpoint.FAILED)
+            logger.warning(f"Pre-calculation ended with {unfinished} unfinished ranges (worker errors, resumable)")
         else:
+            precalc_checkpoint.complete_run(main_session, PRECALC_JOB, stats)
             logger.info("Pre-calculation completed successfully")
         logger.info(f"Total cases: {stats['total_cases']}")
         logger.info(f"Processed: {stats['processed']}")
         logger.info(f"With models: {stats['with_modele']}")
         logger.info(f"With codes: {stats['with_coduri']}")
         logger.info(f"Skipped: {stats['skipped']}")
+        logger.info(f"Stored vectors reused: {stats['stored_vectors']}, embedded now: {stats['embedded']}")
         logger.info(f"Errors: {stats['errors']}")
         logger.info(f"Duration: {duration:.2f} seconds")
         logger.info("=" * 80)
 
-        stats['success'] = True
+        stats['success'] = not unfinished or stats['stopped']
         stats['duration_seconds'] = duration
+        stats['mode'] = mode
+        stats['workers'] = worker_count
+        stats['unfinished_ranges'] = unfinished
 
         # Update final status
         with precalc_status_lock:
@@ -481,6 +708,7 @@ def precalculate_models_and_codes(
     except Exception as e:
         logger.error(f"Fatal error in pre-calculation: {e}", exc_info=True)
         main_session.rollback()
+        precalc_checkpoint.set_status(main_session, PRECALC_JOB, precalc_checkpoint.FAILED)
 
         # Update status on error
         with precalc_status_lock:
@@ -497,3 +725,254 @@ def precalculate_models_and_codes(
             'error': str(e),
             **stats
         }
+
+
+def _begin_run(main_session: Session, restart_from_zero: bool, incremental: bool, stats: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resumes the unfinished run or records a new one, and loads its counters into `stats`.
+
+    Returns:
+        The checkpoint of the run (mode, cursor_id, high_water_id, since_id, since_at)
+    """
+    checkpoint = precalc_checkpoint.load_checkpoint(main_session, PRECALC_JOB)
+
+    if (not restart_from_zero and checkpoint
+            and checkpoint['status'] != precalc_checkpoint.COMPLETED
+            and checkpoint['mode'] in MODE_FILTERS):
+        logger.info(f"Resuming {checkpoint['mode']} run started at {checkpoint['run_started_at']}")
+        for key, value in (checkpoint.get('stats') or {}).items():
+            if key in stats and key != 'stopped':
+                stats[key] = value
+        stats['total_cases'] = checkpoint['total']
+        stats['resumed'] = True
+        checkpoint['resumed'] = True
+        return checkpoint
+
+    high_water_id = main_session.execute(text("SELECT COALESCE(MAX(id), 0) FROM blocuri")).scalar()
+    since_id, since_at = None, None
+
+    # Note: When restart_from_zero=True, we process all cases and overwrite existing data
+    # No need to explicitly reset - the UPDATE will handle it
+    if restart_from_zero:
+        mode = 'full'
+        logger.info("Restart mode: Will process ALL cases and overwrite existing data")
+    elif incremental and checkpoint and checkpoint.get('completed_started_at') is not None:
+        mode = 'incremental'
+        since_id, since_at = checkpoint['completed_high_water_id'], checkpoint['completed_started_at']
+        logger.info(f"Incremental mode: cases added after id {since_id} or changed since {since_at}")
+    else:
+        mode = 'incomplete'
+        if incremental:
+            logger.info("No completed run to continue from; processing INCOMPLETE cases instead")
+        logger.info("Processing only INCOMPLETE cases (resume mode)")
+
+    count_query = text(f"SELECT COUNT(*) FROM blocuri b WHERE b.id <= :high_water_id AND {MODE_FILTERS[mode]}")
+    total_cases = main_session.execute(count_query, {
+        'high_water_id': high_water_id, 'since_id': since_id, 'since_at': since_at
+    }).scalar()
+    stats['total_cases'] = total_cases
+
+    precalc_checkpoint.start_run(
+        main_session, PRECALC_JOB, mode, high_water_id, total_cases,
+        since_id=since_id, since_at=since_at
+    )
+    main_session.commit()
+    checkpoint = precalc_checkpoint.load_checkpoint(main_session, PRECALC_JOB)
+    checkpoint['resumed'] = False
+    return checkpoint
+
+
+def _prepare_ranges(main_session: Session, checkpoint: Dict[str, Any], batch_size: int) -> int:
+    """
+    Splits a new run's matching ids into ranges of RANGE_BATCHES batches, or, for
+    a resumed run, releases the ranges its workers had claimed.
+
+    Returns:
+        Number of ranges of the run
+    """
+    if checkpoint['resumed']:
+        counts = precalc_checkpoint.range_counts(main_session, PRECALC_JOB)
+        if counts:
+            released = precalc_checkpoint.release_claimed_ranges(main_session, PRECALC_JOB)
+            logger.info(f"Resuming ranges: {counts} ({released} released from interrupted workers)")
+            return sum(counts.values())
+
+    rows = main_session.execute(text(f"""
+        SELECT MIN(id) AS first_id, MAX(id) AS last_id
+        FROM (
+            SELECT b.id, (ROW_NUMBER() OVER (ORDER BY b.id) - 1) / :range_size AS bucket
+            FROM blocuri b
+            WHERE b.id > :cursor_id AND b.id <= :high_water_id
+              AND {MODE_FILTERS[checkpoint['mode']]}
+        ) numbered
+        GROUP BY bucket
+        ORDER BY bucket
+    """), {
+        'range_size': batch_size * RANGE_BATCHES,
+        'cursor_id': checkpoint['cursor_id'],
+        'high_water_id': checkpoint['high_water_id'],
+        'since_id': checkpoint['since_id'],
+        'since_at': checkpoint['since_at']
+    }).all()
+
+    precalc_checkpoint.create_ranges(main_session, PRECALC_JOB, [(first, last) for first, last in rows])
+    main_session.commit()
+    return len(rows)
+
+
+def _precalc_worker(worker: str, run: Dict[str, Any]):
+    """Claims ranges and processes them batch by batch until none is left or a stop is requested."""
+    main_bind, modele_bind, coduri_bind = run['binds']
+    checkpoint = run['checkpoint']
+    query = text(f"""
+        SELECT b.id, b.obj, v.embedding
+        FROM blocuri b
+        LEFT JOIN LATERAL (
+            SELECT embedding::text AS embedding FROM vectori WHERE speta_id = b.id LIMIT 1
+        ) v ON TRUE
+        WHERE b.id > :cursor_id AND b.id <= :range_end
+          AND {MODE_FILTERS[run['mode']]}
+        ORDER BY b.id
+        LIMIT :batch_size
+    """)
+
+    try:
+        with Session(main_bind) as main_session, \
+             Session(modele_bind) as modele_session, \
+             Session(coduri_bind) as coduri_session:
+
+            while not precalc_stop_event.is_set():
+                claimed = precalc_checkpoint.claim_range(main_session, PRECALC_JOB, worker)
+                if claimed is None:
+                    break
+                cursor_id, range_end = claimed['cursor_id'], claimed['range_end']
+                range_finished = False
+                logger.info(f"[PRECALC {worker}] Claimed ids {claimed['range_start']}-{range_end}")
+
+                while True:
+                    # Check for stop signal
+                    if precalc_stop_event.is_set():
+                        break
+
+                    rows = main_session.execute(query, {
+                        'cursor_id': cursor_id,
+                        'range_end': range_end,
+                        'since_id': checkpoint['since_id'],
+                        'since_at': checkpoint['since_at'],
+                        'batch_size': run['batch_size']
+                    }).mappings().all()
+
+                    batch_stats = {'errors': 0, 'skipped': 0, 'stored_vectors': 0, 'embedded': 0, 'stopped': False}
+                    updates = precalculate_batch(
+                        rows, modele_session, coduri_session,
+                        run['limit_modele'], run['limit_coduri'], batch_stats
+                    ) if rows else []
+
+                    # A batch cut short by a stop signal is redone on resume (its writes are idempotent)
+                    next_cursor = cursor_id if batch_stats['stopped'] or not rows else rows[-1]['id']
+                    range_done = not rows or (len(rows) < run['batch_size'] and not batch_stats['stopped'])
+
+                    # Write the whole batch, its checkpoint and the run counters in one transaction
+                    try:
+                        write_precalculated_batch(main_session, updates)
+                        precalc_checkpoint.save_range_progress(
+                            main_session, PRECALC_JOB, claimed['range_start'], next_cursor, done=range_done
+                        )
+                        _commit_batch(run, main_session, updates, batch_stats)
+                    except Exception as e:
+                        # The cursor stays before the batch and the range stays claimed, so the
+                        # run ends FAILED and a resume redoes the batch instead of skipping it
+                        logger.error(f"[PRECALC {worker}] Error writing batch results, leaving range: {e}", exc_info=True)
+                        main_session.rollback()
+                        batch_stats['errors'] += len(updates)
+                        _merge_batch(run, [], batch_stats)
+                        break
+                    range_finished = range_done
+                    cursor_id = next_cursor
+                    _publish_progress(run)
+                    if updates:
+                        logger.info(
+                            f"[PRECALC {worker}] Committed {len(updates)} cases (cursor {next_cursor}). "
+                            f"Progress: {run['stats']['processed']}/{run['stats']['total_cases']}"
+                        )
+
+                    if range_done or batch_stats['stopped']:
+                        break
+
+                if range_finished:
+                    with run['stats_lock']:
+                        run['ranges_done'] += 1
+                    _publish_progress(run)
+
+    except Exception as e:
+        logger.error(f"[PRECALC {worker}] Worker failed: {e}", exc_info=True)
+        with run['stats_lock']:
+            run['stats']['errors'] += 1
+    finally:
+        with run['stats_lock']:
+            run['workers_active'] -= 1
+        _publish_progress(run)
+
+
+def _count_batch(stats: Dict[str, Any], updates: List[tuple], batch_stats: Dict[str, Any]):
+    """Adds a batch's results and counters to `stats`."""
+    for key in ('errors', 'skipped', 'stored_vectors', 'embedded'):
+        stats[key] += batch_stats[key]
+    stats['processed'] += len(updates)
+    stats['with_modele'] += sum(1 for _, modele, _ in updates if modele)
+    stats['with_coduri'] += sum(1 for _, _, coduri in updates if coduri)
+    if batch_stats['stopped']:
+        stats['stopped'] = True
+
+
+def _commit_batch(run: Dict[str, Any], session: Session, updates: List[tuple], batch_stats: Dict[str, Any]):
+    """
+    Persists the run counters with a worker's batch and commits it.
+
+    Counting, saving and committing under stats_lock keeps the persisted counters
+    equal to the sum of all committed batches; the in-memory counters only take
+    the batch once its commit succeeded.
+    """
+    with run['stats_lock']:
+        merged = dict(run['stats'])
+        _count_batch(merged, updates, batch_stats)
+        if updates:
+            precalc_checkpoint.save_stats(session, PRECALC_JOB, merged)
+        session.commit()
+        run['stats'].update(merged)
+
+
+def _merge_batch(run: Dict[str, Any], updates: List[tuple], batch_stats: Dict[str, Any]):
+    """Adds a worker's committed batch to the run counters and publishes the progress."""
+    with run['stats_lock']:
+        _count_batch(run['stats'], updates, batch_stats)
+    _publish_progress(run)
+
+
+def _publish_progress(run: Dict[str, Any]):
+    """Copies the run counters, throughput and ETA to precalc_status for the status endpoint."""
+    with run['stats_lock']:
+        stats = dict(run['stats'])
+        ranges_done, workers_active = run['ranges_done'], run['workers_active']
+
+    elapsed = time.monotonic() - run['started']
+    processed_now = stats['processed'] - run['processed_at_start']
+    throughput = processed_now / elapsed if elapsed > 0 else 0.0
+    remaining = max(stats['total_cases'] - stats['processed'] - stats['skipped'], 0)
+
+    with precalc_status_lock:
+        precalc_status['current_progress'] = {
+            'processed': stats['processed'],
+            'total': stats['total_cases'],
+            'with_modele': stats['with_modele'],
+            'with_coduri': stats['with_coduri'],
+            'skipped': stats['skipped'],
+            'errors': stats['errors'],
+            'mode': run['mode'],
+            'workers_active': workers_active,
+            'ranges_done': ranges_done,
+            'ranges_total': run['ranges_total'],
+            'elapsed_seconds': round(elapsed, 1),
+            'throughput_per_second': round(throughput, 2),
+            'eta_seconds': round(remaining / throughput) if throughput > 0 else None
+        }
@@ -7,8 +7,9 @@ to prevent server overload when multiple users make simultaneous requests.
 Features:
 - FIFO queue processing
 - Real-time position tracking
-- SSE event broadcasting
+- SSE event broadcasting through a shared, non-blocking EventHub
 - Configurable queue size and timeout
+- Finished results kept in a bounded, expiring ResultStore
 """
 
 import asyncio
@@ -20,9 +21,17 @@ from dataclasses import dataclass, field
 
 # Import TaskQueueManager and TaskExecutor to integrate
 from ..lib.analyzer.task_queue_manager import TaskQueueManager
+from ..lib.analyzer.llm_cache import get_llm_cache
+from ..lib.analyzer.sql_guard import get_sql_guard
+from ..lib.analyzer.analysis_cache import get_analysis_cache
+from ..lib.analyzer.prompt_compactor import compact_case_cache
+from ..lib.python_executor import get_executor_pool
+from .single_flight import embedding_flight, llm_flight
 from ..lib.analyzer.task_executor import TaskExecutor
 from ..lib.two_round_llm_analyzer import ThreeStageAnalyzer
 from ..db import get_session
+from .result_store import ResultStore
+from .event_hub import EventHub, Subscription
 
 logger = logging.getLogger(__name__)
 
@@ -63,7 +72,11 @@ class QueueManager:
             self.max_queue_size: int = 50
             # Increase timeout to 24 hours for long analysis
             self.queue_timeout: int = 86400
-            self.update_callbacks: Dict[str, list] = {}
+            # SSE fan-out; publishing never waits on slow clients
+            self.event_hub = EventHub()
+            # Finished jobs move out of self.items into the result store (kept 5 minutes)
+            self.result_ttl: int = 300
+            self.result_store = ResultStore(ttl_seconds=self.result_ttl)
             self.initialized = True
             logger.info("QueueManager initialized")
 
@@ -116,12 +129,21 @@ class QueueManager:
         """Processor for single plan execution."""
         plan_id = payload.get("plan_id")
         notification_email = payload.get("notification_email")
+        request_id = payload.get("_request_id")
+
+        async def progress_callback(progress: Dict[str, Any]):
+            if request_id:
+                self.publish_progress(request_id, progress)
 
         session_gen = get_session()
         session = next(session_gen)
         try:
             analyzer = ThreeStageAnalyzer(session)
-            return await analyzer.execute_plan(plan_id, notification_email=notification_email)
+            return await analyzer.execute_plan(
+                plan_id,
+                progress_callback=progress_callback,
+                notification_email=notification_email
+            )
         finally:
             session.close()
 
@@ -232,8 +254,26 @@ class QueueManager:
         session = next(session_gen)
 
         try:
-            # 1. Decompose
             analyzer = ThreeStageAnalyzer(session)
+
+            # 0. Same question fully analyzed before on nearly the same data: reuse its report
+            cached_report = await analyzer.find_cached_final_report(original_query)
+            if cached_report:
+                logger.info(f"[FullCycle] Reusing report {cached_report['report_id']} ({cached_report['cache_hit']} match)")
+                if notification_email:
+                    await send_final_report_email(
+                        notification_email,
+                        original_query,
+                        cached_report['report'],
+                        cached_report['report_id']
+                    )
+                return {
+                    'success': True,
+                    'report_result': cached_report,
+                    'execution_summary': {'success': True, 'cache_hit': cached_report['cache_hit']}
+                }
+
+            # 1. Decompose
             decomp_res = await analyzer.decompose_into_tasks(original_query)
 
             if not decomp_res.get('success'):
@@ -325,6 +365,9 @@ class QueueManager:
                 task_results=task_results_fmt
             )
 
+            if report_res.get('success') and report_res.get('report_id'):
+                await analyzer.remember_final_report(original_query, report_res['report_id'])
+
             # 6. Email Report
             if notification_email and report_res.get('success'):
                  # Save report first (ThreeStageAnalyzer doesn't save it automatically?
@@ -404,11 +447,11 @@ class QueueManager:
 
         await self.queue.put(item)
         self.items[request_id] = item
-        await self._update_positions()
+        self._update_positions()
 
         logger.info(f"Added request {request_id} (type: {job_type}) to queue.")
 
-    async def _update_positions(self):
+    def _update_positions(self):
         """Updates position for all items in queue and broadcasts updates."""
         # Get all items currently in queue (without removing them)
         temp_items = []
@@ -424,55 +467,53 @@ class QueueManager:
 
         # Broadcast updates to all waiting clients
         for item in temp_items:
-            await self._broadcast_update(item.request_id, item.position, self.queue.qsize())
+            self._broadcast_update(item.request_id, item.position, self.queue.qsize())
 
-    async def _broadcast_update(self, request_id: str, position: int, total: int):
+    def _broadcast_update(self, request_id: str, position: int, total: int):
         """Broadcasts queue position update to all subscribed clients."""
-        if request_id in self.update_callbacks:
+        if self.event_hub.has_subscribers(request_id):
             update_data = {
                 'request_id': request_id,
                 'position': position,
                 'total': total,
                 'status': 'queued' if position > 1 else 'processing'
             }
-            await self._broadcast_event(request_id, update_data)
+            self._broadcast_event(request_id, update_data)
 
-    async def _broadcast_event(self, request_id: str, data: Dict[str, Any]):
-        """Generic method to broadcast any event to subscribed clients."""
-        if request_id in self.update_callbacks:
-            for callback in self.update_callbacks[request_id]:
-                try:
-                    await callback(data)
-                except Exception as e:
-                    logger.error(f"Error broadcasting event for {request_id}: {e}")
+    def _broadcast_event(self, request_id: str, data: Dict[str, Any]):
+        """Generic method to broadcast any event to subscribed clients (non-blocking)."""
+        self.event_hub.publish(request_id, data)
 
-    async def _broadcast_result(self, item: QueueItem):
+    def _broadcast_result(self, item: QueueItem):
         """Broadcasts the final result or error."""
         status_data = self.get_job_status(item.request_id)
         if status_data['status'] in ['completed', 'failed', 'error']:
-             await self._broadcast_event(item.request_id, status_data)
-
-    def subscribe_updates(self, request_id: str, callback: Callable):
+             self._broadcast_event(item.request_id, status_data)
+
+    def publish_progress(self, request_id: str, progress: Dict[str, Any]):
+        """Broadcasts a progress event (e.g. chunk execution) for a running job."""
+        self._broadcast_event(request_id, {
+            'request_id': request_id,
+            'position': 0,
+            'status': 'processing',
+            'progress': progress
+        })
+
+    def subscribe_updates(self, request_id: str) -> Subscription:
         """
         Subscribe to queue updates for a specific request.
 
         Args:
             request_id: The request to track
-            callback: Async function to call with updates
+
+        Returns:
+            Subscription whose next() yields updates, or KEEPALIVE on the shared tick
         """
-        if request_id not in self.update_callbacks:
-            self.update_callbacks[request_id] = []
-        self.update_callbacks[request_id].append(callback)
+        return self.event_hub.subscribe(request_id)
 
-    def unsubscribe_updates(self, request_id: str, callback: Callable):
+    def unsubscribe_updates(self, subscription: Subscription):
         """Unsubscribe from queue updates."""
-        if request_id in self.update_callbacks:
-            try:
-                self.update_callbacks[request_id].remove(callback)
-                if not self.update_callbacks[request_id]:
-                    del self.update_callbacks[request_id]
-            except ValueError:
-                pass
+        self.event_hub.unsubscribe(subscription)
 
     async def process_queue(self):
         """
@@ -497,11 +538,12 @@ class QueueManager:
                 item.position = 0
 
                 # Update status to processing
-                await self._broadcast_update(item.request_id, 0, self.queue.qsize())
+                self._broadcast_update(item.request_id, 0, self.queue.qsize())
 
                 try:
                     # Get the processor function
                     processor = item.payload.pop('_processor')
+                    item.payload['_request_id'] = item.request_id
 
                     # Execute the processor with timeout
                     result = await asyncio.wait_for(
@@ -512,42 +554,29 @@ class QueueManager:
                     # Set result
                     item.future.set_result(result)
                     logger.info(f"Request {item.request_id} completed successfully")
-                    await self._broadcast_result(item)
+                    self._broadcast_result(item)
 
                 except asyncio.TimeoutError:
                     error = RuntimeError(f"Request timed out after {self.queue_timeout} seconds")
                     item.future.set_exception(error)
                     logger.error(f"Request {item.request_id} timed out")
-                    await self._broadcast_result(item)
+                    self._broadcast_result(item)
 
                 except Exception as e:
                     item.future.set_exception(e)
                     logger.error(f"Error processing request {item.request_id}: {e}", exc_info=True)
-                    await self._broadcast_result(item)
+                    self._broadcast_result(item)
 
                 finally:
-                    # Clean up callbacks immediately
-                    if item.request_id in self.update_callbacks:
-                        del self.update_callbacks[item.request_id]
-
-                    # Schedule delayed cleanup for completed/failed jobs (keep results for 24 hours)
+                    # Hand completed/failed jobs to the result store; its reaper expires them
                     if item.future.done():
-                        logger.info(f"Scheduling delayed cleanup for job {item.request_id} in 5 minutes")
-
-                        async def delayed_cleanup():
-                            # 5 minutes = 300 seconds (reduced from 24h as per user request)
-                            await asyncio.sleep(300)
-                            if item.request_id in self.items:
-                                del self.items[item.request_id]
-                                logger.info(f"Cleaned up completed job {item.request_id}")
+                        self.result_store.put(item.request_id, self._build_job_status(item), self.result_ttl)
 
-                        asyncio.create_task(delayed_cleanup())
-                    else:
-                        if item.request_id in self.items:
-                            del self.items[item.request_id]
+                    if item.request_id in self.items:
+                        del self.items[item.request_id]
 
                     # Update positions for remaining items
-                    await self._update_positions()
+                    self._update_positions()
 
                     self.queue.task_done()
 
@@ -561,6 +590,7 @@ class QueueManager:
         if self.worker_task is None or self.worker_task.done():
             self.worker_task = asyncio.create_task(self.process_queue())
             logger.info("Queue worker task created")
+        self.result_store.start_reaper()
 
     async def stop_worker(self):
         """Stops the background queue processing worker."""
@@ -568,6 +598,7 @@ class QueueManager:
         if self.worker_task and not self.worker_task.done():
             await self.worker_task
             logger.info("Queue worker stopped")
+        await self.result_store.stop_reaper()
 
     def get_result(self, job_id: str):
         """Helper to get result directly."""
@@ -605,7 +636,21 @@ class QueueManager:
         """
         return {
             'queue_size': self.queue.qsize(),
-            'total_processed': len([i for i in self.items.values() if i.future.done()])
+            'total_processed': len(self.result_store),
+            'result_store': self.result_store.get_stats(),
+            'event_hub': self.event_hub.get_stats(),
+            'llm_cache': get_llm_cache().get_stats(),
+            'analysis_cache': get_analysis_cache().get_stats(),
+            'compact_case_cache': compact_case_cache.get_stats(),
+            'python_executor': get_executor_pool().get_stats(),
+            'sql_guard': {
+                **get_sql_guard().get_stats(),
+                'slowest_queries': get_sql_guard().get_slow_queries(limit=5)
+            },
+            'single_flight': {
+                'llm': llm_flight.get_stats(),
+                'embedding': embedding_flight.get_stats()
+            }
         }
 
     def get_job_status(self, request_id: str) -> Dict[str, Any]:
@@ -619,9 +664,16 @@ class QueueManager:
             Dictionary with status, result (if done), or error
         """
         if request_id not in self.items:
+            stored = self.result_store.get(request_id)
+            if stored is not None:
+                return stored
             return {'status': 'not_found'}
 
-        item = self.items[request_id]
+        return self._build_job_status(self.items[request_id])
+
+    def _build_job_status(self, item: QueueItem) -> Dict[str, Any]:
+        """Builds the status dictionary for a queue item."""
+        request_id = item.request_id
 
         if item.future.done():
             try:
@@ -0,0 +1,252 @@
+"""
+Result Store for finished queue jobs.
+
+Keeps the final status/result of completed jobs for a limited time so that
+clients polling `/status/{job_id}` or `/result/{job_id}` can still fetch them.
+
+Features:
+- Expiry tracked in a single min-heap, swept by one background reaper task
+- Total in-memory bytes bounded; oldest entries spill to disk above the cap
+- Large results spill to disk immediately
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import pickle
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StoredResult:
+    """A finished job status kept in memory or spilled to disk."""
+    request_id: str
+    expires_at: float
+    size: int
+    data: Optional[Dict[str, Any]] = None
+    spill_path: Optional[str] = None
+
+
+class ResultStore:
+    """
+    Bounded, expiring store for finished job statuses.
+
+    Entries are pickled once on insert to measure their size. Results larger than
+    `spill_threshold_bytes` go straight to disk; when the in-memory total exceeds
+    `max_memory_bytes`, the entries closest to expiry are spilled until it fits.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = 300,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        spill_threshold_bytes: int = 1024 * 1024,
+        spill_dir: str = "job_results"
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_threshold_bytes = spill_threshold_bytes
+        self.spill_dir = spill_dir
+        self.entries: Dict[str, StoredResult] = {}
+        self.memory_bytes: int = 0
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._reaper_task: Optional[asyncio.Task] = None
+
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._remove_stale_spill_files()
+
+    def put(self, request_id: str, data: Dict[str, Any], ttl_seconds: Optional[int] = None):
+        """Stores a finished job status until it expires."""
+        self.discard(request_id)
+
+        expires_at = time.time() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+
+        try:
+            blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            # Unpicklable payloads stay in memory and are not counted against the cap
+            logger.warning(f"Could not serialize result for {request_id}, keeping in memory: {e}")
+            blob = None
+
+        entry = StoredResult(
+            request_id=request_id,
+            expires_at=expires_at,
+            size=len(blob) if blob is not None else 0
+        )
+
+        if blob is not None and entry.size > self.spill_threshold_bytes:
+            entry.spill_path = self._write_spill_file(request_id, blob)
+
+        if entry.spill_path is None:
+            entry.data = data
+            self.memory_bytes += entry.size
+
+        self.entries[request_id] = entry
+        heapq.heappush(self._expiry_heap, (expires_at, request_id))
+
+        if self.memory_bytes > self.max_memory_bytes:
+            self._spill_until_within_budget()
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the stored status, or None if missing or expired."""
+        entry = self.entries.get(request_id)
+        if entry is None:
+            return None
+
+        if entry.expires_at <= time.time():
+            self.discard(request_id)
+            return None
+
+        if entry.spill_path is None:
+            return entry.data
+
+        try:
+            with open(entry.spill_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.error(f"Error reading spilled result for {request_id}: {e}")
+            self.discard(request_id)
+            return None
+
+    def discard(self, request_id: str) -> bool:
+        """Removes an entry. Its heap slot is skipped lazily by the reaper."""
+        entry = self.entries.pop(request_id, None)
+        if entry is None:
+            return False
+
+        if entry.spill_path is None:
+            self.memory_bytes -= entry.size
+        else:
+            self._remove_spill_file(entry.spill_path)
+        return True
+
+    def sweep(self) -> int:
+        """Removes all expired entries. Returns how many were removed."""
+        now = time.time()
+        removed = 0
+
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, request_id = heapq.heappop(self._expiry_heap)
+            entry = self.entries.get(request_id)
+            # Skip stale heap slots left behind by discard() or re-insertion
+            if entry is None or entry.expires_at != expires_at:
+                continue
+            self.discard(request_id)
+            removed += 1
+
+        if removed:
+            logger.info(f"Result store reaped {removed} expired job results")
+        return removed
+
+    async def run_reaper(self, max_interval: float = 30.0):
+        """Single background loop that sleeps until the next expiry and sweeps."""
+        logger.info("Result store reaper started")
+        try:
+            while True:
+                self.sweep()
+                if self._expiry_heap:
+                    delay = min(max(self._expiry_heap[0][0] - time.time(), 0.1), max_interval)
+                else:
+                    delay = max_interval
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            logger.info("Result store reaper stopped")
+            raise
+
+    def start_reaper(self):
+        """Starts the reaper task if it is not already running."""
+        if self._reaper_task is None or self._reaper_task.done():
+            self._reaper_task = asyncio.create_task(self.run_reaper())
+
+    async def stop_reaper(self):
+        """Cancels the reaper task."""
+        if self._reaper_task and not self._reaper_task.done():
+            self._reaper_task.cancel()
+            try:
+                await self._reaper_task
+            except asyncio.CancelledError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns counters for monitoring."""
+        spilled = sum(1 for e in self.entries.values() if e.spill_path is not None)
+        return {
+            'stored_results': len(self.entries),
+            'spilled_results': spilled,
+            'memory_bytes': self.memory_bytes,
+            'max_memory_bytes': self.max_memory_bytes
+        }
+
+    def __contains__(self, request_id: str) -> bool:
+        return request_id in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # --- Helpers ---
+
+    def _spill_until_within_budget(self):
+        """Moves in-memory entries closest to expiry onto disk until under the cap."""
+        candidates = sorted(
+            (e for e in self.entries.values() if e.spill_path is None and e.size > 0),
+            key=lambda e: e.expires_at
+        )
+        for entry in candidates:
+            if self.memory_bytes <= self.max_memory_bytes:
+                break
+            try:
+                blob = pickle.dumps(entry.data, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                continue
+            spill_path = self._write_spill_file(entry.request_id, blob)
+            if spill_path is None:
+                continue
+            entry.spill_path = spill_path
+            entry.data = None
+            self.memory_bytes -= entry.size
+
+    def _write_spill_file(self, request_id: str, blob: bytes) -> Optional[str]:
+        """Atomic write of a pickled result. Returns the path or None on failure."""
+        file_path = os.path.join(self.spill_dir, f"{request_id}.pkl")
+        tmp_file = file_path + ".tmp"
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_file, file_path)
+            return file_path
+        except Exception as e:
+            logger.error(f"Error spilling result {request_id} to disk: {e}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return None
+
+    def _remove_spill_file(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error removing spilled result {path}: {e}")
+
+    def _remove_stale_spill_files(self):
+        """
+        Clears spill files left over from previous runs.
+
+        Only files older than the TTL are removed, so results spilled by other
+        workers sharing the directory are left alone.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        try:
+            for name in os.listdir(self.spill_dir):
+                if not (name.endswith(".pkl") or name.endswith(".pkl.tmp")):
+                    continue
+                path = os.path.join(self.spill_dir, name)
+                if os.path.getmtime(path) < cutoff:
+                    self._remove_spill_file(path)
+        except Exception as e:
+            logger.error(f"Error cleaning result spill directory: {e}")
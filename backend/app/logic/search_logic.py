@@ -8,6 +8,7 @@ from typing import List, Dict, Any, Tuple
 from ..config import get_settings
 from ..schemas import SearchRequest
 from ..settings_manager import settings_manager
+from .single_flight import embedding_flight_sync
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -21,6 +22,28 @@ def embed_text(text_to_embed: str) -> List[float]:
         logger.warning("Embed text called with empty string. Returning zero vector.")
         return [0.0] * settings.VECTOR_DIM
 
+    # Identical texts embedded concurrently by several threads share one Ollama call
+    embedding = embedding_flight_sync.do(
+        (settings.MODEL_NAME, text_to_embed), lambda: _request_embedding(text_to_embed)
+    )
+    return list(embedding)
+
+
+def case_embedding_text(case_data: Dict[str, Any]) -> str:
+    """Text embedded for a case when matching it to models and code articles."""
+    situatia_de_fapt = (case_data.get('situatia_de_fapt') or '').strip()
+    rezumat_ai = (case_data.get('rezumat_ai') or '').strip()
+    text_query = case_data.get('text_query')
+    return ' '.join(filter(None, [
+        situatia_de_fapt[:500] if situatia_de_fapt else '',  # Limit to 500 chars
+        rezumat_ai[:300] if rezumat_ai else '',
+        (case_data.get('obiect') or '').strip(),
+        (case_data.get('materie') or '').strip(),
+        text_query if text_query else ''
+    ])).strip()
+
+
+def _request_embedding(text_to_embed: str) -> List[float]:
     logger.info("Calling Ollama API for embedding...")
     try:
         r = requests.post(
@@ -0,0 +1,92 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight upstream call
+(Ollama embedding or LLM generation) and all receive its result or exception.
+Nothing is cached once the call finishes; see llm_cache for that.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesces concurrent coroutine calls with the same key (one event loop)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Tuple[int, Hashable], asyncio.Task] = {}
+        self.stats = {'calls': 0, 'coalesced': 0}
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs `factory()` unless a call with the same key is already in flight.
+
+        The shared task is shielded, so a caller that is cancelled (e.g. a closed
+        SSE client) does not cancel the call for the others.
+        """
+        loop_key = (id(asyncio.get_running_loop()), key)
+        task = self._inflight.get(loop_key)
+        if task is None:
+            self.stats['calls'] += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[loop_key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(loop_key, None))
+        else:
+            self.stats['coalesced'] += 1
+            logger.debug(f"[{self.name}] Joined in-flight call")
+        return await asyncio.shield(task)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, 'in_flight': len(self._inflight)}
+
+
+class SyncSingleFlight:
+    """Coalesces concurrent blocking calls with the same key across threads."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.stats = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Runs `fn()` unless another thread is already running it for the same key."""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.stats['calls'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, 'in_flight': len(self._inflight)}
+
+
+# Shared instances: one per upstream kind
+embedding_flight = SingleFlight("embedding")
+embedding_flight_sync = SyncSingleFlight("embedding")
+llm_flight = SingleFlight("llm")
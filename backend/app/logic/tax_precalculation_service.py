@@ -1,6 +1,10 @@
 """
 Service for pre-calculating tax suggestions for each case using LLM.
 Includes intelligent pacing and waiting logic to manage LLM load.
+
+By default cases are grouped by normalized obiect: each distinct obiect is
+classified once, remembered in the taxa_obiect_sugestii lookup table, and its
+suggestion is written to all the cases of the group with one UPDATE.
 """
 import logging
 import threading
@@ -13,7 +17,8 @@ from sqlmodel import Session, select, text
 
 # Assumes these imports are available in the project structure
 from ..db import get_session
-from ..taxa_timbru_logic import suggest_tax_classification
+from ..taxa_timbru_logic import INTERNAL_ERROR, LLM_CALL_ERROR, suggest_tax_classification
+from .normalization import normalize_text
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +43,9 @@ LLM_ERROR_PAUSE = 10     # Seconds to wait after an error before retrying
 LLM_BATCH_PAUSE = 10     # Seconds to wait after a batch to allow "re-initialization" or cooling
 BATCH_SIZE = 5           # Process 5 cases, then pause long
 
+# Dedup mode: cases read per page while grouping by obiect
+GROUPING_PAGE_SIZE = 5000
+
 def ensure_tax_column_exist(session: Session) -> bool:
     """
     Ensures that 'sugestie_llm_taxa' column exists in the blocuri table.
@@ -68,6 +76,28 @@ def ensure_tax_column_exist(session: Session) -> bool:
         session.rollback()
         return False
 
+def ensure_tax_lookup_table(session: Session) -> bool:
+    """
+    Ensures the 'taxa_obiect_sugestii' lookup table (normalized obiect -> suggestion) exists.
+    """
+    try:
+        session.execute(text("""
+            CREATE TABLE IF NOT EXISTS taxa_obiect_sugestii (
+                obiect_normalizat TEXT PRIMARY KEY,
+                obiect_exemplu TEXT,
+                sugestie JSONB NOT NULL,
+                numar_cazuri INTEGER,
+                created_at TIMESTAMP DEFAULT NOW(),
+                updated_at TIMESTAMP DEFAULT NOW()
+            )
+        """))
+        session.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error ensuring tax lookup table exists: {e}", exc_info=True)
+        session.rollback()
+        return False
+
 def get_tax_precalculation_status(main_session: Session) -> Dict[str, Any]:
     """Get current status including incomplete count."""
     with tax_precalc_status_lock:
@@ -102,9 +132,10 @@ def stop_tax_precalculation() -> Dict[str, Any]:
     logger.info("Stop signal sent to tax precalculation process")
     return {'success': True, 'message': 'Stop signal sent. Process will pause shortly.'}
 
-async def process_single_case_tax(case_id: int, obj_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def tax_description(obj_data: Dict[str, Any]) -> Optional[str]:
     """
-    Process a single case: extract description, call LLM, return result.
+    The text classified for a case: its obiect, or materie + stadiu procesual
+    when the obiect is missing. None for cases with neither.
     """
     # Extract description similar to how the UI does it (or use 'obiect'/'obiect_juridic')
     # Based on extract_case_metadata in precalculation_service.py
@@ -119,29 +150,61 @@ async def process_single_case_tax(case_id: int, obj_data: Dict[str, Any]) -> Opt
         else:
             return None # Skip empty cases
 
+    return obiect
+
+async def process_single_case_tax(case_id: int, obj_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Process a single case: extract description, call LLM, return result.
+    """
+    obiect = tax_description(obj_data)
+    if obiect is None:
+        return None # Skip empty cases
+
+    return await classify_tax_description(obiect, f"case {case_id}")
+
+def is_transient_tax_failure(suggestion: Dict[str, Any]) -> bool:
+    """
+    True if a suggestion failed in the LLM call (worth retrying later). Validation
+    errors (description too short, no options loaded) are final results and stored.
+    """
+    if suggestion.get('error'):
+        return True
+    return (suggestion.get('error_message') or '').startswith((LLM_CALL_ERROR, INTERNAL_ERROR))
+
+async def classify_tax_description(obiect: str, label: str) -> Dict[str, Any]:
+    """
+    Calls the LLM (with retries of failed calls) for one description and returns the
+    suggestion dict, or {"error", "original_input"} when every attempt raised.
+    """
     # Retry logic loop
     max_retries = 2
     for attempt in range(max_retries):
         try:
             # Call the shared logic function
             # Since we are in an async function, we can await it directly
-            result_model = await suggest_tax_classification(obiect)
+            result_model = await suggest_tax_classification(obiect, use_cache=attempt == 0)
 
             # Convert Pydantic model to dict for JSON storage
-            return result_model.dict()
+            result = result_model.dict()
+            if is_transient_tax_failure(result) and attempt < max_retries - 1:
+                logger.warning(f"LLM call failed for {label} (Attempt {attempt+1}/{max_retries}): {result['error_message']}")
+                await asyncio.sleep(LLM_ERROR_PAUSE)
+                continue
+            return result
 
         except Exception as e:
-            logger.warning(f"Error processing tax for case {case_id} (Attempt {attempt+1}/{max_retries}): {e}")
+            logger.warning(f"Error processing tax for {label} (Attempt {attempt+1}/{max_retries}): {e}")
             if attempt < max_retries - 1:
                 await asyncio.sleep(LLM_ERROR_PAUSE)
             else:
                 return {"error": str(e), "original_input": obiect}
 
-    return None
+    return {"error": "no attempt made", "original_input": obiect}
 
 async def _run_tax_precalculation_async(
     main_session_factory, # pass factory/method to get session to be thread-safe if needed
-    restart_from_zero: bool
+    restart_from_zero: bool,
+    dedup: bool = True
 ):
     """
     Async implementation of the main loop loop.
@@ -168,15 +231,21 @@ async def _run_tax_precalculation_async(
             tax_precalc_status['current_progress']['success_count'] = 0
             tax_precalc_status['current_progress']['error_count'] = 0
 
-        logger.info(f"Starting Tax Precalculation (Restart={restart_from_zero})")
+        logger.info(f"Starting Tax Precalculation (Restart={restart_from_zero}, Dedup={dedup})")
 
         # 0. Ensure Column
-        if not ensure_columns_exist_internal(session):
+        if not ensure_columns_exist_internal(session) or (dedup and not ensure_tax_lookup_table(session)):
              # Status update fail handled in ensure
              with tax_precalc_status_lock:
                 tax_precalc_status['is_running'] = False
              return
 
+        if dedup:
+            tax_precalc_stop_event.clear()
+            processed_count, success_count, error_count = await _precalculate_tax_by_obiect(session, restart_from_zero)
+            _finish_tax_run(processed_count, success_count, error_count)
+            return
+
         # 1. Count Total
         if restart_from_zero:
             count_query = text("SELECT COUNT(*) FROM blocuri")
@@ -295,32 +364,209 @@ async def _run_tax_precalculation_async(
                 break
 
         # Finished or Stopped
-        logger.info(f"Tax Precalculation finished. Processed: {processed_count}")
+        _finish_tax_run(processed_count, success_count, error_count)
+
+
+async def _precalculate_tax_by_obiect(session: Session, restart_from_zero: bool) -> tuple:
+    """
+    Dedup mode: one classification per distinct normalized obiect.
+
+    1. Groups the pending cases by normalized description (keyset scan reading only the obiect fields)
+    2. Reuses suggestions stored in taxa_obiect_sugestii; calls the LLM (with the usual pacing)
+       for the other groups, largest first, and stores the new suggestions
+    3. Writes each group's suggestion to all its cases with one UPDATE
+
+    Groups whose LLM call fails are left NULL, so a resumed run retries them; validation
+    errors are stored on the cases like any other result.
+
+    Returns:
+        Tuple of (processed cases, successful cases, failed cases)
+    """
+    if restart_from_zero:
+        session.execute(text("DELETE FROM taxa_obiect_sugestii"))
+        session.commit()
+
+    groups, skipped_ids = _group_pending_cases(session, restart_from_zero)
+    total_cases = sum(len(ids) for _, ids in groups.values()) + len(skipped_ids)
+    known = _load_tax_lookup(session, list(groups))
+
+    with tax_precalc_status_lock:
+        tax_precalc_status['current_progress'].update({
+            'total': total_cases,
+            'distinct_obiecte': len(groups),
+            'lookup_hits': 0,
+            'llm_calls': 0
+        })
+    logger.info(
+        f"Total cases to process: {total_cases} in {len(groups)} distinct obiecte "
+        f"({len(known)} already classified, {len(skipped_ids)} without obiect)"
+    )
+
+    processed_count = success_count = error_count = 0
+    lookup_hits = llm_calls = 0
+
+    # Cases without any description are marked as before
+    if skipped_ids:
+        _write_tax_suggestion(session, skipped_ids, {"error": "skipped"})
+        session.commit()
+        processed_count += len(skipped_ids)
+        error_count += len(skipped_ids)
+
+    for key, (description, ids) in sorted(groups.items(), key=lambda item: -len(item[1][1])):
+        if tax_precalc_stop_event.is_set():
+            break
+
+        suggestion = known.get(key)
+        if suggestion is not None:
+            lookup_hits += 1
+        else:
+            suggestion = await classify_tax_description(description, f"obiect '{description[:60]}' ({len(ids)} cases)")
+            llm_calls += 1
+            if is_transient_tax_failure(suggestion):
+                logger.warning(f"Tax classification failed for obiect '{description[:60]}'; {len(ids)} cases left for retry")
+                suggestion = None
+
+        try:
+            if suggestion is not None:
+                # Validation errors are written to the cases (as the per-case path does) but not
+                # remembered for the obiect, so e.g. loading the options later fixes them
+                failed = bool(suggestion.get('error_message'))
+                if key not in known and not failed:
+                    _store_tax_lookup(session, key, description, suggestion, len(ids))
+                _write_tax_suggestion(session, ids, suggestion)
+                session.commit()
+                processed_count += len(ids)
+                if failed:
+                    error_count += len(ids)
+                else:
+                    success_count += len(ids)
+            else:
+                error_count += len(ids)
+        except Exception as e:
+            logger.error(f"Failed writing tax suggestion for obiect '{description[:60]}': {e}")
+            session.rollback()
+            error_count += len(ids)
+
+        # Update status
         with tax_precalc_status_lock:
-            tax_precalc_status['is_running'] = False
-            tax_precalc_status['last_run_stats'] = {
+            tax_precalc_status['current_progress'].update({
                 'processed': processed_count,
-                'success': success_count,
-                'errors': error_count,
-                'stopped': tax_precalc_stop_event.is_set()
-            }
+                'success_count': success_count,
+                'error_count': error_count,
+                'lookup_hits': lookup_hits,
+                'llm_calls': llm_calls
+            })
+
+        # --- INTELLIGENT PACING --- (only after LLM calls)
+        if key not in known:
+            if llm_calls % BATCH_SIZE == 0:
+                logger.info(f"Batch pause ({LLM_BATCH_PAUSE}s) for LLM cooling/re-init...")
+                await asyncio.sleep(LLM_BATCH_PAUSE)
+            else:
+                await asyncio.sleep(LLM_SHORT_PAUSE)
+
+    logger.info(
+        f"Dedup tax precalculation: {llm_calls} LLM calls, {lookup_hits} lookup hits "
+        f"for {processed_count} cases"
+    )
+    return processed_count, success_count, error_count
+
+
+def _group_pending_cases(session: Session, restart_from_zero: bool) -> tuple:
+    """
+    Pending case ids grouped by normalized description.
+
+    Returns:
+        Tuple of ({normalized obiect: (representative description, [case ids])}, [ids without description])
+    """
+    where_pending = "" if restart_from_zero else "AND sugestie_llm_taxa IS NULL"
+    query = text(f"""
+        SELECT id,
+               obj->>'obiect' AS obiect,
+               obj->>'obiect_juridic' AS obiect_juridic,
+               obj->>'materie' AS materie,
+               obj->>'stadiu_procesual' AS stadiu_procesual
+        FROM blocuri
+        WHERE id > :last_id {where_pending}
+        ORDER BY id
+        LIMIT :page_size
+    """)
+
+    groups: Dict[str, tuple] = {}
+    skipped_ids: List[int] = []
+    last_id = 0
+    while True:
+        rows = session.execute(query, {'last_id': last_id, 'page_size': GROUPING_PAGE_SIZE}).mappings().all()
+        if not rows:
+            break
+        for row in rows:
+            fields = {k: v for k, v in row.items() if k != 'id' and v is not None}
+            description = tax_description(fields)
+            key = normalize_text(description) if description else ''
+            if not key:
+                skipped_ids.append(row['id'])
+                continue
+            groups.setdefault(key, (description, []))[1].append(row['id'])
+        last_id = rows[-1]['id']
+    return groups, skipped_ids
+
+
+def _load_tax_lookup(session: Session, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Stored suggestions for the given normalized obiecte."""
+    if not keys:
+        return {}
+    rows = session.execute(
+        text("SELECT obiect_normalizat, sugestie FROM taxa_obiect_sugestii WHERE obiect_normalizat = ANY(:keys)"),
+        {'keys': keys}
+    ).all()
+    return {key: (json.loads(value) if isinstance(value, str) else value) for key, value in rows}
+
+
+def _store_tax_lookup(session: Session, key: str, description: str, suggestion: Dict[str, Any], case_count: int):
+    session.execute(text("""
+        INSERT INTO taxa_obiect_sugestii (obiect_normalizat, obiect_exemplu, sugestie, numar_cazuri)
+        VALUES (:key, :description, CAST(:suggestion AS jsonb), :case_count)
+        ON CONFLICT (obiect_normalizat) DO UPDATE SET
+            numar_cazuri = EXCLUDED.numar_cazuri,
+            updated_at = NOW()
+    """), {'key': key, 'description': description, 'suggestion': json.dumps(suggestion), 'case_count': case_count})
+
+
+def _write_tax_suggestion(session: Session, case_ids: List[int], suggestion: Dict[str, Any]):
+    """Writes one suggestion to many cases with a single UPDATE."""
+    session.execute(
+        text("UPDATE blocuri SET sugestie_llm_taxa = CAST(:suggestion AS jsonb) WHERE id = ANY(:ids)"),
+        {'suggestion': json.dumps(suggestion), 'ids': case_ids}
+    )
+
+
+def _finish_tax_run(processed_count: int, success_count: int, error_count: int):
+    logger.info(f"Tax Precalculation finished. Processed: {processed_count}")
+    with tax_precalc_status_lock:
+        tax_precalc_status['is_running'] = False
+        tax_precalc_status['last_run_stats'] = {
+            'processed': processed_count,
+            'success': success_count,
+            'errors': error_count,
+            'stopped': tax_precalc_stop_event.is_set()
+        }
 
 
 def ensure_columns_exist_internal(session):
     return ensure_tax_column_exist(session)
 
 
-def run_tax_precalculation_thread(restart_from_zero: bool):
+def run_tax_precalculation_thread(restart_from_zero: bool, dedup: bool = True):
     """Entry point for the background thread."""
     # We need to run async code in this thread
-    asyncio.run(_run_tax_precalculation_async(None, restart_from_zero))
+    asyncio.run(_run_tax_precalculation_async(None, restart_from_zero, dedup))
 
-def start_tax_precalculation(restart_from_zero: bool = False):
-    """Starts the background thread."""
+def start_tax_precalculation(restart_from_zero: bool = False, dedup: bool = True):
+    """Starts the background thread (dedup=False classifies every case separately)."""
     with tax_precalc_status_lock:
         if tax_precalc_status['is_running']:
             return {'success': False, 'message': 'Already running'}
 
-    t = threading.Thread(target=run_tax_precalculation_thread, args=(restart_from_zero,), daemon=True)
+    t = threading.Thread(target=run_tax_precalculation_thread, args=(restart_from_zero, dedup), daemon=True)
     t.start()
     return {'success': True, 'message': 'Started tax precalculation'}
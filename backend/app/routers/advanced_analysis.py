@@ -4,6 +4,7 @@ from typing import Optional, Dict, Any, List
 from sqlmodel import Session, select
 from ..db import get_session
 from ..lib.two_round_llm_analyzer import ThreeStageAnalyzer
+from ..lib.analyzer.plan_manager import PlanManager
 from ..lib.analyzer.task_queue_manager import TaskQueueManager
 from ..lib.analyzer.task_executor import TaskExecutor
 import logging
@@ -103,6 +104,19 @@ async def update_plan_limit(plan_id: str, request: UpdateLimitRequest, session:
         raise HTTPException(status_code=400, detail=result.get('error', 'Unknown error'))
     return result
 
+@router.get("/plans")
+async def list_plans(status: Optional[str] = None, limit: int = 100):
+    """Lists plans (newest first) with their chunk progress, from the plan index only."""
+    return {"plans": PlanManager().list_plans(status=status, limit=max(1, min(limit, 500)))}
+
+@router.get("/plans/{plan_id}/progress")
+async def get_plan_progress(plan_id: str):
+    """Chunk progress of a plan, read from its completion bitmap."""
+    progress = PlanManager().get_plan_progress(plan_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Planul nu a fost găsit.")
+    return progress
+
 @router.post("/full-academic-cycle")
 async def start_full_academic_cycle(request: FullCycleRequest, background_tasks: BackgroundTasks, session: Session = Depends(get_session)):
     """
@@ -162,8 +176,7 @@ async def add_task_to_queue(request: AddQueueTaskRequest):
     """Adds a task to the analysis queue."""
     manager = TaskQueueManager()
     task_id = manager.add_task(request.query, request.user_metadata)
-    queue = manager.get_queue()
-    return {"success": True, "task_id": task_id, "queue_position": len(queue['tasks'])}
+    return {"success": True, "task_id": task_id, "queue_position": manager.count_tasks()}
 
 @router.get("/queue")
 async def get_queue():
@@ -193,9 +206,7 @@ async def remove_task_from_queue(task_id: str):
 async def generate_plans_batch(request: GeneratePlansRequest, background_tasks: BackgroundTasks, session: Session = Depends(get_session)):
     """Starts batch plan generation for pending tasks."""
     manager = TaskQueueManager()
-    queue = manager.get_queue()
-
-    pending_tasks = [t for t in queue['tasks'] if t['state'] == 'pending']
+    pending_tasks = manager.get_tasks(['pending'])
 
     if not pending_tasks:
         return {"success": False, "message": "No pending tasks to plan."}
@@ -231,10 +242,8 @@ async def execute_queue(request: ExecuteQueueRequest, background_tasks: Backgrou
 
     # Auto-approve all planned tasks before execution
     manager = TaskQueueManager()
-    queue = manager.get_queue()
-    for task in queue['tasks']:
-        if task['state'] == 'planned':
-            manager.update_task_state(task['id'], 'approved', {})
+    for task in manager.get_tasks(['planned']):
+        manager.update_task_state(task['id'], 'approved', {})
 
     qm = QueueManager()
 
@@ -434,9 +443,9 @@ async def clear_analysis_session(job_id: str):
     # Remove from memory if exists
     if job_id in qm.items:
         del qm.items[job_id]
+    qm.result_store.discard(job_id)
 
-    # Also attempt to remove callbacks
-    if job_id in qm.update_callbacks:
-        del qm.update_callbacks[job_id]
+    # Also end any SSE subscriptions
+    qm.event_hub.close_topic(job_id)
 
     return {"success": True}
@@ -5,33 +5,35 @@ Provides streaming updates to clients about their position in the LLM request qu
 """
 
 import asyncio
+import json
 import logging
 from fastapi import APIRouter, Response
 from fastapi.responses import StreamingResponse
 from ..logic.queue_manager import queue_manager
+from ..logic.event_hub import KEEPALIVE
 
 router = APIRouter(prefix="/queue", tags=["queue"])
 logger = logging.getLogger(__name__)
 
+TERMINAL_STATUSES = ['completed', 'failed', 'error']
+
 
 async def event_stream(request_id: str):
     """
     Generates SSE stream for queue position updates.
 
+    Events come from the queue manager's shared EventHub; the per-connection buffer
+    is bounded and drops the oldest events for slow clients. Keepalives come from the
+    hub's shared ticker rather than a per-connection timer.
+
     Args:
         request_id: The request ID to track
 
     Yields:
         SSE formatted messages with queue position updates
     """
-    update_queue = asyncio.Queue()
-
-    async def callback(update_data: dict):
-        """Callback to receive updates from queue manager."""
-        await update_queue.put(update_data)
-
     # Subscribe to updates
-    queue_manager.subscribe_updates(request_id, callback)
+    subscription = queue_manager.subscribe_updates(request_id)
 
     try:
         # Send initial position
@@ -39,23 +41,18 @@ async def event_stream(request_id: str):
         if position is not None:
             stats = queue_manager.get_queue_stats()
             yield f"data: {{\"position\": {position}, \"total\": {stats['queue_size']}, \"status\": \"queued\"}}\n\n"
+        else:
+            # Job may already be finished and waiting in the result store
+            status = queue_manager.get_job_status(request_id)
+            if status['status'] in TERMINAL_STATUSES:
+                yield f"data: {json.dumps(status, default=str)}\n\n"
+                return
 
         # Stream updates until request completes
         while True:
-            try:
-                # Wait for update with timeout
-                update = await asyncio.wait_for(update_queue.get(), timeout=30.0)
-
-                # Format as SSE
-                import json
-                data = json.dumps(update)
-                yield f"data: {data}\n\n"
+            update = await subscription.next()
 
-                # If completed or error, close stream
-                if update.get('status') in ['completed', 'error']:
-                    break
-
-            except asyncio.TimeoutError:
+            if update is KEEPALIVE:
                 # Send keepalive ping
                 yield ": keepalive\n\n"
 
@@ -63,9 +60,16 @@ async def event_stream(request_id: str):
                 status = queue_manager.get_job_status(request_id)
                 if status['status'] not in ['queued', 'processing']:
                     # Request completed, removed, or failed
-                    import json
-                    yield f"data: {json.dumps(status)}\n\n"
+                    yield f"data: {json.dumps(status, default=str)}\n\n"
                     break
+                continue
+
+            # Format as SSE
+            yield f"data: {json.dumps(update, default=str)}\n\n"
+
+            # If completed or error, close stream
+            if update.get('status') in TERMINAL_STATUSES:
+                break
 
     except asyncio.CancelledError:
         logger.info(f"SSE stream cancelled for request {request_id}")
@@ -73,7 +77,7 @@ async def event_stream(request_id: str):
         logger.error(f"Error in SSE stream for {request_id}: {e}", exc_info=True)
     finally:
         # Unsubscribe
-        queue_manager.unsubscribe_updates(request_id, callback)
+        queue_manager.unsubscribe_updates(subscription)
 
 
 @router.get("/status/{request_id}")
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends, Response
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from sqlmodel import Session
 from datetime import timedelta
 from ..settings_manager import settings_manager
@@ -100,7 +100,9 @@ async def reset_settings():
 
 @router.post("/precalculate-models-codes", response_model=Dict[str, Any])
 async def precalculate_models_codes(
-    restart: bool = False
+    restart: bool = False,
+    incremental: bool = False,
+    workers: Optional[int] = None
 ):
     """
     Triggers pre-calculation of models and codes for all cases.
@@ -109,7 +111,10 @@ async def precalculate_models_codes(
 
     Query Parameters:
         restart: If True, reset all precalculated data and start from scratch.
-                If False, only process incomplete cases (resume mode).
+                If False, resume the interrupted run, else only process incomplete cases (resume mode).
+        incremental: Only process cases added or changed since the last completed run
+                     (meant for scheduled runs).
+        workers: Parallel workers (default: setari_generale.precalc_workers), bounded by the DB pool.
     """
     from ..db import engine as main_engine
     from ..db_modele import modele_engine
@@ -120,7 +125,7 @@ async def precalculate_models_codes(
     import threading
 
     logger = logging.getLogger(__name__)
-    logger.info(f"Pre-calculation endpoint called, restart={restart}")
+    logger.info(f"Pre-calculation endpoint called, restart={restart}, incremental={incremental}")
 
     # Check if already running
     with precalc_status_lock:
@@ -145,7 +150,9 @@ async def precalculate_models_codes(
                     batch_size=100,
                     limit_modele=5,
                     limit_coduri=5,
-                    restart_from_zero=restart
+                    restart_from_zero=restart,
+                    incremental=incremental,
+                    workers=workers
                 )
                 logger.info(f"Precalculation completed: {results}")
         except Exception as e:
@@ -159,7 +166,8 @@ async def precalculate_models_codes(
         'success': True,
         'message': 'Precalculation started in background',
         'is_running': True,
-        'restart_mode': restart
+        'restart_mode': restart,
+        'incremental': incremental
     }
 
 
@@ -207,16 +215,21 @@ async def stop_precalculate():
 
 @router.post("/precalculate-tax", response_model=Dict[str, Any])
 async def precalculate_tax(
-    restart: bool = False
+    restart: bool = False,
+    dedup: bool = True
 ):
     """
     Triggers pre-calculation of tax suggestions (LLM) for all cases.
+
+    Query Parameters:
+        dedup: Classify each distinct (normalized) obiect once and copy the result to all
+               its cases. If False, every case is classified separately.
     """
     from ..logic.tax_precalculation_service import start_tax_precalculation, tax_precalc_status, tax_precalc_status_lock
     import logging
 
     logger = logging.getLogger(__name__)
-    logger.info(f"Tax Pre-calculation endpoint called, restart={restart}")
+    logger.info(f"Tax Pre-calculation endpoint called, restart={restart}, dedup={dedup}")
 
     # Check if already running
     with tax_precalc_status_lock:
@@ -227,7 +240,7 @@ async def precalculate_tax(
                 'is_running': True
             }
 
-    result = start_tax_precalculation(restart_from_zero=restart)
+    result = start_tax_precalculation(restart_from_zero=restart, dedup=dedup)
     return result
 
 
@@ -449,8 +462,7 @@ async def analyze_llm_data(
                 # Polling pentru fișierul de răspuns
                 poll_success, poll_content, response_path = await NetworkFileSaver.poll_for_response(
                     saved_path=saved_path,
-                    timeout_seconds=1200,  # 20 minute
-                    poll_interval=10  # 10 secunde
+                    timeout_seconds=1200  # 20 minute
                 )
 
                 if not poll_success:
@@ -1067,8 +1079,7 @@ INCEPE ACUM CU {{ (prima litera din raspuns trebuie sa fie acolada):
             logger.info(f"[DOC GEN] Polling for response for {saved_path}...")
             poll_success, poll_content, response_path = await NetworkFileSaver.poll_for_response(
                 saved_path=saved_path,
-                timeout_seconds=1200,  # 20 minutes
-                poll_interval=10
+                timeout_seconds=1200  # 20 minutes
             )
 
             if not poll_success:
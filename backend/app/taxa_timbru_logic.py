@@ -909,9 +909,16 @@ def main_calcul_taxa( #
 # ==========================================
 # LOGICA SUGERARE CLASIFICARE LLM
 # ==========================================
-async def suggest_tax_classification(case_description: str) -> SugestieIncadrareLLMResponse:
+# Prefixele error_message pentru eșecuri ale apelului LLM (tranzitorii, merită reîncercate),
+# spre deosebire de erorile de validare (descriere prea scurtă, opțiuni lipsă)
+LLM_CALL_ERROR = "Eroare la apelul LLM"
+INTERNAL_ERROR = "Eroare internă server"
+
+
+async def suggest_tax_classification(case_description: str, use_cache: bool = True) -> SugestieIncadrareLLMResponse:
     """
     Folosește LLM-ul local pentru a sugera cel mai potrivit ID de taxare pentru o descriere dată (obiect dosar).
+    use_cache=False la reîncercări, ca să nu primească același răspuns din cache.
     """
     if not case_description or len(case_description.strip()) < 3:
         return SugestieIncadrareLLMResponse(
@@ -952,12 +959,14 @@ Care este ID-ul corect din lista de mai sus? Returnează doar ID-ul."""
 
     # 3. Call Local LLM via LLMClient
     try:
-        success, content, _ = await LLMClient.call_llm_local(full_prompt, timeout=60, label="TaxaTimbru Suggestion")
+        success, content, _ = await LLMClient.call_llm_local(
+            full_prompt, timeout=60, label="TaxaTimbru Suggestion", use_cache=use_cache
+        )
 
         if not success:
              return SugestieIncadrareLLMResponse(
                 original_input_obiect=case_description,
-                error_message=f"Eroare la apelul LLM: {content}"
+                error_message=f"{LLM_CALL_ERROR}: {content}"
             )
 
         # 4. Parse Response (Expect raw ID string from local LLM if prompted correctly, or JSON if conditioned)
@@ -978,6 +987,10 @@ Care este ID-ul corect din lista de mai sus? Returnează doar ID-ul."""
                     suggested_id = vid
                     break
 
+        # Răspuns fără niciun ID valid (și nu NEDETERMINAT explicit): nu îl mai servim din cache
+        if suggested_id == "NEDETERMINAT" and "NEDETERMINAT" not in raw_suggestion:
+            LLMClient.discard_cached(content)
+
         # Find standard name
         suggested_nume_standard = None
         if suggested_id != "NEDETERMINAT":
@@ -997,7 +1010,7 @@ Care este ID-ul corect din lista de mai sus? Returnează doar ID-ul."""
         logger.exception("Eroare neasteptata la sugestia LLM taxa timbru")
         return SugestieIncadrareLLMResponse(
             original_input_obiect=case_description,
-            error_message=f"Eroare internă server: {str(e)}"
+            error_message=f"{INTERNAL_ERROR}: {str(e)}"
         )
 
 if __name__ == "__main__": #